@@ -0,0 +1,163 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from . import metrics
+
+# Admission control: requests of the expensive route groups run at most CONCURRENCY at a
+# time per group, and at most QUEUE more wait (up to ADMISSION_QUEUE_TIMEOUT seconds) for a
+# slot. Anything beyond is refused at once with Retry-After, so a burst of chat or feed
+# searches cannot take every worker from /health, GET /{entity}/{id} and the other routes
+# outside the groups, which are never held back. Limits are per process.
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# (group, methods, path pattern); the first match wins. /batch is left out on purpose: its
+# sub-requests pass through this middleware themselves.
+ROUTE_GROUPS = (
+    ("chat", None, re.compile(r"/chat/")),
+    ("scenarios", READ_METHODS, re.compile(r"/cards/feed/?$|/cards/[^/]+/full/?$|/export/?$")),
+    ("writes", WRITE_METHODS, re.compile(r"/(users|domains|sources|cards|experts|events)(/|$)")),
+    ("static", READ_METHODS, re.compile(r"/app(/|$)")),
+)
+
+# Concurrency and queue length per group, overridable with ADMISSION_<GROUP>_CONCURRENCY and
+# ADMISSION_<GROUP>_QUEUE. A concurrency of 0 turns the limit off for that group. /chat/stream
+# answers are also capped by answers.CHAT_MAX_GENERATIONS, which refuses instead of queueing.
+DEFAULT_LIMITS = {"chat": (4, 16), "scenarios": (8, 32), "writes": (16, 64), "static": (32, 64)}
+
+
+def _limit(group: str, name: str, default: int) -> int:
+    return int(os.getenv(f"ADMISSION_{group.upper()}_{name}", str(default)))
+
+
+class Limiter:
+    """A counting semaphore with a bounded FIFO queue; a released slot goes to the first waiter."""
+
+    def __init__(self, group: str, concurrency: int, queue: int):
+        self.group = group
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """``None`` once a slot is held, otherwise why the request is shed."""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except asyncio.CancelledError:
+            self._leave(waiter)
+            raise
+        if waiter.done():
+            return None
+        self._leave(waiter)
+        return "timeout"
+
+    def _leave(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot was handed over just before the caller gave up.
+            self.release()
+        else:
+            waiter.cancel()
+            self.waiters.remove(waiter)
+
+    def release(self) -> None:
+        if self.waiters:
+            # The slot passes to the waiter, so ``active`` stays the same.
+            self.waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+
+LIMITERS: Dict[str, Limiter] = {}
+for _group, (_concurrency, _queue) in DEFAULT_LIMITS.items():
+    _concurrency = _limit(_group, "CONCURRENCY", _concurrency)
+    if _concurrency > 0:
+        LIMITERS[_group] = Limiter(_group, _concurrency, _limit(_group, "QUEUE", _queue))
+
+shed_total = metrics.Counter(
+    "myservice_admission_shed_total",
+    "Requests refused by admission control.",
+    ("group", "reason"),
+)
+wait_seconds = metrics.Histogram(
+    "myservice_admission_wait_seconds",
+    "Time admitted requests waited for a slot.",
+    ("group",),
+    buckets=metrics.WAIT_BUCKETS,
+)
+metrics.Collected(
+    "myservice_admission_active", "Requests holding a slot.", "gauge", ("group",),
+    lambda: (((limiter.group,), limiter.active) for limiter in LIMITERS.values()),
+)
+metrics.Collected(
+    "myservice_admission_queue_depth", "Requests waiting for a slot.", "gauge", ("group",),
+    lambda: (((limiter.group,), len(limiter.waiters)) for limiter in LIMITERS.values()),
+)
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    for group, methods, pattern in ROUTE_GROUPS:
+        if (methods is None or method in methods) and pattern.match(path):
+            return group
+    return None
+
+
+def _rejection(reason: str) -> JSONResponse:
+    # A full queue means more requests than the service takes: back off (429). A timeout in
+    # the queue means the admitted ones are slow: the service is overloaded (503).
+    if reason == "queue_full":
+        code, detail = status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests, retry later"
+    else:
+        code, detail = status.HTTP_503_SERVICE_UNAVAILABLE, "Service overloaded, retry later"
+    return JSONResponse(
+        status_code=code,
+        content={"detail": detail},
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
+
+
+class AdmissionMiddleware:
+    """Holds each request of a limited group to its group's slots for the whole response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter = None
+        if scope["type"] == "http" and ADMISSION_CONTROL:
+            limiter = LIMITERS.get(route_group(scope["method"], scope["path"]))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        reason = await limiter.acquire(ADMISSION_QUEUE_TIMEOUT)
+        if reason is not None:
+            shed_total.inc(limiter.group, reason)
+            await _rejection(reason)(scope, receive, send)
+            return
+        wait_seconds.observe(time.perf_counter() - started, limiter.group)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,183 @@
+from sqlalchemy import DateTime, Integer, column, table
+from sqlalchemy.engine import Connection, Engine
+
+from . import triggers
+
+# cards.source_count, cards.last_event_at and cards.event_count are summaries of cardsources
+# and events that the feed and /events/counts read directly, and domain_event_counts sums the
+# last two per domain; these triggers keep them current for every write path, ORM or raw SQL.
+# Archived events count through their event_rollups rows: eventstore.archive writes a rollup
+# (+n) before deleting the events it covers (-1 each), so archiving leaves the counts as
+# they were.
+
+domain_event_counts = table(
+    "domain_event_counts",
+    column("domain_id", Integer),
+    column("event_count", Integer),
+    column("last_event_at", DateTime),
+)
+
+_SOURCE_COUNT = (
+    "(SELECT count(DISTINCT source_id) FROM cardsources WHERE cardsources.card_id = {card_id})"
+)
+# Events archived by eventstore.archive survive as event_rollups rows, so they still count.
+_LAST_EVENT_AT = (
+    "(SELECT max(last_event_at) FROM ("
+    "SELECT max(created_at) AS last_event_at FROM events WHERE events.card_id = {card_id} "
+    "UNION ALL "
+    "SELECT max(last_event_at) FROM event_rollups WHERE event_rollups.card_id = {card_id}))"
+)
+_EVENT_COUNT = (
+    "((SELECT count(*) FROM events WHERE events.card_id = {card_id}) + "
+    "(SELECT coalesce(sum(event_count), 0) FROM event_rollups "
+    "WHERE event_rollups.card_id = {card_id}))"
+)
+# Takes a card's events out of its domain's totals. The domain's latest event is looked up
+# again only when the card held it and {lost} (it left the domain or its latest event got
+# older); runs after the card row changed, so the lookup sees the new values.
+_DOMAIN_REMOVE = """
+            UPDATE domain_event_counts SET
+                event_count = event_count - old.event_count,
+                last_event_at = CASE WHEN last_event_at IS old.last_event_at AND {lost} THEN (
+                    SELECT max(last_event_at) FROM cards WHERE domain_id = old.domain_id
+                ) ELSE last_event_at END
+            WHERE domain_id = old.domain_id;"""
+_MOVED_OR_OLDER = (
+    "(new.domain_id IS NOT old.domain_id OR new.last_event_at IS NULL "
+    "OR new.last_event_at < old.last_event_at)"
+)
+_DOMAIN_ADD = """
+            INSERT INTO domain_event_counts (domain_id, event_count, last_event_at)
+            SELECT new.domain_id, new.event_count, new.last_event_at
+            WHERE new.domain_id IS NOT NULL
+            ON CONFLICT (domain_id) DO UPDATE SET
+                event_count = event_count + excluded.event_count,
+                last_event_at = max(coalesce(last_event_at, excluded.last_event_at),
+                                    coalesce(excluded.last_event_at, last_event_at));"""
+
+_TRIGGERS = {
+    "cardsources_aggregates_ai": f"""
+        CREATE TRIGGER cardsources_aggregates_ai AFTER INSERT ON cardsources BEGIN
+            UPDATE cards SET source_count = {_SOURCE_COUNT.format(card_id="new.card_id")}
+            WHERE id = new.card_id;
+        END
+    """,
+    "cardsources_aggregates_ad": f"""
+        CREATE TRIGGER cardsources_aggregates_ad AFTER DELETE ON cardsources BEGIN
+            UPDATE cards SET source_count = {_SOURCE_COUNT.format(card_id="old.card_id")}
+            WHERE id = old.card_id;
+        END
+    """,
+    "cardsources_aggregates_au": f"""
+        CREATE TRIGGER cardsources_aggregates_au AFTER UPDATE OF card_id, source_id ON cardsources BEGIN
+            UPDATE cards SET source_count = {_SOURCE_COUNT.format(card_id="old.card_id")}
+            WHERE id = old.card_id;
+            UPDATE cards SET source_count = {_SOURCE_COUNT.format(card_id="new.card_id")}
+            WHERE id = new.card_id;
+        END
+    """,
+    "events_aggregates_ai": """
+        CREATE TRIGGER events_aggregates_ai AFTER INSERT ON events BEGIN
+            UPDATE cards SET
+                last_event_at = max(coalesce(last_event_at, new.created_at), new.created_at),
+                event_count = event_count + 1
+            WHERE id = new.card_id;
+        END
+    """,
+    "events_aggregates_ad": f"""
+        CREATE TRIGGER events_aggregates_ad AFTER DELETE ON events BEGIN
+            UPDATE cards SET
+                last_event_at = {_LAST_EVENT_AT.format(card_id="old.card_id")},
+                event_count = event_count - 1
+            WHERE id = old.card_id;
+        END
+    """,
+    "events_aggregates_au": f"""
+        CREATE TRIGGER events_aggregates_au AFTER UPDATE OF card_id, created_at ON events BEGIN
+            UPDATE cards SET
+                last_event_at = {_LAST_EVENT_AT.format(card_id="old.card_id")},
+                event_count = event_count - (old.card_id IS NOT new.card_id)
+            WHERE id = old.card_id;
+            UPDATE cards SET
+                last_event_at = {_LAST_EVENT_AT.format(card_id="new.card_id")},
+                event_count = event_count + (old.card_id IS NOT new.card_id)
+            WHERE id = new.card_id;
+        END
+    """,
+    "event_rollups_aggregates_ai": """
+        CREATE TRIGGER event_rollups_aggregates_ai AFTER INSERT ON event_rollups BEGIN
+            UPDATE cards SET event_count = event_count + new.event_count WHERE id = new.card_id;
+        END
+    """,
+    "event_rollups_aggregates_ad": """
+        CREATE TRIGGER event_rollups_aggregates_ad AFTER DELETE ON event_rollups BEGIN
+            UPDATE cards SET event_count = event_count - old.event_count WHERE id = old.card_id;
+        END
+    """,
+    "event_rollups_aggregates_au": """
+        CREATE TRIGGER event_rollups_aggregates_au AFTER UPDATE OF card_id, event_count
+        ON event_rollups BEGIN
+            UPDATE cards SET event_count = event_count - old.event_count WHERE id = old.card_id;
+            UPDATE cards SET event_count = event_count + new.event_count WHERE id = new.card_id;
+        END
+    """,
+    "cards_domain_events_ai": f"""
+        CREATE TRIGGER cards_domain_events_ai AFTER INSERT ON cards BEGIN{_DOMAIN_ADD}
+        END
+    """,
+    "cards_domain_events_ad": f"""
+        CREATE TRIGGER cards_domain_events_ad AFTER DELETE ON cards
+        BEGIN{_DOMAIN_REMOVE.format(lost="1")}
+        END
+    """,
+    "cards_domain_events_au": f"""
+        CREATE TRIGGER cards_domain_events_au AFTER UPDATE OF domain_id, event_count, last_event_at
+        ON cards BEGIN{_DOMAIN_REMOVE.format(lost=_MOVED_OR_OLDER)}{_DOMAIN_ADD}
+        END
+    """,
+}
+
+
+def ensure_triggers(engine: Engine) -> None:
+    """Install missing or outdated aggregate triggers; the database is then repaired once."""
+    with engine.begin() as conn:
+        _create_domain_event_counts(conn)
+        missing = triggers.install(conn, _TRIGGERS)
+    if missing:
+        repair(engine)
+
+
+def _create_domain_event_counts(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS domain_event_counts ("
+        "domain_id INTEGER PRIMARY KEY, event_count INTEGER NOT NULL DEFAULT 0, "
+        "last_event_at DATETIME)"
+    )
+
+
+def repair(engine: Engine) -> int:
+    """Recompute the aggregates from cardsources/events; returns how many cards had drifted."""
+    source_count = _SOURCE_COUNT.format(card_id="cards.id")
+    last_event_at = _LAST_EVENT_AT.format(card_id="cards.id")
+    event_count = _EVENT_COUNT.format(card_id="cards.id")
+    with engine.begin() as conn:
+        result = conn.exec_driver_sql(
+            f"""
+            UPDATE cards SET
+                source_count = {source_count},
+                last_event_at = {last_event_at},
+                event_count = {event_count}
+            WHERE source_count IS NOT {source_count} OR last_event_at IS NOT {last_event_at}
+                OR event_count IS NOT {event_count}
+            """
+        )
+        _create_domain_event_counts(conn)
+        conn.exec_driver_sql("DELETE FROM domain_event_counts")
+        conn.exec_driver_sql(
+            """
+            INSERT INTO domain_event_counts (domain_id, event_count, last_event_at)
+            SELECT domain_id, sum(event_count), max(last_event_at) FROM cards
+            WHERE domain_id IS NOT NULL GROUP BY domain_id
+            """
+        )
+        return result.rowcount
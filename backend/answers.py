@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+import os
+import re
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Protocol
+
+from . import schemas
+
+# "module:attribute" of a zero-argument factory returning an AnswerGenerator.
+CHAT_ANSWER_GENERATOR = os.getenv("CHAT_ANSWER_GENERATOR", "backend.answers:StubGenerator")
+CHAT_MAX_GENERATIONS = int(os.getenv("CHAT_MAX_GENERATIONS", "4"))
+CHAT_STUB_CHUNK_DELAY_MS = float(os.getenv("CHAT_STUB_CHUNK_DELAY_MS", "0"))
+
+
+class AnswerGenerator(Protocol):
+    def generate(self, message: str, cards: List[schemas.ChatUsedCard]) -> AsyncIterator[str]:
+        """Yield the answer to ``message`` grounded on ``cards`` piece by piece."""
+        ...
+
+
+def stub_answer(cards: List[schemas.ChatUsedCard]) -> str:
+    if not cards:
+        return (
+            "Пока я не нашёл подходящих карточек по вашему запросу. "
+            "Попробуйте уточнить формулировку или добавить другие ключевые слова."
+        )
+    titles = ", ".join(card.title for card in cards)
+    return (
+        f"По вашему запросу я отобрал {len(cards)} карточек: {titles}. "
+        "Сейчас сервис работает в режиме имитации и не генерирует полный текст ответа, "
+        "но вы можете открыть эти карточки и посмотреть подробности и источники."
+    )
+
+
+class StubGenerator:
+    """Deterministic local generator: the mock answer, one word per chunk."""
+
+    def __init__(self, delay: float = CHAT_STUB_CHUNK_DELAY_MS / 1000):
+        self.delay = delay
+
+    async def generate(
+        self, message: str, cards: List[schemas.ChatUsedCard]
+    ) -> AsyncIterator[str]:
+        for chunk in re.findall(r"\S+\s*", stub_answer(cards)):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield chunk
+
+
+@lru_cache(maxsize=None)
+def get_generator(path: str = CHAT_ANSWER_GENERATOR) -> AnswerGenerator:
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+class Slot:
+    def __init__(self, limiter: "GenerationLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter.active -= 1
+
+
+class GenerationLimiter:
+    """Caps the number of answers generated at the same time in this process.
+
+    It overlaps with the ``chat`` group of :mod:`backend.admission`, which holds every /chat/
+    request to its slots and queues the excess. This cap only counts /chat/stream answers and
+    refuses at once; it is what still bounds generation with admission control turned off or
+    a larger ``ADMISSION_CHAT_CONCURRENCY``.
+    """
+
+    def __init__(self, limit: int = CHAT_MAX_GENERATIONS):
+        self.limit = limit
+        self.active = 0
+
+    def acquire(self) -> Optional[Slot]:
+        if self.active >= self.limit:
+            return None
+        self.active += 1
+        return Slot(self)
+
+
+limiter = GenerationLimiter()
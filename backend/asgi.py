@@ -0,0 +1,78 @@
+import asyncio
+import json
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# Scope keys a request made on behalf of another one (a /batch sub-request) inherits from it.
+_INHERITED_SCOPE = {
+    "asgi": {"version": "3.0", "spec_version": "2.4"},
+    "http_version": "1.1",
+    "scheme": "http",
+    "server": None,
+    "client": None,
+    "root_path": "",
+}
+
+
+async def call(
+    app,
+    method: str,
+    path: str,
+    body: Optional[Any] = None,
+    headers: Optional[Dict[str, str]] = None,
+    parent: Optional[Mapping] = None,
+) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one request straight into an ASGI app; returns status, headers and the full body.
+
+    ``body`` is sent as JSON. ``parent`` is the scope of the request this one is made for.
+    An error raised once the response has started is dropped with the rest of the response.
+    """
+    path, _, query_string = path.partition("?")
+    payload = b"" if body is None else json.dumps(body).encode()
+    request_headers = {"accept": "application/json"}
+    request_headers.update({name.lower(): value for name, value in (headers or {}).items()})
+    if body is not None:
+        request_headers.setdefault("content-type", "application/json")
+
+    scope = {key: (parent or {}).get(key, default) for key, default in _INHERITED_SCOPE.items()}
+    scope.update(
+        {
+            "type": "http",
+            "method": method.upper(),
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "headers": [
+                (name.encode(), value.encode()) for name, value in request_headers.items()
+            ],
+            "state": {},
+        }
+    )
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Nothing else will arrive; this only parks disconnect listeners until cancelled.
+        await asyncio.get_running_loop().create_future()
+
+    response = {"status": None, "headers": {}, "body": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                name.decode(): value.decode() for name, value in message.get("headers", [])
+            }
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        if response["status"] is None:
+            raise
+    if response["status"] is None:
+        raise RuntimeError(f"{method} {path} returned without a response")
+    return response["status"], response["headers"], b"".join(response["body"])
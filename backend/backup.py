@@ -0,0 +1,272 @@
+import base64
+import gzip
+import os
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from sqlalchemy import Date, DateTime, LargeBinary, Table, column, delete, func, insert, select
+from sqlalchemy import table as table_clause
+from sqlalchemy.engine import Connection, Engine
+
+from . import aggregates, cardcontent, eventstore, fastjson, models
+from .db import Base
+
+# Export format: gzip-compressed NDJSON. The first line is a header, every other line is
+# {"table": name, "row": {column: value}} with the tables in the order below (parents first)
+# and each table ordered by primary key. Ids are kept, so references survive a restore.
+# Card bodies are part of the cards rows, as plain "content" text; card_contents and its
+# compression are a storage detail of the database. Binary columns are base64 strings.
+# Archived events follow as tables "events_archive.events_YYYY_MM", one per partition.
+
+EXPORT_FORMAT = "myservice-export"
+# Version 2 added the archive partitions; version 1 files still import.
+EXPORT_VERSION = 2
+IMPORT_VERSIONS = (1, 2)
+EXPORT_TABLES = (
+    "users",
+    "domains",
+    "sources",
+    "cards",
+    "card_revisions",
+    "cardsources",
+    "experts",
+    "events",
+    "event_rollups",
+)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COMPRESSION_LEVEL = int(os.getenv("EXPORT_COMPRESSION_LEVEL", "6"))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Pages copied per backup step; -1 copies everything in one step. In WAL mode one step is
+# a single read transaction that writers do not wait for, whereas with smaller steps a write
+# from another connection restarts the copy.
+SNAPSHOT_STEP_PAGES = int(os.getenv("SNAPSHOT_STEP_PAGES", "-1"))
+
+
+_ARCHIVE_TABLE = re.compile(rf"{eventstore.ARCHIVE_SCHEMA}\.(events_\d{{4}}_\d{{2}})$")
+
+
+def _tables() -> Iterable[Table]:
+    return [Base.metadata.tables[name] for name in EXPORT_TABLES]
+
+
+def _archive_table(partition: str):
+    return table_clause(
+        partition,
+        *(column(name) for name in eventstore.ARCHIVE_COLUMNS),
+        schema=eventstore.ARCHIVE_SCHEMA,
+    )
+
+
+def iter_export(engine: Engine) -> Iterator[bytes]:
+    """NDJSON export of every table and archive partition.
+
+    Everything is read in one transaction over the database and its attached event archive,
+    so the export is a consistent snapshot even while events are being archived.
+    """
+    with eventstore.attached(engine, write=False) as conn:
+        partitions = eventstore.partitions(conn)
+        archive_tables = [_archive_table(partition) for partition in partitions]
+        header = {
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "exported_at": datetime.utcnow().isoformat(),
+            "tables": [
+                *EXPORT_TABLES,
+                *(f"{eventstore.ARCHIVE_SCHEMA}.{partition}" for partition in partitions),
+            ],
+        }
+        yield fastjson.dumps(header) + b"\n"
+        for table in [*_tables(), *archive_tables]:
+            statement = select(table)
+            if table.name == "cards":
+                statement = statement.add_columns(models.Card.content.label("content"))
+            result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(
+                statement.order_by(*(list(table.primary_key) or [table.c.id]))
+            )
+            name = f"{table.schema}.{table.name}" if table.schema else table.name
+            binary = [
+                column.name for column in table.columns if isinstance(column.type, LargeBinary)
+            ]
+            for rows in result.partitions():
+                yield b"".join(
+                    fastjson.dumps({"table": name, "row": _export_row(row, binary)}) + b"\n"
+                    for row in rows
+                )
+
+
+def _export_row(row, binary) -> dict:
+    values = dict(row._mapping)
+    for name in binary:
+        if values[name] is not None:
+            values[name] = base64.b64encode(values[name]).decode()
+    return values
+
+
+def gzipped(chunks: Iterable[bytes], level: int = EXPORT_COMPRESSION_LEVEL) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_to_file(engine: Engine, path: Path) -> int:
+    """Write a gzip export to ``path`` (via a temporary file); returns the number of bytes."""
+    temporary = path.with_name(path.name + ".tmp")
+    size = 0
+    with open(temporary, "wb") as file:
+        for data in gzipped(iter_export(engine)):
+            file.write(data)
+            size += len(data)
+    os.replace(temporary, path)
+    return size
+
+
+def import_file(engine: Engine, path: Path, replace: bool = False) -> Dict[str, int]:
+    """Load an export into the database in one transaction; returns rows per table.
+
+    The tables and the event archive must be empty unless ``replace`` is set, in which case
+    their rows are deleted (and the archive partitions dropped) first. Rows go in with
+    ``executemany`` chunks of ``IMPORT_CHUNK_SIZE``; foreign keys are checked at commit, and
+    the card aggregates are recomputed afterwards. Archived events count as "events_archive".
+    """
+    tables = {table.name: table for table in _tables()}
+    converters = {name: _converters(table) for name, table in tables.items()}
+    counts = {name: 0 for name in tables}
+    counts[eventstore.ARCHIVE_SCHEMA] = 0
+    pending = {name: [] for name in tables}
+    contents_table = models.CardContent.__table__
+    contents = []
+
+    with _open(path) as file, eventstore.attached(engine) as conn, conn.begin():
+        conn.exec_driver_sql("PRAGMA defer_foreign_keys=ON")
+        header = fastjson.loads(file.readline() or b"{}")
+        if header.get("format") != EXPORT_FORMAT or header.get("version") not in IMPORT_VERSIONS:
+            raise ValueError(f"{path} is not a {EXPORT_FORMAT} v{EXPORT_VERSION} file")
+
+        if replace:
+            conn.execute(delete(contents_table))
+            for table in reversed(list(tables.values())):
+                conn.execute(delete(table))
+            for partition in eventstore.partitions(conn):
+                conn.exec_driver_sql(f"DROP TABLE {eventstore.ARCHIVE_SCHEMA}.{partition}")
+        else:
+            for name, table in tables.items():
+                if conn.scalar(select(func.count()).select_from(table)):
+                    raise ValueError(f"Table {name} is not empty; use replace to overwrite it")
+            if _archived_events(conn):
+                raise ValueError("The event archive is not empty; use replace to overwrite it")
+
+        def flush(name: str) -> None:
+            match = _ARCHIVE_TABLE.match(name)
+            if match:
+                conn.execute(insert(_archive_table(match.group(1))), pending[name])
+                counts[eventstore.ARCHIVE_SCHEMA] += len(pending[name])
+            else:
+                conn.execute(insert(tables[name]), pending[name])
+                counts[name] += len(pending[name])
+            pending[name] = []
+
+        def flush_contents() -> None:
+            conn.execute(insert(contents_table), contents)
+            contents.clear()
+
+        for line in file:
+            if not line.strip():
+                continue
+            item = fastjson.loads(line)
+            name, row = item["table"], item["row"]
+            if name not in pending:
+                match = _ARCHIVE_TABLE.match(name)
+                if not match:
+                    raise ValueError(f"Unknown table {name!r} in {path}")
+                eventstore.create_partition(conn, match.group(1))
+                pending[name] = []
+            for column_name, convert in converters.get(name, {}).items():
+                if row.get(column_name) is not None:
+                    row[column_name] = convert(row[column_name])
+            if name == "cards":
+                content = row.pop("content", None)
+                if content is not None:
+                    contents.append(cardcontent.content_row(row["id"], content))
+            pending[name].append(row)
+            if len(pending[name]) >= IMPORT_CHUNK_SIZE:
+                flush(name)
+            if len(contents) >= IMPORT_CHUNK_SIZE:
+                flush_contents()
+        for name in list(pending):
+            if pending[name]:
+                flush(name)
+        if contents:
+            flush_contents()
+
+    # The aggregate triggers counted the imported links on top of the exported values.
+    aggregates.repair(engine)
+    return counts
+
+
+def _archived_events(conn: Connection) -> int:
+    return sum(
+        conn.scalar(select(func.count()).select_from(_archive_table(partition)))
+        for partition in eventstore.partitions(conn)
+    )
+
+
+def _converters(table: Table) -> Dict[str, Callable]:
+    converters = {}
+    for table_column in table.columns:
+        if isinstance(table_column.type, DateTime):
+            converters[table_column.name] = datetime.fromisoformat
+        elif isinstance(table_column.type, Date):
+            converters[table_column.name] = date.fromisoformat
+        elif isinstance(table_column.type, LargeBinary):
+            converters[table_column.name] = base64.b64decode
+    return converters
+
+
+def _open(path: Path):
+    with open(path, "rb") as file:
+        compressed = file.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+
+def snapshot(engine: Engine, path: Path, pages: Optional[int] = None) -> Optional[Path]:
+    """Copy the live database to ``path`` with SQLite's online backup API.
+
+    The event archive, if there is one, is copied too, next to ``path`` under the name the
+    application derives from it (``<name>-events.db``); that path is returned. Both copies
+    are taken inside one read transaction, so no event is lost or doubled between them.
+    """
+    pages = SNAPSHOT_STEP_PAGES if pages is None else pages
+    archive_target = eventstore.default_archive_path(path)
+    copies = [("main", path)]
+    with eventstore.attached(engine, write=False) as conn:
+        if eventstore.ARCHIVE_SCHEMA in {
+            row[1] for row in conn.exec_driver_sql("PRAGMA database_list")
+        }:
+            copies.append((eventstore.ARCHIVE_SCHEMA, archive_target))
+        # The read transaction (begun by the PRAGMA above) pins the snapshot of each schema
+        # once it has read from it; the backups then copy those snapshots.
+        for name, _ in copies:
+            conn.exec_driver_sql(f"SELECT count(*) FROM {name}.sqlite_master").scalar()
+        for name, target_path in copies:
+            _backup(conn.connection.driver_connection, name, target_path, pages)
+    return archive_target if len(copies) > 1 else None
+
+
+def _backup(source: sqlite3.Connection, name: str, path: Path, pages: int) -> None:
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.unlink(missing_ok=True)
+    target = sqlite3.connect(temporary)
+    try:
+        source.backup(target, pages=pages, name=name)
+        # A self-contained file, whatever the journal mode of the source.
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+    os.replace(temporary, path)
@@ -0,0 +1,249 @@
+"""Load test: concurrent in-process clients against the real application.
+
+    python -m backend.bench.load [--scale 1] [--concurrency 8] [--requests 200]
+                                 [--output results.json] [--baseline previous.json]
+
+Seeds a fresh database (``--reuse`` keeps an existing one), then runs each scenario on its
+own and reports latency percentiles, throughput and SQL statements per request. With
+``--baseline`` the run is compared against an earlier ``--output`` file; ``--max-regression``
+makes the command exit with status 1 when p95 latency or SQL counts grow by more than that
+percentage.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..asgi import call
+from . import seed as seeding
+
+Request = Tuple[str, str, Optional[dict]]
+
+QUERIES = (
+    "как оформить заявку на доступ",
+    "согласовать договор с поставщиком",
+    "восстановить пароль",
+    "ежемесячный отчёт по бюджету",
+    "how to approve an invoice",
+    "restore backup of the server",
+    "инцидент на сервере",
+    "review the release pipeline",
+)
+
+
+class Context:
+    def __init__(self, card_ids: List[int], domain_ids: List[int]):
+        self.card_ids = card_ids
+        self.domain_ids = domain_ids
+
+
+def _scenarios() -> Dict[str, Callable[[random.Random, Context], Request]]:
+    return {
+        "cards_feed": lambda rng, ctx: ("GET", "/cards/feed?page_size=20", None),
+        "cards_feed_filtered": lambda rng, ctx: (
+            "GET",
+            f"/cards/feed?domain_id={rng.choice(ctx.domain_ids)}&status=active&page={rng.randint(1, 3)}",
+            None,
+        ),
+        "cards_feed_search": lambda rng, ctx: (
+            "GET",
+            f"/cards/feed?search={rng.choice(seeding.NOUNS_RU + seeding.NOUNS_EN)}",
+            None,
+        ),
+        "cards_full": lambda rng, ctx: ("GET", f"/cards/{rng.choice(ctx.card_ids)}/full", None),
+        "cards_list_fields": lambda rng, ctx: ("GET", "/cards/?fields=id,title,status", None),
+        "chat_mock": lambda rng, ctx: ("POST", "/chat/mock", {"message": rng.choice(QUERIES)}),
+        "domains": lambda rng, ctx: ("GET", "/domains/", None),
+        "event_counts": lambda rng, ctx: ("GET", "/events/counts/domains", None),
+    }
+
+
+SCENARIOS = _scenarios()
+
+
+class StatementCounter:
+    """Counts statements sent to SQLite; scenarios run one at a time, so a total suffices."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+def _percentile(values: List[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def run_scenario(
+    app,
+    counter: StatementCounter,
+    build: Callable[[random.Random, Context], Request],
+    context: Context,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+) -> dict:
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        await call(app, *build(rng, context))
+
+    pending = iter([build(rng, context) for _ in range(requests)])
+    latencies: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        for method, path, body in pending:
+            started = time.perf_counter()
+            status_code, _, _ = await call(app, method, path, body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status_code >= 400:
+                errors += 1
+
+    statements_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "sql_per_request": round((counter.count - statements_before) / requests, 2),
+    }
+
+
+# (metric, higher is better)
+COMPARED_METRICS = (
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("throughput_rps", True),
+    ("sql_per_request", False),
+)
+
+
+def compare(results: dict, baseline: dict, max_regression: Optional[float]) -> bool:
+    """Print the change against ``baseline``; returns False if a regression exceeds the limit."""
+    ok = True
+    print(f"\nAgainst baseline from {baseline.get('meta', {}).get('started_at', '?')}:")
+    for name, row in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            print(f"  {name:22} (not in baseline)")
+            continue
+        changes = []
+        for metric, higher_is_better in COMPARED_METRICS:
+            before, after = previous.get(metric), row[metric]
+            if not before:
+                continue
+            delta = (after - before) / before * 100
+            changes.append(f"{metric} {delta:+.1f}%")
+            regression = -delta if higher_is_better else delta
+            if (
+                max_regression is not None
+                and metric in ("p95_ms", "sql_per_request")
+                and regression > max_regression
+            ):
+                ok = False
+                changes[-1] += " !"
+        print(f"  {name:22} " + ", ".join(changes))
+    return ok
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.bench.load")
+    parser.add_argument("--database", default="myservice-bench.db")
+    parser.add_argument("--reuse", action="store_true", help="Keep an existing database instead of reseeding")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these (repeatable)"
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, help="Allowed p95/SQL growth in percent")
+    args = parser.parse_args(argv)
+
+    seeding.use_database(args.database, fresh=not args.reuse)
+    from sqlalchemy import func, select
+
+    from .. import models
+    from ..db import async_engine, engine
+    from ..main import app
+
+    with engine.connect() as conn:
+        seeded = conn.scalar(select(func.count()).select_from(models.Card))
+    if not seeded:
+        seeding.populate(engine, seeding.counts_for(args.scale), args.seed)
+    with engine.connect() as conn:
+        context = Context(
+            card_ids=conn.scalars(select(models.Card.id)).all(),
+            domain_ids=conn.scalars(select(models.Domain.id)).all(),
+        )
+    counter = StatementCounter(async_engine.sync_engine)
+
+    async def run_all() -> Dict[str, dict]:
+        results = {}
+        for name in args.scenario or SCENARIOS:
+            results[name] = await run_scenario(
+                app, counter, SCENARIOS[name], context,
+                args.requests, args.concurrency, args.warmup, args.seed,
+            )
+        return results
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    results = {
+        "meta": {
+            "started_at": started_at,
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "cards": len(context.card_ids),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "scenarios": asyncio.run(run_all()),
+    }
+
+    print(
+        f"{'scenario':22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'sql/req':>8} {'errors':>7}"
+    )
+    for name, row in results["scenarios"].items():
+        print(
+            f"{name:22} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['throughput_rps']:>8.1f} {row['sql_per_request']:>8.2f} {row['errors']:>7}"
+        )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
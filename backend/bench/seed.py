@@ -0,0 +1,261 @@
+"""Synthetic data for benchmarks: users, domains, sources, cards, card sources and events.
+
+    python -m backend.bench.seed --database myservice-bench.db --scale 2
+
+The same ``--scale`` and ``--seed`` always produce the same rows.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+
+# Row counts at --scale 1; links and events are per card.
+BASE_COUNTS = {
+    "users": 50,
+    "domains": 12,
+    "sources": 300,
+    "cards": 2000,
+    "links_per_card": 3,
+    "events_per_card": 10,
+}
+
+# Fixed so that timestamps, and with them the feed order, do not depend on the run date.
+EPOCH = datetime(2025, 1, 1)
+
+INSERT_CHUNK_SIZE = 5000
+
+DOMAINS_RU = (
+    "Финансы", "Закупки", "Персонал", "Юридический отдел", "Информационная безопасность",
+    "Клиентский сервис", "Логистика", "Маркетинг", "Разработка", "Аналитика",
+    "Документооборот", "Инфраструктура",
+)
+NOUNS_RU = (
+    "заявка", "договор", "платёж", "счёт", "отчёт", "регламент", "сотрудник", "клиент",
+    "поставщик", "сервер", "инцидент", "релиз", "бюджет", "нейросеть", "доступ", "пароль",
+    "архив", "склад", "доставка", "проверка", "согласование", "закупка", "интеграция",
+)
+VERBS_RU = (
+    "оформить", "согласовать", "проверить", "восстановить", "обновить", "подписать",
+    "отправить", "настроить", "закрыть", "передать", "рассчитать", "запросить",
+)
+ADJECTIVES_RU = (
+    "срочный", "ежемесячный", "внутренний", "новый", "типовой", "годовой", "резервный",
+    "клиентский", "корпоративный", "обязательный",
+)
+NOUNS_EN = (
+    "invoice", "contract", "payment", "report", "policy", "employee", "customer", "vendor",
+    "server", "incident", "release", "budget", "model", "access", "password", "backup",
+    "warehouse", "delivery", "audit", "approval", "purchase", "integration", "pipeline",
+)
+VERBS_EN = (
+    "submit", "approve", "review", "restore", "update", "sign", "send", "configure",
+    "close", "hand over", "calculate", "request",
+)
+ADJECTIVES_EN = (
+    "urgent", "monthly", "internal", "new", "standard", "annual", "backup", "customer",
+    "corporate", "mandatory",
+)
+
+ROLES = ("admin", "editor", "expert", "viewer")
+STATUSES = ("draft", "active", "active", "active", "archived")
+SOURCE_TYPES = ("wiki", "pdf", "url", "ticket", "confluence")
+EVENT_TYPES = ("view", "view", "view", "edit", "comment", "verify")
+FIRST_NAMES = ("Анна", "Иван", "Мария", "Пётр", "Ольга", "Алексей", "Елена", "Дмитрий", "Kate", "John")
+LAST_NAMES = ("Иванова", "Смирнов", "Кузнецова", "Попов", "Соколова", "Лебедев", "Новикова", "Smith", "Brown")
+
+
+def counts_for(scale: float) -> Dict[str, int]:
+    counts = dict(BASE_COUNTS)
+    for name in ("users", "domains", "sources", "cards"):
+        counts[name] = max(1, round(BASE_COUNTS[name] * scale))
+    return counts
+
+
+class TextGenerator:
+    """Short Russian or English phrases built from a fixed vocabulary."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def title(self) -> str:
+        rng = self.rng
+        if rng.random() < 0.7:
+            words = (rng.choice(VERBS_RU), rng.choice(ADJECTIVES_RU), rng.choice(NOUNS_RU))
+        else:
+            words = (rng.choice(VERBS_EN), rng.choice(ADJECTIVES_EN), rng.choice(NOUNS_EN))
+        return " ".join(words).capitalize()
+
+    def sentence(self) -> str:
+        rng = self.rng
+        if rng.random() < 0.7:
+            words = [
+                rng.choice(("Чтобы", "Если нужно", "Когда требуется", "Перед тем как")),
+                rng.choice(VERBS_RU),
+                rng.choice(NOUNS_RU),
+                rng.choice(("откройте", "заполните", "проверьте", "отправьте")),
+                rng.choice(ADJECTIVES_RU),
+                rng.choice(NOUNS_RU),
+                rng.choice(("в системе", "у руководителя", "в течение дня", "через портал")),
+            ]
+        else:
+            words = [
+                rng.choice(("To", "Before you", "When you need to")),
+                rng.choice(VERBS_EN),
+                "the",
+                rng.choice(NOUNS_EN),
+                rng.choice(("open", "fill in", "check", "send")),
+                "the",
+                rng.choice(ADJECTIVES_EN),
+                rng.choice(NOUNS_EN),
+                rng.choice(("in the portal", "with your manager", "within a day")),
+            ]
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self, sentences: int) -> str:
+        return " ".join(self.sentence() for _ in range(sentences))
+
+
+def populate(engine, counts: Dict[str, int], seed: int = 0) -> Dict[str, int]:
+    """Insert the rows into an empty schema (``init_db`` and the triggers must already exist)."""
+    from .. import cardcontent, models
+
+    rng = random.Random(seed)
+    text = TextGenerator(rng)
+
+    with engine.begin() as conn:
+        _insert(
+            conn,
+            models.User,
+            [
+                {
+                    "email": f"user{index}@example.com",
+                    "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "role": rng.choice(ROLES),
+                    "created_at": EPOCH,
+                }
+                for index in range(counts["users"])
+            ],
+        )
+        _insert(
+            conn,
+            models.Domain,
+            [
+                {
+                    "code": f"D{index:03d}",
+                    "name": DOMAINS_RU[index % len(DOMAINS_RU)]
+                    + ("" if index < len(DOMAINS_RU) else f" {index // len(DOMAINS_RU) + 1}"),
+                    "description": text.sentence(),
+                }
+                for index in range(counts["domains"])
+            ],
+        )
+        user_ids = conn.scalars(select(models.User.id)).all()
+        domain_ids = conn.scalars(select(models.Domain.id)).all()
+
+        _insert(
+            conn,
+            models.Source,
+            [
+                {
+                    "domain_id": rng.choice(domain_ids),
+                    "title": text.title(),
+                    "type": rng.choice(SOURCE_TYPES),
+                    "uri": f"https://kb.example.com/source/{index}",
+                    "is_active": rng.random() < 0.9,
+                    "created_at": EPOCH,
+                }
+                for index in range(counts["sources"])
+            ],
+        )
+        source_ids = conn.scalars(select(models.Source.id)).all()
+
+        cards, contents = [], []
+        for index in range(counts["cards"]):
+            created_at = EPOCH + timedelta(minutes=index)
+            cards.append(
+                {
+                    "domain_id": rng.choice(domain_ids),
+                    "title": text.title(),
+                    "description": text.sentence(),
+                    "status": rng.choice(STATUSES),
+                    "owner_id": rng.choice(user_ids),
+                    "created_at": created_at,
+                    "updated_at": created_at + timedelta(days=rng.randint(0, 60)),
+                }
+            )
+            contents.append(text.paragraph(rng.randint(5, 40)))
+        _insert(conn, models.Card, cards)
+        card_ids = conn.scalars(select(models.Card.id).order_by(models.Card.id)).all()
+        _insert(
+            conn,
+            models.CardContent,
+            [
+                cardcontent.content_row(card_id, content)
+                for card_id, content in zip(card_ids, contents)
+            ],
+        )
+
+        _insert(
+            conn,
+            models.CardSource,
+            [
+                {"card_id": card_id, "source_id": source_id, "note": None}
+                for card_id in card_ids
+                for source_id in rng.sample(
+                    source_ids, min(len(source_ids), rng.randint(0, 2 * counts["links_per_card"]))
+                )
+            ],
+        )
+        _insert(
+            conn,
+            models.Event,
+            [
+                {
+                    "card_id": card_id,
+                    "user_id": rng.choice(user_ids),
+                    "event_type": rng.choice(EVENT_TYPES),
+                    "created_at": EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                }
+                for card_id in card_ids
+                for _ in range(rng.randint(0, 2 * counts["events_per_card"]))
+            ],
+        )
+
+    return counts
+
+
+def _insert(conn, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        conn.execute(insert(model), rows[start:start + INSERT_CHUNK_SIZE])
+
+
+def use_database(path: str, fresh: bool = True) -> None:
+    """Point ``backend.db`` at ``path``; call before anything imports ``backend.db``."""
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.bench.seed")
+    parser.add_argument("--database", default="myservice-bench.db")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    use_database(args.database)
+    from ..db import engine
+    from ..main import app  # noqa: F401  (creates the schema and its triggers)
+
+    counts = populate(engine, counts_for(args.scale), args.seed)
+    print(f"Seeded {args.database}: " + ", ".join(f"{name}={value}" for name, value in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare response serialization with the fast JSON path on and off.
+
+    python -m backend.bench.serialization [--cards 2000] [--repeat 20]
+
+Seeds its own SQLite file (``--database``, see :mod:`backend.bench.seed`) and calls the
+application in-process, so the numbers cover routing, queries and serialization but no network.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from ..asgi import call
+from . import seed as seeding
+
+ENDPOINTS = (
+    "/cards/",
+    "/cards/feed?page_size=100",
+    "/cards/changes?limit=2000",
+    "/events/counts/cards",
+)
+
+
+async def measure(app, path: str, repeat: int) -> dict:
+    body = b""
+    for _ in range(3):
+        status_code, _, body = await call(app, "GET", path)
+        if status_code != 200:
+            raise RuntimeError(f"GET {path} returned {status_code}: {body[:200]!r}")
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call(app, "GET", path)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(timings), "bytes": len(body)}
+
+
+async def run(app, repeat: int) -> dict:
+    from .. import fastjson
+
+    results = {}
+    for path in ENDPOINTS:
+        fastjson.ENABLED = False
+        regular = await measure(app, path, repeat)
+        fastjson.ENABLED = True
+        fast = await measure(app, path, repeat)
+        results[path] = {
+            "bytes": fast["bytes"],
+            "regular_ms": round(regular["median_ms"], 2),
+            "fast_ms": round(fast["median_ms"], 2),
+            "speedup": round(regular["median_ms"] / fast["median_ms"], 2),
+        }
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.bench.serialization")
+    parser.add_argument("--database", default="myservice-bench.db")
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    seeding.use_database(args.database, fresh=True)
+    from ..db import engine
+    from ..main import app
+
+    counts = seeding.counts_for(args.cards / seeding.BASE_COUNTS["cards"])
+    seeding.populate(engine, counts)
+    results = asyncio.run(run(app, args.repeat))
+
+    print(f"{'endpoint':32} {'bytes':>9} {'regular ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for path, row in results.items():
+        print(
+            f"{path:32} {row['bytes']:>9} {row['regular_ms']:>11.2f} "
+            f"{row['fast_ms']:>9.2f} {row['speedup']:>7.2f}x"
+        )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
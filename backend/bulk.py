@@ -0,0 +1,185 @@
+import json
+import os
+from typing import AsyncIterator, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import schemas
+from .db import Base
+from .writer import writer
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_rows(request: Request, schema: Type[BaseModel]) -> AsyncIterator[Row]:
+    """Yield ``(index, values, error)`` for each row of a JSON array or an NDJSON stream."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        lines = _iter_lines(request)
+    else:
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body")
+        if not isinstance(payload, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of rows"
+            )
+        lines = _iter_items(payload)
+
+    index = 0
+    async for item in lines:
+        try:
+            if isinstance(item, (str, bytes)):
+                values = schema.model_validate_json(item)
+            else:
+                values = schema.model_validate(item)
+        except ValidationError as exc:
+            yield index, None, str(exc.errors(include_url=False, include_context=False))
+        else:
+            yield index, values.model_dump(), None
+        index += 1
+
+
+async def _iter_items(items: list) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def load(
+    request: Request,
+    model: Type[Base],
+    schema: Type[BaseModel],
+    upsert_key: Optional[str] = None,
+    prepare=None,
+    after_insert=None,
+) -> schemas.BulkResponse:
+    """Insert (or upsert on ``upsert_key``) every row of the request in chunked transactions.
+
+    Only table columns are inserted; ``after_insert(db, ids, rows)`` runs in the same
+    transaction with the new ids and the full rows, for values stored elsewhere.
+    """
+    results: List[schemas.BulkItemResult] = []
+    chunk: List[Tuple[int, dict]] = []
+
+    async for index, values, error in iter_rows(request, schema):
+        if error is not None:
+            results.append(schemas.BulkItemResult(index=index, status="error", error=error))
+            continue
+        chunk.append((index, prepare(values) if prepare else values))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            results.extend(await _write_chunk(model, chunk, upsert_key, after_insert))
+            chunk = []
+    if chunk:
+        results.extend(await _write_chunk(model, chunk, upsert_key, after_insert))
+
+    results.sort(key=lambda item: item.index)
+    return schemas.BulkResponse(
+        created=sum(item.status == "created" for item in results),
+        updated=sum(item.status == "updated" for item in results),
+        failed=sum(item.status == "error" for item in results),
+        items=results,
+    )
+
+
+async def _write_chunk(
+    model: Type[Base], chunk: List[Tuple[int, dict]], upsert_key: Optional[str], after_insert=None
+) -> List[schemas.BulkItemResult]:
+    """Write the chunk in one statement; if that fails, row by row so only bad rows fail.
+
+    Each attempt runs in its own SAVEPOINT, so the rows that fail leave nothing behind and
+    the others are committed with the chunk.
+    """
+    rows = [values for _, values in chunk]
+    columns = model.__table__.columns
+    column_rows = [
+        {name: value for name, value in values.items() if name in columns} for values in rows
+    ]
+
+    async def insert_rows(db: AsyncSession, positions: List[int]) -> List[int]:
+        if upsert_key is not None:
+            statement = sqlite_insert(model)
+            statement = statement.on_conflict_do_update(
+                index_elements=[upsert_key],
+                set_={
+                    name: statement.excluded[name] for name in column_rows[0] if name != upsert_key
+                },
+            )
+        else:
+            statement = insert(model)
+        async with db.begin_nested():
+            result = await db.execute(
+                statement.returning(model.id, sort_by_parameter_order=True),
+                [column_rows[position] for position in positions],
+            )
+            ids = [row_id for row_id, in result]
+            if after_insert is not None:
+                await after_insert(db, ids, [rows[position] for position in positions])
+        return ids
+
+    async def write(db: AsyncSession):
+        existing = set()
+        if upsert_key is not None:
+            key_column = getattr(model, upsert_key)
+            keys = [values[upsert_key] for values in rows]
+            existing = set(await db.scalars(select(key_column).where(key_column.in_(keys))))
+        positions = list(range(len(rows)))
+        try:
+            return dict(zip(positions, await insert_rows(db, positions))), {}, existing
+        except SQLAlchemyError:
+            if len(rows) == 1:
+                raise
+        ids, errors = {}, {}
+        for position in positions:
+            try:
+                ids[position] = (await insert_rows(db, [position]))[0]
+            except SQLAlchemyError as exc:
+                errors[position] = str(getattr(exc, "orig", exc))
+        return ids, errors, existing
+
+    try:
+        ids, errors, existing = await writer.submit(write)
+    except Exception as exc:
+        return [
+            schemas.BulkItemResult(index=index, status="error", error=str(getattr(exc, "orig", exc)))
+            for index, _ in chunk
+        ]
+
+    results = []
+    for position, (index, values) in enumerate(chunk):
+        if position in errors:
+            results.append(
+                schemas.BulkItemResult(index=index, status="error", error=errors[position])
+            )
+            continue
+        # A key repeated within the chunk updates the row its first occurrence created.
+        created = not upsert_key or values[upsert_key] not in existing
+        if upsert_key:
+            existing.add(values[upsert_key])
+        results.append(
+            schemas.BulkItemResult(
+                index=index, id=ids[position], status="created" if created else "updated"
+            )
+        )
+    return results
@@ -0,0 +1,100 @@
+import os
+import zlib
+from typing import Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Card bodies live in card_contents, compressed, one row per card with a body. The cards rows
+# that the feed, counts and sync scans read stay small, and a body is only read and inflated
+# when a response includes it (``Card.content``).
+
+# "zlib", "zstd" (needs the zstandard package) or "none". Only new writes use it: every row
+# records its codec, so rows written under another setting stay readable.
+CARD_CONTENT_CODEC = os.getenv("CARD_CONTENT_CODEC", "zlib")
+CARD_CONTENT_LEVEL = int(os.getenv("CARD_CONTENT_LEVEL", "6"))
+# Bodies shorter than this (in bytes) are stored as is; compressing them gains nothing.
+CARD_CONTENT_MIN_SIZE = int(os.getenv("CARD_CONTENT_MIN_SIZE", "64"))
+
+MIGRATION_BATCH_SIZE = 1000
+
+if CARD_CONTENT_CODEC == "zstd" and zstandard is None:
+    raise RuntimeError("CARD_CONTENT_CODEC=zstd needs the zstandard package")
+if CARD_CONTENT_CODEC not in ("zlib", "zstd", "none"):
+    raise RuntimeError(f"Unknown CARD_CONTENT_CODEC: {CARD_CONTENT_CODEC}")
+
+
+def encode(text: str) -> Tuple[str, bytes]:
+    """``(codec, data)`` to store for ``text``."""
+    data = text.encode()
+    if len(data) < CARD_CONTENT_MIN_SIZE or CARD_CONTENT_CODEC == "none":
+        return "none", data
+    if CARD_CONTENT_CODEC == "zstd":
+        return "zstd", zstandard.ZstdCompressor(level=CARD_CONTENT_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, CARD_CONTENT_LEVEL)
+
+
+def content_row(card_id: int, text: str) -> dict:
+    """Values of a card_contents row, for Core inserts."""
+    codec, data = encode(text)
+    return {"card_id": card_id, "codec": codec, "data": data}
+
+
+def decode(codec: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Card content is zstd-compressed but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return bytes(data).decode()
+
+
+def register(dbapi_connection) -> None:
+    """Add ``card_inflate(codec, data)``, used by ``Card.content`` and the search index, to SQL."""
+    dbapi_connection.create_function("card_inflate", 2, decode, deterministic=True)
+
+
+def migrate_inline_content(engine: Engine) -> int:
+    """Move bodies from the old ``cards.content`` column into card_contents, then drop it.
+
+    Triggers on cards that mention the column are dropped first (SQLite refuses to drop a
+    column they reference); the modules that own them recreate them at startup. Returns the
+    number of bodies moved. Run ``VACUUM`` afterwards to give the freed pages back.
+    """
+    if "content" not in {column["name"] for column in inspect(engine).get_columns("cards")}:
+        return 0
+
+    moved = 0
+    with engine.begin() as conn:
+        triggers = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'cards' "
+            "AND sql LIKE '%content%'"
+        ).scalars().all()
+        for name in triggers:
+            conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+
+        last_id = 0
+        while True:
+            rows = conn.exec_driver_sql(
+                "SELECT id, content FROM cards WHERE id > ? AND content IS NOT NULL "
+                "ORDER BY id LIMIT ?",
+                (last_id, MIGRATION_BATCH_SIZE),
+            ).all()
+            if not rows:
+                break
+            conn.exec_driver_sql(
+                "INSERT OR REPLACE INTO card_contents (card_id, codec, data) VALUES (?, ?, ?)",
+                [(card_id, *encode(content)) for card_id, content in rows],
+            )
+            moved += len(rows)
+            last_id = rows[-1][0]
+        conn.exec_driver_sql("ALTER TABLE cards DROP COLUMN content")
+    return moved
@@ -0,0 +1,100 @@
+from fastapi import HTTPException, status
+from sqlalchemy import Boolean, Integer, column, func, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models, schemas
+
+# card_changes has one row per card id holding the sequence number of the card's latest change;
+# a deleted card keeps its row as a tombstone. The numbers are assigned by triggers, so every
+# write path (ORM, bulk inserts, cascades) is covered and they only ever grow.
+
+card_changes = table(
+    "card_changes",
+    column("card_id", Integer),
+    column("seq", Integer),
+    column("deleted", Boolean),
+)
+
+# Columns exposed by CardRead; trigger-maintained aggregates do not count as a change. A new
+# body (stored in card_contents) moves updated_at, see Card.content.
+_SYNCED_COLUMNS = "domain_id, title, description, status, owner_id, created_at, updated_at"
+_NEXT_SEQ = "(SELECT coalesce(max(seq), 0) + 1 FROM card_changes)"
+
+_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cards_changes_ai AFTER INSERT ON cards BEGIN
+        INSERT OR REPLACE INTO card_changes (card_id, seq, deleted) VALUES (new.id, {_NEXT_SEQ}, 0);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cards_changes_au AFTER UPDATE OF {_SYNCED_COLUMNS} ON cards BEGIN
+        INSERT OR REPLACE INTO card_changes (card_id, seq, deleted) VALUES (new.id, {_NEXT_SEQ}, 0);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cards_changes_ad AFTER DELETE ON cards BEGIN
+        INSERT OR REPLACE INTO card_changes (card_id, seq, deleted) VALUES (old.id, {_NEXT_SEQ}, 1);
+    END
+    """,
+)
+
+
+def ensure_triggers(engine: Engine) -> None:
+    with engine.begin() as conn:
+        created = not conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'card_changes'"
+        ).first()
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS card_changes ("
+            "card_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL, deleted BOOLEAN NOT NULL DEFAULT 0)"
+        )
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_card_changes_seq ON card_changes (seq)"
+        )
+        for ddl in _TRIGGERS:
+            conn.exec_driver_sql(ddl)
+        if created:
+            # Cards written before the log existed get their sequence numbers once.
+            conn.exec_driver_sql(
+                "INSERT INTO card_changes (card_id, seq, deleted) "
+                "SELECT id, row_number() OVER (ORDER BY id), 0 FROM cards"
+            )
+
+
+async def changes_since(db: AsyncSession, since: int, limit: int) -> schemas.CardChangesResponse:
+    """Cards changed after the ``since`` watermark, oldest change first, ``limit`` at a time."""
+    latest = await db.scalar(select(func.max(card_changes.c.seq))) or 0
+    if since > latest:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Unknown watermark, resync with since=0",
+        )
+
+    query = (
+        select(card_changes.c.seq, card_changes.c.card_id, card_changes.c.deleted, models.Card)
+        .select_from(card_changes)
+        .outerjoin(models.Card, models.Card.id == card_changes.c.card_id)
+        .where(card_changes.c.seq > since)
+        .options(selectinload(models.Card.stored_content))
+        .order_by(card_changes.c.seq)
+        .limit(limit + 1)
+    )
+    if since == 0:
+        # A client starting from scratch has nothing to delete.
+        query = query.where(card_changes.c.deleted.is_(False))
+    rows = (await db.execute(query)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return schemas.CardChangesResponse(
+        items=[
+            schemas.CardRead.model_validate(row.Card)
+            for row in rows
+            if not row.deleted and row.Card is not None
+        ],
+        deleted=[row.card_id for row in rows if row.deleted or row.Card is None],
+        next_since=rows[-1].seq if has_more else latest,
+        has_more=has_more,
+    )
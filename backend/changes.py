@@ -0,0 +1,115 @@
+import asyncio
+import os
+import uuid
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import schemas
+
+CHANGE_BACKLOG_SIZE = int(os.getenv("CHANGE_BACKLOG_SIZE", "1000"))
+CHANGE_QUEUE_SIZE = int(os.getenv("CHANGE_QUEUE_SIZE", "100"))
+
+# (sequence, {"entity": table name, "action": "created" | "updated" | "deleted", "ids": [...]})
+Change = Tuple[int, dict]
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[Optional[Change]]" = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+
+class Broadcaster:
+    """In-process fan-out of write notifications to the ``/stream/changes`` subscribers.
+
+    Every change gets the next sequence number and stays in a backlog of ``backlog_size``
+    entries, from which reconnecting clients resume. Event ids carry an epoch unique to this
+    broadcaster, so an id issued before a restart or by another worker is never taken for a
+    position in this backlog. Subscribers have bounded queues: one that
+    fills up is emptied and marked as overflowed, and its reader catches up from the backlog
+    with the changes coalesced to the latest action per row.
+    """
+
+    def __init__(self, backlog_size: int = CHANGE_BACKLOG_SIZE, queue_size: int = CHANGE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.epoch = uuid.uuid4().hex[:12]
+        self.sequence = 0
+        self.backlog: Deque[Change] = deque(maxlen=backlog_size)
+        self._subscriptions: Set[Subscription] = set()
+
+    def publish(self, entity: str, action: str, ids: Iterable[Optional[int]]) -> None:
+        ids = sorted({item_id for item_id in ids if item_id is not None})
+        if not ids:
+            return
+        self.sequence += 1
+        change = (self.sequence, {"entity": entity, "action": action, "ids": ids})
+        self.backlog.append(change)
+        for subscription in self._subscriptions:
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                # Wake the reader so it notices the overflow.
+                subscription.queue.put_nowait(None)
+
+    def publish_bulk(self, entity: str, result: schemas.BulkResponse) -> None:
+        for action in ("created", "updated"):
+            self.publish(entity, action, (item.id for item in result.items if item.status == action))
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def position(self, event_id: str) -> Optional[int]:
+        """Sequence number of an event id issued by this broadcaster, otherwise None."""
+        epoch, _, sequence = event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def since(self, last_id: Optional[int]) -> Optional[List[Change]]:
+        """Coalesced changes after ``last_id``, or None when the backlog no longer covers them."""
+        if last_id is None or last_id > self.sequence:
+            return None
+        if last_id == self.sequence:
+            return []
+        if not self.backlog or self.backlog[0][0] > last_id + 1:
+            return None
+        return coalesce(change for change in self.backlog if change[0] > last_id)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+
+def coalesce(changes: Iterable[Change]) -> List[Change]:
+    """Keep only the latest action per row, regrouped by entity and action in sequence order."""
+    latest: Dict[Tuple[str, int], Tuple[int, str]] = {}
+    for sequence, change in changes:
+        for item_id in change["ids"]:
+            latest[(change["entity"], item_id)] = (sequence, change["action"])
+
+    groups: Dict[Tuple[str, str], List] = {}
+    for (entity, item_id), (sequence, action) in latest.items():
+        group = groups.setdefault((entity, action), [0, []])
+        group[0] = max(group[0], sequence)
+        group[1].append(item_id)
+
+    return sorted(
+        (sequence, {"entity": entity, "action": action, "ids": sorted(ids)})
+        for (entity, action), (sequence, ids) in groups.items()
+    )
+
+
+broadcaster = Broadcaster()
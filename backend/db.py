@@ -1,20 +1,180 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, inspect, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn, CreateTable
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./myservice.db"
+from . import cardcontent, metrics
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./myservice.db")
+# Request handlers use the async driver; the sync engine is kept for schema setup and
+# maintenance commands in backend.manage.
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Pragmas applied to every new SQLite connection. "production" is meant for several workers
+# sharing one file: WAL lets readers run alongside the writer and busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked".
+SQLITE_PROFILES = {
+    "basic": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+
+
+def sqlite_pragmas():
+    """Pragmas of the configured profile; ``SQLITE_PRAGMA_<NAME>`` variables override single values."""
+    pragmas = dict(SQLITE_PROFILES[SQLITE_PROFILE])
+    prefix = "SQLITE_PRAGMA_"
+    for key, value in os.environ.items():
+        if key.startswith(prefix):
+            pragmas[key[len(prefix):].lower()] = value
+    return pragmas
+
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
 )
+_async_url = make_url(ASYNC_DATABASE_URL)
+_async_pool_class = _async_url.get_dialect().get_pool_class(_async_url)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    # The dialect's own pool choice, with connection checkout waits recorded for /metrics.
+    poolclass=(
+        metrics.TimedQueuePool if _async_pool_class is AsyncAdaptedQueuePool else _async_pool_class
+    ),
+)
+# Connections of this engine open their transactions with BEGIN IMMEDIATE, i.e. they take the
+# write lock up front and wait on busy_timeout rather than failing on a read-to-write upgrade.
+async_write_engine = async_engine.execution_options(sqlite_begin="IMMEDIATE")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncWriteSessionLocal = async_sessionmaker(
+    async_write_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def _configure_sqlite(sync_engine):
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see on_begin) instead of the driver's implicit
+        # transactions, which is what makes BEGIN IMMEDIATE and SAVEPOINT work on pysqlite.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        # Not a tuning knob: deletes rely on ON DELETE CASCADE (see init_db).
+        cursor.execute("PRAGMA foreign_keys=ON")
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+        cardcontent.register(dbapi_connection)
+
+    @event.listens_for(sync_engine, "begin")
+    def on_begin(conn):
+        mode = conn.get_execution_options().get("sqlite_begin")
+        conn.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+_configure_sqlite(engine)
+_configure_sqlite(async_engine.sync_engine)
+metrics.instrument(async_engine.sync_engine)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so columns and indexes added later
+    # need their own pass.
+    _add_missing_columns()
+    # Before the rebuild, which copies only the columns the models still have.
+    cardcontent.migrate_inline_content(engine)
+    _rebuild_outdated_foreign_keys()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def _rebuild_outdated_foreign_keys():
+    """Rebuild tables whose foreign keys differ from the models, keeping their rows.
+
+    SQLite cannot alter a constraint, so databases created before ``ON DELETE CASCADE`` get
+    their tables copied into a fresh definition. Triggers on a rebuilt table are dropped with
+    it; the modules that own them recreate them at startup. Indexes are recreated by init_db.
+    """
+    with engine.connect() as conn:
+        outdated = [
+            table
+            for table in Base.metadata.sorted_tables
+            if _foreign_keys_in_database(conn, table.name) != _foreign_keys_in_model(table)
+        ]
+        conn.commit()
+        if not outdated:
+            return
+
+        # Both pragmas are ignored inside a transaction, hence the driver connection. With
+        # enforcement on, DROP TABLE would cascade; legacy_alter_table stops the RENAME from
+        # validating triggers that reference the table while it is briefly missing.
+        dbapi_connection = conn.connection.driver_connection
+        dbapi_connection.execute("PRAGMA foreign_keys=OFF")
+        dbapi_connection.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            with conn.begin():
+                for table in outdated:
+                    name, rebuilt = table.name, f"{table.name}__rebuild"
+                    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+                    ddl = str(CreateTable(table).compile(dialect=engine.dialect))
+                    conn.exec_driver_sql(
+                        ddl.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {rebuilt} ", 1)
+                    )
+                    conn.exec_driver_sql(
+                        f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {name}"
+                    )
+                    conn.exec_driver_sql(f"DROP TABLE {name}")
+                    conn.exec_driver_sql(f"ALTER TABLE {rebuilt} RENAME TO {name}")
+        finally:
+            dbapi_connection.execute("PRAGMA legacy_alter_table=OFF")
+            dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def _foreign_keys_in_database(conn, table_name):
+    rows = conn.exec_driver_sql(f"PRAGMA foreign_key_list({table_name})").all()
+    return {(row[3], row[2], row[4], row[6].upper()) for row in rows}
+
+
+def _foreign_keys_in_model(table):
+    return {
+        (key.parent.name, key.column.table.name, key.column.name, (key.ondelete or "NO ACTION").upper())
+        for key in table.foreign_keys
+    }
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement
+
+from . import models, refcache, schemas
+from .changes import broadcaster
+from .db import AsyncSessionLocal, Base
+from .writer import writer
+
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "1000"))
+DELETE_JOB_HISTORY = int(os.getenv("DELETE_JOB_HISTORY", "100"))
+
+# A deletion step: the rows of a model matching a condition. Steps run children first, so
+# that each chunk removes a bounded number of rows; ON DELETE CASCADE on the final row of
+# the root sweeps up anything written in the meantime.
+Step = Tuple[Type[Base], ColumnElement]
+
+# Tables whose deletions /stream/changes announces; the cascade of a domain or a user
+# removes rows from each of them.
+STREAMED = (models.Card, models.Event, models.Source)
+
+
+def domain_steps(domain_id: int) -> List[Step]:
+    cards = select(models.Card.id).where(models.Card.domain_id == domain_id)
+    sources = select(models.Source.id).where(models.Source.domain_id == domain_id)
+    return [
+        (models.Event, models.Event.card_id.in_(cards)),
+        (models.CardRevision, models.CardRevision.card_id.in_(cards)),
+        (models.CardSource, models.CardSource.card_id.in_(cards)),
+        # Links of the domain's own cards belong to the step above; keeping them out of this
+        # one stops them being counted twice in the job total.
+        (
+            models.CardSource,
+            models.CardSource.source_id.in_(sources) & models.CardSource.card_id.not_in(cards),
+        ),
+        (models.Card, models.Card.domain_id == domain_id),
+        (models.Source, models.Source.domain_id == domain_id),
+        (models.Expert, models.Expert.domain_id == domain_id),
+    ]
+
+
+def user_steps(user_id: int) -> List[Step]:
+    cards = select(models.Card.id).where(models.Card.owner_id == user_id)
+    return [
+        (models.Event, models.Event.user_id == user_id),
+        (models.Event, models.Event.card_id.in_(cards)),
+        (models.CardRevision, models.CardRevision.card_id.in_(cards)),
+        (models.CardSource, models.CardSource.card_id.in_(cards)),
+        (models.Card, models.Card.owner_id == user_id),
+        (models.Expert, models.Expert.user_id == user_id),
+    ]
+
+
+async def streamed_ids(db: AsyncSession, steps: List[Step]) -> Dict[str, Set[int]]:
+    """Ids of the announced rows the steps cover, by table name."""
+    ids: Dict[str, Set[int]] = {}
+    for model, condition in steps:
+        if model in STREAMED:
+            found = await db.scalars(select(model.id).where(condition))
+            ids.setdefault(model.__tablename__, set()).update(found)
+    return ids
+
+
+def announce(ids: Dict[str, Set[int]]) -> None:
+    for entity, entity_ids in ids.items():
+        broadcaster.publish(entity, "deleted", entity_ids)
+
+
+class DeleteJob:
+    """Deletes a root row and its dependants in chunks, one group-commit job per chunk.
+
+    Between chunks the writer is free for other requests, so a large domain or user does
+    not hold the SQLite write lock for the whole deletion.
+    """
+
+    def __init__(self, entity: str, entity_id: int):
+        self.id = uuid.uuid4().hex
+        self.entity = entity
+        self.entity_id = entity_id
+        self.status = "running"
+        self.deleted = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def read(self) -> schemas.DeleteJobRead:
+        return schemas.DeleteJobRead(
+            id=self.id,
+            entity=self.entity,
+            entity_id=self.entity_id,
+            status=self.status,
+            deleted=self.deleted,
+            total=self.total,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+        )
+
+    async def run(self, root: Type[Base], steps: List[Step], finish: Callable[[], None]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                for model, condition in steps:
+                    self.total += await db.scalar(
+                        select(func.count()).select_from(model).where(condition)
+                    )
+            self.total += 1
+
+            for model, condition in steps:
+                while True:
+                    deleted = await writer.submit(_chunk_deleter(model, condition))
+                    self.deleted += len(deleted)
+                    refcache.forget_full_cards()
+                    if model in STREAMED:
+                        broadcaster.publish(model.__tablename__, "deleted", deleted)
+                    if len(deleted) < DELETE_CHUNK_SIZE:
+                        break
+            # Rows written since their step ran go with the root through ON DELETE CASCADE.
+            swept, deleted = await writer.submit(_root_deleter(root, self.entity_id, steps))
+            self.deleted += len(deleted)
+            announce(swept)
+            self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as exc:
+            self.status = "failed"
+            self.error = str(exc)
+        finally:
+            self.finished_at = datetime.utcnow()
+            finish()
+
+
+def _chunk_deleter(model: Type[Base], condition: ColumnElement):
+    async def remove(db: AsyncSession) -> List[int]:
+        chunk = select(model.id).where(condition).limit(DELETE_CHUNK_SIZE)
+        result = await db.execute(delete(model).where(model.id.in_(chunk)).returning(model.id))
+        return result.scalars().all()
+
+    return remove
+
+
+def _root_deleter(root: Type[Base], entity_id: int, steps: List[Step]):
+    async def remove(db: AsyncSession) -> Tuple[Dict[str, Set[int]], List[int]]:
+        swept = await streamed_ids(db, steps)
+        return swept, await _chunk_deleter(root, root.id == entity_id)(db)
+
+    return remove
+
+
+jobs: "OrderedDict[str, DeleteJob]" = OrderedDict()
+
+
+def start(
+    entity: str, entity_id: int, root: Type[Base], steps: List[Step], finish: Callable[[], None]
+) -> DeleteJob:
+    """Start deleting ``entity_id`` in the background; a deletion already running is reused."""
+    for job in jobs.values():
+        if job.entity == entity and job.entity_id == entity_id and job.status == "running":
+            return job
+
+    job = DeleteJob(entity, entity_id)
+    job.task = asyncio.get_running_loop().create_task(job.run(root, steps, finish))
+    jobs[job.id] = job
+    finished = [key for key, old in jobs.items() if old.status != "running"]
+    for key in finished[: max(0, len(jobs) - DELETE_JOB_HISTORY)]:
+        del jobs[key]
+    return job
+
+
+async def cancel_all() -> None:
+    """Stop running jobs (at shutdown); chunks already committed stay deleted."""
+    tasks = [job.task for job in jobs.values() if job.task is not None and not job.task.done()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,208 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import aggregates, models, schemas
+
+# ``events`` holds the hot window of EVENT_RETENTION_DAYS. Older events are moved into monthly
+# partitions (events_YYYY_MM) of a separate SQLite file attached as ``events_archive`` and are
+# folded into ``event_rollups``, so counts and cards.last_event_at still include them. Archive
+# partitions older than EVENT_ARCHIVE_MONTHS are dropped; their rollups are kept.
+
+EVENT_RETENTION_DAYS = int(os.getenv("EVENT_RETENTION_DAYS", "180"))
+EVENT_ARCHIVE_MONTHS = int(os.getenv("EVENT_ARCHIVE_MONTHS", "0"))
+EVENT_ARCHIVE_PATH = os.getenv("EVENT_ARCHIVE_PATH")
+
+ARCHIVE_SCHEMA = "events_archive"
+
+ARCHIVE_COLUMNS = ("id", "card_id", "user_id", "event_type", "payload", "created_at")
+_COLUMNS = ", ".join(ARCHIVE_COLUMNS)
+# Same text layout SQLAlchemy uses for DateTime columns on SQLite, so plain string comparison works.
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def archive_path(engine: Engine) -> str:
+    if EVENT_ARCHIVE_PATH:
+        return EVENT_ARCHIVE_PATH
+    return str(default_archive_path(Path(engine.url.database or "myservice.db")))
+
+
+def default_archive_path(database: Path) -> Path:
+    """Where the archive of ``database`` lives unless EVENT_ARCHIVE_PATH says otherwise."""
+    return database.with_name(f"{database.stem}-events{database.suffix or '.db'}")
+
+
+@contextmanager
+def attached(engine: Engine, write: bool = True):
+    """A connection with the archive attached as ``events_archive``.
+
+    With ``write`` its transactions take the write lock up front. Without it, a missing
+    archive file is not created: the connection is then yielded without the archive.
+    """
+    with engine.connect() as conn:
+        path = archive_path(engine)
+        if not write and not Path(path).exists():
+            yield conn
+            return
+        # ATTACH and DETACH are not allowed inside a transaction, so they go straight to the
+        # driver connection instead of through SQLAlchemy's BEGIN.
+        dbapi_connection = conn.connection.driver_connection
+        dbapi_connection.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        try:
+            yield conn.execution_options(sqlite_begin="IMMEDIATE") if write else conn
+        finally:
+            if conn.in_transaction():
+                conn.rollback()
+            dbapi_connection.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+
+def partitions(conn: Connection) -> List[str]:
+    """Archive partitions, oldest first; none when the archive is not attached."""
+    databases = [row[1] for row in conn.exec_driver_sql("PRAGMA database_list")]
+    if ARCHIVE_SCHEMA not in databases:
+        return []
+    return [
+        row[0]
+        for row in conn.exec_driver_sql(
+            f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master "
+            "WHERE type = 'table' AND name LIKE 'events\\_%' ESCAPE '\\' ORDER BY name"
+        )
+    ]
+
+
+def create_partition(conn: Connection, partition: str) -> None:
+    conn.exec_driver_sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{partition} (
+            id INTEGER PRIMARY KEY,
+            card_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            event_type VARCHAR NOT NULL,
+            payload TEXT,
+            created_at DATETIME NOT NULL
+        )
+        """
+    )
+    conn.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.ix_{partition}_card_id_created_at "
+        f"ON {partition} (card_id, created_at)"
+    )
+
+
+def archive(engine: Engine, before: Optional[datetime] = None) -> Dict[str, int]:
+    """Move events created before ``before`` (default: outside the retention window) to the archive.
+
+    Each month is moved in its own transaction. Returns the number of events archived and
+    of archive partitions dropped by :data:`EVENT_ARCHIVE_MONTHS`.
+    """
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=EVENT_RETENTION_DAYS)
+    cutoff = before.strftime(_DATETIME_FORMAT)
+
+    archived = 0
+    with attached(engine) as conn:
+        periods = [
+            row[0]
+            for row in conn.exec_driver_sql(
+                "SELECT DISTINCT substr(created_at, 1, 7) FROM events WHERE created_at < ?",
+                (cutoff,),
+            )
+        ]
+        conn.commit()
+        for period in sorted(periods):
+            with conn.begin():
+                archived += _archive_period(conn, period, cutoff)
+        dropped = _drop_expired_partitions(conn, before)
+    return {"archived": archived, "dropped_partitions": dropped}
+
+
+def _archive_period(conn: Connection, period: str, cutoff: str) -> int:
+    partition = _partition_name(period)
+    bounds = (period, _next_period(period), cutoff)
+    where = "created_at >= ? AND created_at < ? AND created_at < ?"
+
+    create_partition(conn, partition)
+    conn.exec_driver_sql(
+        f"INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.{partition} ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM events WHERE {where}",
+        bounds,
+    )
+    # Rollups go in before the delete: the events_aggregates_ad trigger reads them to keep
+    # cards.last_event_at unchanged.
+    conn.exec_driver_sql(
+        f"""
+        INSERT INTO event_rollups (card_id, period, event_count, last_event_at)
+        SELECT card_id, ?, count(*), max(created_at) FROM events WHERE {where} GROUP BY card_id
+        ON CONFLICT (card_id, period) DO UPDATE SET
+            event_count = event_count + excluded.event_count,
+            last_event_at = max(coalesce(last_event_at, excluded.last_event_at), excluded.last_event_at)
+        """,
+        (period, *bounds),
+    )
+    return conn.exec_driver_sql(f"DELETE FROM events WHERE {where}", bounds).rowcount
+
+
+def _drop_expired_partitions(conn: Connection, before: datetime) -> int:
+    if EVENT_ARCHIVE_MONTHS <= 0:
+        return 0
+    month = before.year * 12 + before.month - 1 - EVENT_ARCHIVE_MONTHS
+    oldest_kept = _partition_name(f"{month // 12:04d}-{month % 12 + 1:02d}")
+    with conn.begin():
+        expired = [
+            row[0]
+            for row in conn.exec_driver_sql(
+                f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master "
+                "WHERE type = 'table' AND name LIKE 'events\\_%' ESCAPE '\\' AND name < ?",
+                (oldest_kept,),
+            )
+        ]
+        for name in expired:
+            conn.exec_driver_sql(f"DROP TABLE {ARCHIVE_SCHEMA}.{name}")
+    return len(expired)
+
+
+def _partition_name(period: str) -> str:
+    return "events_" + period.replace("-", "_")
+
+
+def _next_period(period: str) -> str:
+    year, month = map(int, period.split("-"))
+    return f"{year + month // 12:04d}-{month % 12 + 1:02d}"
+
+
+async def card_counts(
+    db: AsyncSession, domain_id: Optional[int] = None
+) -> List[schemas.EventCount]:
+    """Per-card totals, read from the trigger-maintained cards.event_count/last_event_at."""
+    query = (
+        select(models.Card.id, models.Card.event_count, models.Card.last_event_at)
+        .where(models.Card.event_count > 0)
+        .order_by(models.Card.id)
+    )
+    if domain_id is not None:
+        query = query.where(models.Card.domain_id == domain_id)
+    result = await db.execute(query)
+    return [
+        schemas.EventCount(id=row.id, event_count=row.event_count, last_event_at=row.last_event_at)
+        for row in result
+    ]
+
+
+async def domain_counts(db: AsyncSession) -> List[schemas.EventCount]:
+    """Per-domain totals, read from the trigger-maintained domain_event_counts."""
+    counts = aggregates.domain_event_counts
+    result = await db.execute(
+        select(counts.c.domain_id, counts.c.event_count, counts.c.last_event_at)
+        .where(counts.c.event_count > 0)
+        .order_by(counts.c.domain_id)
+    )
+    return [
+        schemas.EventCount(id=row.domain_id, event_count=row.event_count, last_event_at=row.last_event_at)
+        for row in result
+    ]
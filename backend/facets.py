@@ -0,0 +1,146 @@
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from sqlalchemy import Integer, String, column, func, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from . import models, schemas, triggers
+
+# card_facet_counts holds, per facet column of cards and value, the number of cards the feed
+# lists (those with a domain and an owner). Triggers keep it current for every write path, so
+# the unfiltered facet counts of /cards/feed are one small read instead of a scan of cards.
+
+FACETS = ("domain_id", "status", "owner_id")
+
+card_facet_counts = table(
+    "card_facet_counts",
+    column("facet", String),
+    column("value"),
+    column("count", Integer),
+)
+
+Counts = Dict[str, Dict[object, int]]
+
+_LISTED = "{row}.domain_id IS NOT NULL AND {row}.owner_id IS NOT NULL"
+
+
+def _add(row: str) -> str:
+    return "\n".join(
+        f"""
+            INSERT INTO card_facet_counts (facet, value, count)
+            SELECT '{facet}', {row}.{facet}, 1 WHERE {_LISTED.format(row=row)}
+                AND {row}.{facet} IS NOT NULL
+            ON CONFLICT (facet, value) DO UPDATE SET count = count + 1;"""
+        for facet in FACETS
+    )
+
+
+def _remove(row: str) -> str:
+    return "\n".join(
+        f"""
+            UPDATE card_facet_counts SET count = count - 1
+            WHERE facet = '{facet}' AND value = {row}.{facet} AND {_LISTED.format(row=row)};"""
+        for facet in FACETS
+    )
+
+
+_TRIGGERS = {
+    "cards_facets_ai": f"""
+        CREATE TRIGGER cards_facets_ai AFTER INSERT ON cards BEGIN{_add("new")}
+        END
+    """,
+    "cards_facets_ad": f"""
+        CREATE TRIGGER cards_facets_ad AFTER DELETE ON cards BEGIN{_remove("old")}
+        END
+    """,
+    "cards_facets_au": f"""
+        CREATE TRIGGER cards_facets_au AFTER UPDATE OF {", ".join(FACETS)} ON cards
+        BEGIN{_remove("old")}{_add("new")}
+        END
+    """,
+}
+
+
+def ensure_triggers(engine: Engine) -> None:
+    """Create the counts table and install missing or outdated triggers, then recount once."""
+    with engine.begin() as conn:
+        created = not conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'card_facet_counts'"
+        ).first()
+        # ``value`` has no declared type, so ids stay integers and statuses stay text.
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS card_facet_counts ("
+            "facet TEXT NOT NULL, value NOT NULL, count INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (facet, value)) WITHOUT ROWID"
+        )
+        missing = triggers.install(conn, _TRIGGERS)
+    if created or missing:
+        repair(engine)
+
+
+def repair(engine: Engine) -> None:
+    """Recount card_facet_counts from cards."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM card_facet_counts")
+        for facet in FACETS:
+            conn.exec_driver_sql(
+                f"""
+                INSERT INTO card_facet_counts (facet, value, count)
+                SELECT '{facet}', {facet}, count(*) FROM cards
+                WHERE {_LISTED.format(row="cards")} AND {facet} IS NOT NULL
+                GROUP BY {facet}
+                """
+            )
+
+
+async def stored_counts(db: AsyncSession) -> Tuple[Counts, int]:
+    """Unfiltered counts from card_facet_counts, and the number of listed cards."""
+    result = await db.execute(
+        select(card_facet_counts.c.facet, card_facet_counts.c.value, card_facet_counts.c.count)
+        .where(card_facet_counts.c.count > 0)
+    )
+    counts: Counts = {facet: {} for facet in FACETS}
+    for facet, value, count in result:
+        counts[facet][value] = count
+    # Every listed card has a domain, so the domain counts add up to the total.
+    return counts, sum(counts["domain_id"].values())
+
+
+async def query_counts(db: AsyncSession, base_query: Select) -> Tuple[Counts, int]:
+    """Counts over the cards of ``base_query`` (filters and search applied), in one query.
+
+    Cards are grouped by all facet columns at once and the groups are folded per facet here;
+    there are at most as many groups as domain, status and owner combinations in the result.
+    """
+    columns = [getattr(models.Card, facet) for facet in FACETS]
+    result = await db.execute(
+        base_query.with_only_columns(*columns, func.count(models.Card.id)).group_by(*columns)
+    )
+    counts: Counts = {facet: defaultdict(int) for facet in FACETS}
+    total = 0
+    for *values, count in result:
+        total += count
+        for facet, value in zip(FACETS, values):
+            if value is not None:
+                counts[facet][value] += count
+    return counts, total
+
+
+def to_schema(counts: Counts) -> schemas.CardFeedFacets:
+    """Most frequent values first."""
+    return schemas.CardFeedFacets(
+        **{
+            facet: [
+                schemas.FacetCount(value=value, count=count)
+                for value, count in sorted(values.items(), key=_by_count)
+            ]
+            for facet, values in counts.items()
+        }
+    )
+
+
+def _by_count(item):
+    value, count = item
+    return -count, str(value)
@@ -0,0 +1,54 @@
+import json
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Handlers that opt in return bytes produced here instead of letting FastAPI validate the
+# returned object against ``response_model`` and serialize it a second time. The JSON is the
+# same; FAST_JSON=0 switches back to the regular path (used by backend.bench.serialization).
+ENABLED = os.getenv("FAST_JSON", "1") != "0"
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON for plain data: dicts, lists, row values and datetimes."""
+    if ENABLED and orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    ).encode()
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@lru_cache(maxsize=None)
+def adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def respond(value: Any, schema: Optional[Any] = None, status_code: int = 200):
+    """Serialize ``value``, already an instance of ``schema``, without validating it again.
+
+    ``schema`` defaults to the type of ``value``; pass it for generics such as ``List[X]``.
+    With the fast path disabled ``value`` is returned unchanged for FastAPI to handle.
+    """
+    if not ENABLED:
+        return value
+    body = adapter(schema or type(value)).dump_json(value)
+    return Response(content=body, status_code=status_code, media_type="application/json")
@@ -0,0 +1,78 @@
+import os
+from typing import AsyncIterator, List, Optional, Type
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from . import fastjson
+from .db import AsyncSessionLocal, Base
+
+LIST_BATCH_SIZE = int(os.getenv("LIST_BATCH_SIZE", "500"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> List[str]:
+    """Validate a ``fields=a,b`` projection against ``schema``; all fields when it is empty."""
+    if not fields:
+        return list(schema.model_fields)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return names
+
+
+def stream(
+    request: Request, model: Type[Base], schema: Type[BaseModel], fields: Optional[str] = None
+) -> StreamingResponse:
+    """Stream ``model`` rows as a JSON array, or as NDJSON when the client accepts it.
+
+    Only the projected columns are selected and rows are fetched from a server-side cursor
+    ``LIST_BATCH_SIZE`` at a time, so memory use does not depend on the table size.
+    """
+    names = parse_fields(fields, schema)
+    statement = _statement(model, names)
+    if wants_ndjson(request):
+        return StreamingResponse(_ndjson(statement, names), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_json_array(statement, names), media_type="application/json")
+
+
+async def render(model: Type[Base], names: List[str], ndjson: bool = False) -> bytes:
+    """Whole-body variant of :func:`stream` for small tables whose output is cached."""
+    statement = _statement(model, names)
+    chunks = _ndjson(statement, names) if ndjson else _json_array(statement, names)
+    return b"".join([chunk async for chunk in chunks])
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _statement(model: Type[Base], names: List[str]):
+    return select(*(getattr(model, name) for name in names)).order_by(model.id)
+
+
+async def _batches(statement, names: List[str]) -> AsyncIterator[List[bytes]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=LIST_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield [fastjson.dumps(dict(zip(names, row))) for row in partition]
+
+
+async def _ndjson(statement, names: List[str]) -> AsyncIterator[bytes]:
+    async for batch in _batches(statement, names):
+        yield b"".join(line + b"\n" for line in batch)
+
+
+async def _json_array(statement, names: List[str]) -> AsyncIterator[bytes]:
+    opened = False
+    async for batch in _batches(statement, names):
+        yield (b"," if opened else b"[") + b",".join(batch)
+        opened = True
+    yield b"]" if opened else b"[]"
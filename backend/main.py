@@ -1,10 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import IntegrityError
 
-from . import models
-from .db import Base, engine
+from . import admission, aggregates, cardsync, deletes, facets, metrics, models, refcache, search
+from . import vectors, versions
+from .db import async_engine, engine, init_db
 from .routers import (
     users_router,
     domains_router,
@@ -13,21 +18,67 @@ from .routers import (
     experts_router,
     events_router,
     chat_router,
+    stream_router,
+    batch_router,
+    jobs_router,
+    export_router,
 )
+from .writer import writer
 
-Base.metadata.create_all(bind=engine)
+init_db()
+search.ensure_index(engine)
+aggregates.ensure_triggers(engine)
+facets.ensure_triggers(engine)
+versions.ensure_triggers(engine)
+cardsync.ensure_triggers(engine)
 
-app = FastAPI(title="MyService API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    vectors.index.load()
+    warm_up = asyncio.create_task(vectors.index.warm_up())
+    yield
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    await deletes.cancel_all()
+    await writer.close()
+    vectors.index.save()
+    await async_engine.dispose()
+
+
+app = FastAPI(title="MyService API", lifespan=lifespan)
+app.add_middleware(versions.ETagMiddleware)
+# Inside the metrics middleware, so shed requests are still counted and timed.
+app.add_middleware(admission.AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
 app.mount("/app", StaticFiles(directory=FRONTEND_DIR, html=True), name="app")
 
 
+@app.exception_handler(IntegrityError)
+async def integrity_error(request: Request, exc: IntegrityError):
+    # With foreign keys enforced, a reference to a missing row fails here instead of being stored.
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT, content={"detail": str(getattr(exc, "orig", exc))}
+    )
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return refcache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 app.include_router(users_router)
 app.include_router(domains_router)
 app.include_router(sources_router)
@@ -35,3 +86,7 @@ app.include_router(cards_router)
 app.include_router(experts_router)
 app.include_router(events_router)
 app.include_router(chat_router)
+app.include_router(stream_router)
+app.include_router(batch_router)
+app.include_router(jobs_router)
+app.include_router(export_router)
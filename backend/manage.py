@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+from . import aggregates, backup, cardsync, eventstore, facets, models, search, vectors, versions
+from .db import AsyncSessionLocal, engine, init_db
+
+
+def rebuild_search(args: argparse.Namespace) -> None:
+    search.ensure_index(engine)
+    search.rebuild_index(engine)
+    print("Search index rebuilt")
+
+
+def repair_aggregates(args: argparse.Namespace) -> None:
+    aggregates.ensure_triggers(engine)
+    repaired = aggregates.repair(engine)
+    facets.ensure_triggers(engine)
+    facets.repair(engine)
+    print(f"Card aggregates repaired: {repaired} card(s) updated, facet counts recounted")
+
+
+def archive_events(args: argparse.Namespace) -> None:
+    aggregates.ensure_triggers(engine)
+    before = datetime.fromisoformat(args.before) if args.before else None
+    result = eventstore.archive(engine, before)
+    print(
+        f"Events archived: {result['archived']} to {eventstore.archive_path(engine)}, "
+        f"expired partitions dropped: {result['dropped_partitions']}"
+    )
+
+
+def rebuild_vectors(args: argparse.Namespace) -> None:
+    cardsync.ensure_triggers(engine)
+
+    async def build() -> int:
+        async with AsyncSessionLocal() as db:
+            return await vectors.index.refresh(db)
+
+    asyncio.run(build())
+    path = vectors.default_path()
+    vectors.index.save(path)
+    print(f"Vector index rebuilt: {vectors.index.size} card(s) saved to {path}")
+
+
+def export_data(args: argparse.Namespace) -> None:
+    path = Path(args.output or f"myservice-export-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson.gz")
+    size = backup.export_to_file(engine, path)
+    print(f"Exported to {path} ({size} bytes)")
+
+
+def import_data(args: argparse.Namespace) -> None:
+    # The rows must pass through the same triggers as the live application.
+    search.ensure_index(engine)
+    aggregates.ensure_triggers(engine)
+    facets.ensure_triggers(engine)
+    versions.ensure_triggers(engine)
+    cardsync.ensure_triggers(engine)
+    try:
+        counts = backup.import_file(engine, Path(args.path), replace=args.replace)
+    except ValueError as exc:
+        raise SystemExit(f"Import failed: {exc}")
+    print("Imported: " + ", ".join(f"{name}={count}" for name, count in counts.items()))
+
+
+def snapshot(args: argparse.Namespace) -> None:
+    path = Path(args.output or f"myservice-snapshot-{datetime.utcnow():%Y%m%d-%H%M%S}.db")
+    archive = backup.snapshot(engine, path)
+    print(f"Snapshot written to {path}" + (f", event archive to {archive}" if archive else ""))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.manage", description="MyService maintenance commands"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_search_parser = subparsers.add_parser(
+        "rebuild-search", help="Rebuild the full-text index of cards from the cards table"
+    )
+    rebuild_search_parser.set_defaults(handler=rebuild_search)
+
+    repair_aggregates_parser = subparsers.add_parser(
+        "repair-aggregates",
+        help="Recompute the card and domain event aggregates and the feed facet counts",
+    )
+    repair_aggregates_parser.set_defaults(handler=repair_aggregates)
+
+    archive_events_parser = subparsers.add_parser(
+        "archive-events",
+        help="Move events older than EVENT_RETENTION_DAYS to monthly archive partitions",
+    )
+    archive_events_parser.add_argument(
+        "--before", help="Archive events created before this ISO date instead"
+    )
+    archive_events_parser.set_defaults(handler=archive_events)
+
+    rebuild_vectors_parser = subparsers.add_parser(
+        "rebuild-vectors", help="Re-embed every card into the chat retrieval index"
+    )
+    rebuild_vectors_parser.set_defaults(handler=rebuild_vectors)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Write every table to a gzip-compressed NDJSON file"
+    )
+    export_parser.add_argument("--output", help="Target file (default: timestamped name)")
+    export_parser.set_defaults(handler=export_data)
+
+    import_parser = subparsers.add_parser(
+        "import", help="Load an export file in one transaction"
+    )
+    import_parser.add_argument("path")
+    import_parser.add_argument(
+        "--replace", action="store_true", help="Delete the existing rows instead of requiring empty tables"
+    )
+    import_parser.set_defaults(handler=import_data)
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="Copy the live database with the SQLite backup API"
+    )
+    snapshot_parser.add_argument("--output", help="Target file (default: timestamped name)")
+    snapshot_parser.set_defaults(handler=snapshot)
+
+    args = parser.parse_args(argv)
+    init_db()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Process-local metrics in the Prometheus text format, served at /metrics. With several
+# workers every process reports its own numbers; scrape them separately or sum in queries.
+
+# Statements slower than this are logged with their route; 0 disables the log.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Requests running more statements than this are logged as a likely N+1; 0 disables.
+SLOW_REQUEST_STATEMENTS = int(os.getenv("SLOW_REQUEST_STATEMENTS", "50"))
+# Adds X-Query-Count and X-Query-Time-Ms to every response.
+METRICS_DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "0") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+logger = logging.getLogger("myservice.sql")
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.samples()
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (not cumulative), then the sum and total count.
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        names = self.labels + ("le",)
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, labels + (repr(float(bound)),))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {series[-1]}"
+
+
+class Collected(Metric):
+    """Values read from elsewhere at scrape time: ``collect`` yields ``(label values, value)``."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        labels: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    ):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+requests_total = Counter(
+    "myservice_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+request_duration = Histogram(
+    "myservice_http_request_duration_seconds",
+    "Time until the response is fully sent.",
+    ("method", "route"),
+)
+requests_in_flight = Gauge("myservice_http_requests_in_flight", "Requests being handled.")
+request_statements = Histogram(
+    "myservice_http_request_sql_statements",
+    "SQL statements executed per request.",
+    ("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+request_sql_seconds = Histogram(
+    "myservice_http_request_sql_seconds", "Time spent in SQL per request.", ("method", "route")
+)
+statements_total = Counter(
+    "myservice_sql_statements_total", "SQL statements, including the group-commit writer's."
+)
+slow_statements_total = Counter(
+    "myservice_sql_slow_statements_total", "Statements slower than SLOW_QUERY_MS.", ("route",)
+)
+checkout_wait = Histogram(
+    "myservice_db_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    buckets=WAIT_BUCKETS,
+)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "sql_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+def route_label(scope) -> str:
+    """The matched route template (``/cards/{card_id}``), so URLs do not explode the labels."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Records latency, status and the SQL work of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_stats(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if METRICS_DEBUG_HEADERS:
+                    # Streaming responses may run more statements after the headers are sent.
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(stats.statements).encode()))
+                    headers.append((b"x-query-time-ms", f"{stats.sql_seconds * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            requests_in_flight.dec()
+            _current.reset(token)
+            method, route = scope["method"], stats.route
+            requests_total.inc(method, route, str(status_code))
+            request_duration.observe(time.perf_counter() - started, method, route)
+            request_statements.observe(stats.statements, method, route)
+            request_sql_seconds.observe(stats.sql_seconds, method, route)
+            if SLOW_REQUEST_STATEMENTS and stats.statements > SLOW_REQUEST_STATEMENTS:
+                logger.warning(
+                    "%s %s ran %d SQL statements (%.1f ms)",
+                    method, route, stats.statements, stats.sql_seconds * 1000,
+                )
+
+
+def instrument(engine: Engine) -> None:
+    """Count and time every statement of ``engine`` (the sync engine behind an async one)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        _record(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        started = context.connection.info.get("metrics_started") if context.connection else None
+        if started:
+            _record(context.statement or "", time.perf_counter() - started.pop())
+
+
+def _record(statement: str, elapsed: float) -> None:
+    statements_total.inc()
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "-"
+        slow_statements_total.inc(route)
+        logger.warning("Slow SQL (%.1f ms) in %s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default aiosqlite pool, also recording how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe(time.perf_counter() - started)
@@ -1,8 +1,23 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    func,
+    inspect,
+    select,
+)
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
+from .. import cardcontent
 from ..db import Base
 
 
@@ -15,9 +30,15 @@ class User(Base):
     role = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    cards = relationship("Card", back_populates="owner", cascade="all, delete-orphan")
-    events = relationship("Event", back_populates="user", cascade="all, delete-orphan")
-    expert_profiles = relationship("Expert", back_populates="user", cascade="all, delete-orphan")
+    cards = relationship(
+        "Card", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True
+    )
+    events = relationship(
+        "Event", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
+    expert_profiles = relationship(
+        "Expert", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Domain(Base):
@@ -28,16 +49,24 @@ class Domain(Base):
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
 
-    sources = relationship("Source", back_populates="domain", cascade="all, delete-orphan")
-    cards = relationship("Card", back_populates="domain", cascade="all, delete-orphan")
-    experts = relationship("Expert", back_populates="domain", cascade="all, delete-orphan")
+    sources = relationship(
+        "Source", back_populates="domain", cascade="all, delete-orphan", passive_deletes=True
+    )
+    cards = relationship(
+        "Card", back_populates="domain", cascade="all, delete-orphan", passive_deletes=True
+    )
+    experts = relationship(
+        "Expert", back_populates="domain", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Source(Base):
     __tablename__ = "sources"
 
     id = Column(Integer, primary_key=True, index=True)
-    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    domain_id = Column(
+        Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     title = Column(String, nullable=False)
     type = Column(String, nullable=False)
     uri = Column(String, nullable=False)
@@ -45,34 +74,123 @@ class Source(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     domain = relationship("Domain", back_populates="sources")
-    cards = relationship("Card", secondary="cardsources", back_populates="sources")
+    cards = relationship(
+        "Card", secondary="cardsources", back_populates="sources", passive_deletes=True
+    )
 
 
 class Card(Base):
     __tablename__ = "cards"
+    __table_args__ = (Index("ix_cards_updated_at_id", "updated_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=True)
+    domain_id = Column(
+        Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=True, index=True
+    )
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    content = Column(Text, nullable=True)
     status = Column(String, nullable=True, default="draft")
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    owner_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
+    )
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Maintained by database triggers from cardsources and events (see backend/aggregates.py).
+    source_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_event_at = Column(DateTime, nullable=True)
+    event_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     domain = relationship("Domain", back_populates="cards")
     owner = relationship("User", back_populates="cards")
-    events = relationship("Event", back_populates="card", cascade="all, delete-orphan")
-    sources = relationship("Source", secondary="cardsources", back_populates="cards")
+    events = relationship(
+        "Event", back_populates="card", cascade="all, delete-orphan", passive_deletes=True
+    )
+    sources = relationship(
+        "Source", secondary="cardsources", back_populates="cards", passive_deletes=True
+    )
+    # Never lazy-loaded: handlers that return the content load it with the card.
+    stored_content = relationship(
+        "CardContent",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
+    )
+
+    @hybrid_property
+    def content(self):
+        stored = self.stored_content
+        return cardcontent.decode(stored.codec, stored.data) if stored is not None else None
+
+    @content.inplace.setter
+    def _content_setter(self, value):
+        stored = self.stored_content
+        if value is None:
+            # Assigned even when empty, so a new card is returned with its content loaded.
+            self.stored_content = None
+            changed = stored is not None
+        elif stored is None or cardcontent.decode(stored.codec, stored.data) != value:
+            codec, data = cardcontent.encode(value)
+            if stored is None:
+                self.stored_content = CardContent(codec=codec, data=data)
+            else:
+                stored.codec, stored.data = codec, data
+            changed = True
+        else:
+            changed = False
+        if changed and inspect(self).persistent:
+            # The cards row itself is untouched otherwise, and a new body is a card update.
+            self.updated_at = datetime.utcnow()
+
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        return (
+            select(func.card_inflate(CardContent.codec, CardContent.data))
+            .where(CardContent.card_id == cls.id)
+            .scalar_subquery()
+        )
+
+
+class CardContent(Base):
+    """Compressed body of a card, see ``backend/cardcontent.py``."""
+
+    __tablename__ = "card_contents"
+
+    card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class CardRevision(Base):
+    """One recorded version of a card: a full keyframe or a delta, see ``backend/revisions.py``."""
+
+    __tablename__ = "card_revisions"
+    __table_args__ = (
+        Index("ix_card_revisions_card_id_number", "card_id", "number", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
+    number = Column(Integer, nullable=False)
+    # Number of the keyframe this revision is rebuilt from; equal to ``number`` for keyframes.
+    keyframe = Column(Integer, nullable=False)
+    changed = Column(String, nullable=False, default="")
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
 class Expert(Base):
     __tablename__ = "experts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    domain_id = Column(
+        Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     level = Column(String, nullable=False)
 
     user = relationship("User", back_populates="expert_profiles")
@@ -81,10 +199,16 @@ class Expert(Base):
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_card_id_created_at", "card_id", "created_at"),
+        Index("ix_events_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     event_type = Column(String, nullable=False)
     payload = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -93,12 +217,27 @@ class Event(Base):
     user = relationship("User", back_populates="events")
 
 
+class EventRollup(Base):
+    """Per-card monthly summary of events moved out of ``events`` by ``eventstore.archive``."""
+
+    __tablename__ = "event_rollups"
+
+    card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), primary_key=True)
+    period = Column(String, primary_key=True)
+    event_count = Column(Integer, nullable=False, default=0)
+    last_event_at = Column(DateTime, nullable=True)
+
+
 class CardSource(Base):
     __tablename__ = "cardsources"
 
     id = Column(Integer, primary_key=True, index=True)
-    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
-    source_id = Column(Integer, ForeignKey("sources.id"), nullable=False)
+    card_id = Column(
+        Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    source_id = Column(
+        Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     note = Column(String, nullable=True)
 
     card = relationship("Card", back_populates="card_sources")
@@ -106,8 +245,8 @@ class CardSource(Base):
 
 
 Card.card_sources = relationship(
-    "CardSource", back_populates="card", cascade="all, delete-orphan"
+    "CardSource", back_populates="card", cascade="all, delete-orphan", passive_deletes=True
 )
 Source.card_sources = relationship(
-    "CardSource", back_populates="source", cascade="all, delete-orphan"
+    "CardSource", back_populates="source", cascade="all, delete-orphan", passive_deletes=True
 )
@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(updated_at: datetime, card_id: int, score: Optional[float] = None) -> str:
+    """Keyset position after a card; ``score`` is its search relevance in a ranked listing."""
+    position = [updated_at.isoformat(), card_id]
+    if score is not None:
+        position.append(score)
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int, Optional[float]]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        updated_at, card_id, *score = json.loads(raw)
+        if len(score) > 1:
+            raise ValueError("Invalid cursor")
+        return (
+            datetime.fromisoformat(updated_at),
+            int(card_id),
+            float(score[0]) if score else None,
+        )
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -0,0 +1,234 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import listing, metrics, models, schemas, versions
+from .db import Base
+
+REFCACHE_MAXSIZE = int(os.getenv("REFCACHE_MAXSIZE", "10000"))
+REFCACHE_TTL_SECONDS = float(os.getenv("REFCACHE_TTL_SECONDS", "300"))
+# 0 disables the rendered /cards/{card_id}/full cache.
+FULL_CARD_CACHE_SIZE = int(os.getenv("FULL_CARD_CACHE_SIZE", "1000"))
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire ``ttl`` seconds after being stored.
+
+    Routers invalidate entries on their own writes. Writes by other worker processes are
+    noticed through the table versions (see ``_observe``); the TTL is a last resort.
+    """
+
+    def __init__(
+        self, name: str, maxsize: int = REFCACHE_MAXSIZE, ttl: float = REFCACHE_TTL_SECONDS
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; values computed from reads that started before an
+        # invalidation are dropped instead of being cached (see ``set``).
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self.generation += 1
+        self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        self.generation += 1
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+domains = TTLCache("domains")
+users = TTLCache("users")
+lists = TTLCache("lists", maxsize=64)
+full_cards = TTLCache("full_cards", maxsize=FULL_CARD_CACHE_SIZE)
+
+CACHES = (domains, users, lists, full_cards)
+
+# Latest version of each cached table seen by any request of this process.
+_seen_versions: Dict[str, int] = {}
+
+metrics.Collected(
+    "myservice_cache_hits_total", "Reference cache hits.", "counter", ("cache",),
+    lambda: (((cache.name,), cache.hits) for cache in CACHES),
+)
+metrics.Collected(
+    "myservice_cache_misses_total", "Reference cache misses.", "counter", ("cache",),
+    lambda: (((cache.name,), cache.misses) for cache in CACHES),
+)
+metrics.Collected(
+    "myservice_cache_entries", "Entries held by each reference cache.", "gauge", ("cache",),
+    lambda: (((cache.name,), len(cache._data)) for cache in CACHES),
+)
+
+
+async def _load_many(
+    db: AsyncSession,
+    cache: TTLCache,
+    model: Type[Base],
+    schema: Type[BaseModel],
+    ids: Iterable[Optional[int]],
+) -> Dict[int, BaseModel]:
+    _, fresh = await _observe(db, model.__tablename__)
+    generation = cache.generation
+    found = {}
+    missing = set()
+    for item_id in set(ids):
+        if item_id is None:
+            continue
+        value = cache.get(item_id)
+        if value is None:
+            missing.add(item_id)
+        else:
+            found[item_id] = value
+
+    if missing:
+        columns = [getattr(model, name) for name in schema.model_fields]
+        result = await db.execute(select(*columns).where(model.id.in_(missing)))
+        for row in result.mappings():
+            value = schema.model_validate(dict(row))
+            if fresh:
+                cache.set(value.id, value, generation)
+            found[value.id] = value
+    return found
+
+
+async def domain_shorts(
+    db: AsyncSession, ids: Iterable[Optional[int]]
+) -> Dict[int, schemas.DomainShort]:
+    return await _load_many(db, domains, models.Domain, schemas.DomainShort, ids)
+
+
+async def user_shorts(
+    db: AsyncSession, ids: Iterable[Optional[int]]
+) -> Dict[int, schemas.UserShort]:
+    return await _load_many(db, users, models.User, schemas.UserShort, ids)
+
+
+def store_domain(domain: models.Domain) -> None:
+    domains.invalidate(domain.id)
+    domains.set(domain.id, schemas.DomainShort.model_validate(domain))
+    _clear_lists("domains")
+    full_cards.clear()
+
+
+def forget_domain(domain_id: Optional[int] = None) -> None:
+    if domain_id is None:
+        domains.clear()
+    else:
+        domains.invalidate(domain_id)
+    _clear_lists("domains")
+    full_cards.clear()
+
+
+def store_user(user: models.User) -> None:
+    users.invalidate(user.id)
+    users.set(user.id, schemas.UserShort.model_validate(user))
+    _clear_lists("users")
+    full_cards.clear()
+
+
+def forget_user(user_id: Optional[int] = None) -> None:
+    if user_id is None:
+        users.clear()
+    else:
+        users.invalidate(user_id)
+    _clear_lists("users")
+    full_cards.clear()
+
+
+def forget_full_cards(card_ids: Optional[Iterable[Optional[int]]] = None) -> None:
+    """Drop rendered full cards; all of them when ``card_ids`` is not given."""
+    if card_ids is None:
+        full_cards.clear()
+        return
+    card_ids = {card_id for card_id in card_ids if card_id is not None}
+    if card_ids:
+        full_cards.invalidate_matching(lambda key: key[0] in card_ids)
+
+
+def _clear_lists(table: str) -> None:
+    lists.invalidate_matching(lambda key: key[0] == table)
+
+
+_TABLE_CACHES = {"domains": domains, "users": users}
+
+
+async def _observe(db: AsyncSession, table: str) -> Tuple[int, bool]:
+    """The version of ``table`` this request reads, and whether it may fill the caches.
+
+    A version newer than any seen before means another process wrote the table, so what this
+    process cached from it is dropped. A request reading an older snapshot gets ``False``.
+    """
+    version = await versions.version(db, table)
+    seen = _seen_versions.get(table)
+    if seen is None or version > seen:
+        _seen_versions[table] = version
+        if seen is not None:
+            _TABLE_CACHES[table].clear()
+            _clear_lists(table)
+    return version, version == _seen_versions[table]
+
+
+async def cached_list(
+    request: Request,
+    db: AsyncSession,
+    model: Type[Base],
+    schema: Type[BaseModel],
+    fields: Optional[str],
+) -> Response:
+    """Serve a whole reference-table list from memory, rendering it on a miss.
+
+    Bodies are kept per table version, so a list is re-rendered once any worker writes it.
+    """
+    names = tuple(listing.parse_fields(fields, schema))
+    ndjson = listing.wants_ndjson(request)
+    version, fresh = await _observe(db, model.__tablename__)
+    key = (model.__tablename__, names, ndjson, version)
+    body = lists.get(key)
+    if body is None:
+        generation = lists.generation
+        body = await listing.render(model, list(names), ndjson)
+        if fresh:
+            lists.set(key, body, generation)
+    media_type = listing.NDJSON_MEDIA_TYPE if ndjson else "application/json"
+    return Response(content=body, media_type=media_type)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {cache.name: cache.stats() for cache in CACHES}
@@ -0,0 +1,249 @@
+import difflib
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import fastjson, models, schemas
+
+# Every update of a card through the API stores a revision in card_revisions. Most revisions
+# are deltas against the previous one; every REVISION_KEYFRAME_INTERVAL-th is a full copy (a
+# keyframe), so rebuilding any revision replays at most that many rows. Text fields are
+# diffed by line: a delta keeps ``[start, end]`` ranges of the old lines and the new text in
+# between. Payloads are zlib-compressed JSON. The history of a card starts at its first
+# update, which also stores the state before it.
+
+REVISION_KEYFRAME_INTERVAL = int(os.getenv("REVISION_KEYFRAME_INTERVAL", "20"))
+REVISION_COMPRESSION_LEVEL = int(os.getenv("REVISION_COMPRESSION_LEVEL", "6"))
+
+FIELDS = ("domain_id", "title", "description", "content", "status", "owner_id")
+TEXT_FIELDS = ("description", "content")
+
+State = Dict[str, object]
+
+
+def snapshot(card: models.Card) -> State:
+    return {field: getattr(card, field) for field in FIELDS}
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def _text_delta(old: str, new: str) -> list:
+    old_lines, new_lines = _lines(old), _lines(new)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new_lines[j1:j2]))
+    return ops
+
+
+def _apply_text(old: str, ops: list) -> str:
+    old_lines = _lines(old)
+    return "".join(
+        "".join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops
+    )
+
+
+def _delta(before: State, after: State) -> dict:
+    delta = {}
+    for field in FIELDS:
+        old, new = before[field], after[field]
+        if old == new:
+            continue
+        if field in TEXT_FIELDS and old is not None and new is not None:
+            delta[field] = _text_delta(old, new)
+        else:
+            delta[field] = new
+    return delta
+
+
+def _apply(state: State, delta: dict) -> State:
+    state = dict(state)
+    for field, value in delta.items():
+        state[field] = _apply_text(state[field], value) if isinstance(value, list) else value
+    return state
+
+
+def _pack(payload: dict) -> bytes:
+    return zlib.compress(fastjson.dumps(payload), REVISION_COMPRESSION_LEVEL)
+
+
+def _unpack(data: bytes) -> dict:
+    return fastjson.loads(zlib.decompress(data))
+
+
+async def record(
+    db: AsyncSession, card_id: int, before: State, after: State, before_at: datetime
+) -> Optional[models.CardRevision]:
+    """Store ``after`` as the next revision of the card (inside the update's transaction).
+
+    ``before_at`` dates the first revision when the card has no history yet. Later revisions
+    are diffed against the rebuilt previous one rather than ``before``: a write that bypassed
+    the API leaves the row ahead of the history, and the delta has to cover it too.
+    """
+    if before == after:
+        return None
+    last = await db.scalar(
+        select(models.CardRevision)
+        .where(models.CardRevision.card_id == card_id)
+        .order_by(models.CardRevision.number.desc())
+        .limit(1)
+    )
+    if last is None:
+        data = _pack(before)
+        last = models.CardRevision(
+            card_id=card_id,
+            number=1,
+            keyframe=1,
+            changed="",
+            size=len(data),
+            data=data,
+            created_at=before_at,
+        )
+        db.add(last)
+        previous = before
+    else:
+        _, previous = (await load(db, card_id, [last.number]))[last.number]
+        if previous == after:
+            return None
+
+    number = last.number + 1
+    changed = ",".join(field for field in FIELDS if previous[field] != after[field])
+    data, keyframe = _pack(after), number
+    if number - last.keyframe < REVISION_KEYFRAME_INTERVAL:
+        delta = _pack(_delta(previous, after))
+        # A rewrite can make the delta larger than the whole card.
+        if len(delta) < len(data):
+            data, keyframe = delta, last.keyframe
+
+    revision = models.CardRevision(
+        card_id=card_id,
+        number=number,
+        keyframe=keyframe,
+        changed=changed,
+        size=len(data),
+        data=data,
+    )
+    db.add(revision)
+    return revision
+
+
+async def list_revisions(
+    db: AsyncSession, card_id: int, page: int, page_size: int
+) -> schemas.CardRevisionsResponse:
+    """Newest first, without reading the payloads."""
+    revisions = models.CardRevision
+    total = await db.scalar(
+        select(func.count()).select_from(revisions).where(revisions.card_id == card_id)
+    )
+    result = await db.execute(
+        select(
+            revisions.number,
+            revisions.keyframe,
+            revisions.changed,
+            revisions.size,
+            revisions.created_at,
+        )
+        .where(revisions.card_id == card_id)
+        .order_by(revisions.number.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    return schemas.CardRevisionsResponse(
+        items=[
+            schemas.CardRevisionShort(
+                number=row.number,
+                created_at=row.created_at,
+                keyframe=row.number == row.keyframe,
+                changed=row.changed.split(",") if row.changed else [],
+                size=row.size,
+            )
+            for row in result
+        ],
+        total=total,
+        page=page,
+        page_size=page_size,
+    )
+
+
+async def load(
+    db: AsyncSession, card_id: int, numbers: Iterable[int]
+) -> Dict[int, Tuple[datetime, State]]:
+    """Rebuild the given revisions; each needs only the rows from its keyframe onwards.
+
+    Revisions that share a keyframe chain are replayed together. Raises 404 for a number the
+    card does not have.
+    """
+    numbers = sorted(set(numbers))
+    revisions = models.CardRevision
+    targets = dict(
+        (
+            await db.execute(
+                select(revisions.number, revisions.keyframe).where(
+                    revisions.card_id == card_id, revisions.number.in_(numbers)
+                )
+            )
+        ).all()
+    )
+    missing = [number for number in numbers if number not in targets]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Revision {missing[0]} not found"
+        )
+
+    # [keyframe, number] ranges, merged where they overlap.
+    ranges: List[List[int]] = []
+    for number in numbers:
+        start = targets[number]
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = number
+        else:
+            ranges.append([start, number])
+
+    states = {}
+    for start, end in ranges:
+        rows = await db.execute(
+            select(revisions.number, revisions.keyframe, revisions.data, revisions.created_at)
+            .where(revisions.card_id == card_id, revisions.number.between(start, end))
+            .order_by(revisions.number)
+        )
+        state: State = {}
+        for row in rows:
+            payload = _unpack(row.data)
+            state = payload if row.number == row.keyframe else _apply(state, payload)
+            if row.number in targets:
+                states[row.number] = (row.created_at, state)
+    return states
+
+
+def diff(
+    card_id: int, from_number: int, to_number: int, old: State, new: State
+) -> schemas.CardRevisionDiff:
+    changes = []
+    for field in FIELDS:
+        if old[field] == new[field]:
+            continue
+        if field in TEXT_FIELDS:
+            lines = difflib.unified_diff(
+                _lines(old[field] or ""),
+                _lines(new[field] or ""),
+                fromfile=f"{field}@{from_number}",
+                tofile=f"{field}@{to_number}",
+            )
+            changes.append(
+                schemas.CardFieldDiff(field=field, diff=[line.rstrip("\n") for line in lines])
+            )
+        else:
+            changes.append(schemas.CardFieldDiff(field=field, old=old[field], new=new[field]))
+    return schemas.CardRevisionDiff(
+        card_id=card_id, from_number=from_number, to_number=to_number, changes=changes
+    )
@@ -5,6 +5,10 @@ from .cards import router as cards_router
 from .experts import router as experts_router
 from .events import router as events_router
 from .chat import router as chat_router
+from .batch import router as batch_router
+from .stream import router as stream_router
+from .jobs import router as jobs_router
+from .export import router as export_router
 
 __all__ = [
     "users_router",
@@ -14,4 +18,8 @@ __all__ = [
     "experts_router",
     "events_router",
     "chat_router",
+    "stream_router",
+    "batch_router",
+    "jobs_router",
+    "export_router",
 ]
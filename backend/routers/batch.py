@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from .. import asgi, schemas
+
+router = APIRouter(tags=["batch"])
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", "30"))
+
+READ_METHODS = ("GET", "HEAD")
+
+
+@router.post("/batch", response_model=schemas.BatchResponse)
+async def run_batch(batch: schemas.BatchRequest, request: Request):
+    """Run several API calls in one round trip.
+
+    Sub-requests go through the application itself, middleware included, and results come
+    back in request order. Consecutive reads run concurrently; a write waits for everything
+    before it and runs alone, so a batch behaves like the same calls made one by one.
+    """
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BATCH_MAX_REQUESTS} requests per batch",
+        )
+
+    responses: List[Optional[schemas.BatchSubResponse]] = [None] * len(batch.requests)
+    reads: List[int] = []
+
+    async def flush_reads():
+        results = await asyncio.gather(
+            *(_dispatch(request, batch.requests[index]) for index in reads)
+        )
+        for index, result in zip(reads, results):
+            responses[index] = result
+        reads.clear()
+
+    for index, sub_request in enumerate(batch.requests):
+        if sub_request.method.upper() in READ_METHODS:
+            reads.append(index)
+            continue
+        await flush_reads()
+        responses[index] = await _dispatch(request, sub_request)
+    await flush_reads()
+
+    return schemas.BatchResponse(responses=responses)
+
+
+async def _dispatch(parent: Request, sub_request: schemas.BatchSubRequest) -> schemas.BatchSubResponse:
+    path = sub_request.path.partition("?")[0]
+    if not path.startswith("/") or path.rstrip("/") == "/batch":
+        return schemas.BatchSubResponse(status=400, body={"detail": "Invalid sub-request path"})
+
+    headers = {"accept": parent.headers.get("accept", "application/json")}
+    headers.update(sub_request.headers or {})
+    try:
+        status_code, headers, raw = await asyncio.wait_for(
+            asgi.call(
+                parent.app,
+                sub_request.method,
+                sub_request.path,
+                sub_request.body,
+                headers,
+                parent=parent.scope,
+            ),
+            BATCH_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        return schemas.BatchSubResponse(status=504, body={"detail": "Sub-request timed out"})
+    except Exception:
+        # Only failures before the error middleware could answer get here.
+        return schemas.BatchSubResponse(status=500, body={"detail": "Internal Server Error"})
+
+    content = raw.decode() if raw else None
+    if raw and headers.get("content-type", "").startswith("application/json"):
+        content = json.loads(raw)
+    headers.pop("content-length", None)
+    return schemas.BatchSubResponse(status=status_code, headers=headers, body=content)
@@ -1,167 +1,429 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import and_, func, insert, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
-from .. import models, schemas
+from .. import bulk, cardcontent, cardsync, facets, fastjson, listing, models, pagination
+from .. import refcache, revisions, schemas, versions
+from .. import search as card_search
+from ..changes import broadcaster
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
 
-@router.get("/", response_model=List[schemas.CardRead])
-def list_cards(db: Session = Depends(get_db)):
-    return db.query(models.Card).all()
+def _with_default_status(payload: dict) -> dict:
+    if not payload.get("status"):
+        payload["status"] = "draft"
+    return payload
 
 
-@router.get("/{card_id}", response_model=schemas.CardRead)
-def get_card(card_id: int, db: Session = Depends(get_db)):
-    card = db.get(models.Card, card_id)
-    if not card:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
-    return card
+async def _insert_contents(db: AsyncSession, ids: List[int], rows: List[dict]) -> None:
+    contents = [
+        cardcontent.content_row(card_id, values["content"])
+        for card_id, values in zip(ids, rows)
+        if values.get("content") is not None
+    ]
+    if contents:
+        await db.execute(insert(models.CardContent), contents)
+
 
+@router.get(
+    "/",
+    response_model=List[schemas.CardRead],
+    dependencies=[Depends(versions.conditional("cards", "card_contents"))],
+)
+async def list_cards(request: Request, fields: Optional[str] = None):
+    return listing.stream(request, models.Card, schemas.CardRead, fields)
 
-@router.get("/feed", response_model=schemas.CardFeedResponse, tags=["cards_scenarios"])
-def get_cards_feed(
+
+@router.get(
+    "/feed",
+    response_model=schemas.CardFeedResponse,
+    tags=["cards_scenarios"],
+    dependencies=[Depends(versions.conditional("cards", "domains", "users"))],
+)
+async def get_cards_feed(
     domain_id: Optional[int] = None,
     status: Optional[str] = None,
     search: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    with_facets: bool = False,
+    db: AsyncSession = Depends(get_db),
 ):
+    """``with_facets`` adds the counts of the cards found by domain, status and owner."""
     page = max(page, 1)
     page_size = min(max(page_size, 1), 100)
+    if with_total is None:
+        with_total = after is None
 
-    base_query = (
-        db.query(models.Card)
-        .join(models.Domain)
-        .join(models.User)
-        .outerjoin(models.CardSource)
-        .outerjoin(models.Event)
+    # Domain and owner come from the reference cache, so only cards with both are listed.
+    base_query = select(models.Card).where(
+        models.Card.domain_id.is_not(None), models.Card.owner_id.is_not(None)
     )
 
     if domain_id is not None:
-        base_query = base_query.filter(models.Card.domain_id == domain_id)
+        base_query = base_query.where(models.Card.domain_id == domain_id)
     if status is not None:
-        base_query = base_query.filter(models.Card.status == status)
+        base_query = base_query.where(models.Card.status == status)
+
+    matches = None
     if search:
-        pattern = f"%{search}%"
-        base_query = base_query.filter(
-            or_(models.Card.title.ilike(pattern), models.Card.description.ilike(pattern))
+        match_query = card_search.build_match_query(
+            card_search.tokenize(search), columns=("title", "description")
         )
+        if match_query is None:
+            return fastjson.respond(
+                schemas.CardFeedResponse(
+                    items=[],
+                    total=0,
+                    page=page,
+                    page_size=page_size,
+                    facets=facets.to_schema({facet: {} for facet in facets.FACETS})
+                    if with_facets
+                    else None,
+                )
+            )
+        matches = card_search.ranked_matches(match_query)
+        base_query = base_query.join(matches, matches.c.card_id == models.Card.id)
 
-    total = base_query.with_entities(func.count(func.distinct(models.Card.id))).scalar()
-
-    results = (
-        base_query.with_entities(
-            models.Card.id.label("card_id"),
-            models.Card.title,
-            models.Card.status,
-            models.Card.created_at,
-            models.Card.updated_at,
-            models.Domain.id.label("domain_id"),
-            models.Domain.code.label("domain_code"),
-            models.Domain.name.label("domain_name"),
-            models.User.id.label("owner_id"),
-            models.User.name.label("owner_name"),
-            func.count(func.distinct(models.CardSource.source_id)).label("source_count"),
-            func.max(models.Event.created_at).label("last_event_at"),
-        )
-        .group_by(
-            models.Card.id,
-            models.Card.title,
-            models.Card.status,
-            models.Card.created_at,
-            models.Card.updated_at,
-            models.Domain.id,
-            models.Domain.code,
-            models.Domain.name,
-            models.User.id,
-            models.User.name,
+    total = feed_facets = None
+    if with_facets:
+        # Without filters the counts table answers; otherwise one grouped query over the
+        # matching cards, whose groups also add up to the total.
+        if domain_id is None and status is None and matches is None:
+            counts, facet_total = await facets.stored_counts(db)
+        else:
+            counts, facet_total = await facets.query_counts(db, base_query)
+        feed_facets = facets.to_schema(counts)
+        if with_total:
+            total = facet_total
+    elif with_total:
+        total = await db.scalar(base_query.with_only_columns(func.count(models.Card.id))) or 0
+
+    if after is not None:
+        try:
+            after_updated_at, after_id, after_score = pagination.decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # A ranked listing's cursor carries the score, so it only continues that listing.
+        if (after_score is None) != (matches is None):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after_position = tuple_(models.Card.updated_at, models.Card.id) < tuple_(
+            after_updated_at, after_id
         )
-        .order_by(models.Card.updated_at.desc())
+        if matches is not None:
+            after_position = or_(
+                matches.c.score > after_score,
+                and_(matches.c.score == after_score, after_position),
+            )
+        base_query = base_query.where(after_position)
+        page = 1
+
+    rows_query = base_query.with_only_columns(
+        models.Card.id.label("card_id"),
+        models.Card.title,
+        models.Card.status,
+        models.Card.created_at,
+        models.Card.updated_at,
+        models.Card.source_count,
+        models.Card.last_event_at,
+        models.Card.domain_id,
+        models.Card.owner_id,
+    )
+
+    if matches is not None:
+        rows_query = rows_query.add_columns(matches.c.score).order_by(matches.c.score)
+
+    result = await db.execute(
+        rows_query.order_by(models.Card.updated_at.desc(), models.Card.id.desc())
         .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
+        .limit(page_size + 1)
     )
+    results = result.all()
+
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last = results[-1]
+        next_cursor = pagination.encode_cursor(
+            last.updated_at, last.card_id, last.score if matches is not None else None
+        )
 
+    domains = await refcache.domain_shorts(db, (row.domain_id for row in results))
+    owners = await refcache.user_shorts(db, (row.owner_id for row in results))
+
+    # Every value comes from typed columns or cached models, so the items skip validation.
     items = [
-        schemas.CardFeedItem(
+        schemas.CardFeedItem.model_construct(
             id=row.card_id,
             title=row.title,
             status=row.status,
-            domain=schemas.DomainShort(id=row.domain_id, code=row.domain_code, name=row.domain_name),
-            owner=schemas.UserShort(id=row.owner_id, name=row.owner_name),
+            domain=domains[row.domain_id],
+            owner=owners[row.owner_id],
             source_count=row.source_count,
             last_event_at=row.last_event_at,
             created_at=row.created_at,
             updated_at=row.updated_at,
         )
         for row in results
+        if row.domain_id in domains and row.owner_id in owners
     ]
 
-    return schemas.CardFeedResponse(items=items, total=total or 0, page=page, page_size=page_size)
+    return fastjson.respond(
+        schemas.CardFeedResponse.model_construct(
+            items=items,
+            total=total,
+            page=page,
+            page_size=page_size,
+            next_cursor=next_cursor,
+            facets=feed_facets,
+        )
+    )
+
+
+@router.get(
+    "/changes",
+    response_model=schemas.CardChangesResponse,
+    dependencies=[Depends(versions.conditional("cards", "card_contents"))],
+)
+async def get_card_changes(since: int = 0, limit: int = 500, db: AsyncSession = Depends(get_db)):
+    """Cards created, updated or deleted after ``since``, the ``next_since`` of a previous call."""
+    limit = min(max(limit, 1), 5000)
+    return fastjson.respond(await cardsync.changes_since(db, max(since, 0), limit))
+
+
+@router.get(
+    "/{card_id}",
+    response_model=schemas.CardRead,
+    dependencies=[Depends(versions.conditional("cards", "card_contents"))],
+)
+async def get_card(card_id: int, db: AsyncSession = Depends(get_db)):
+    card = await db.get(models.Card, card_id, options=[joinedload(models.Card.stored_content)])
+    if not card:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+    return card
 
 
 @router.post("/", response_model=schemas.CardRead, status_code=status.HTTP_201_CREATED)
-def create_card(card: schemas.CardCreate, db: Session = Depends(get_db)):
-    payload = card.model_dump()
-    if not payload.get("status"):
-        payload["status"] = "draft"
-    db_card = models.Card(**payload)
-    db.add(db_card)
-    db.commit()
-    db.refresh(db_card)
+async def create_card(card: schemas.CardCreate):
+    db_card = await writer.add(models.Card(**_with_default_status(card.model_dump())))
+    broadcaster.publish("cards", "created", [db_card.id])
     return db_card
 
 
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_cards(request: Request):
+    """Create cards from a JSON array or an NDJSON stream."""
+    result = await bulk.load(
+        request,
+        models.Card,
+        schemas.CardCreate,
+        prepare=_with_default_status,
+        after_insert=_insert_contents,
+    )
+    broadcaster.publish_bulk("cards", result)
+    return result
+
+
 @router.put("/{card_id}", response_model=schemas.CardRead)
-def update_card(card_id: int, card: schemas.CardUpdate, db: Session = Depends(get_db)):
-    db_card = db.get(models.Card, card_id)
-    if not db_card:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+async def update_card(card_id: int, card: schemas.CardUpdate):
+    async def apply(db: AsyncSession):
+        db_card = await db.get(
+            models.Card, card_id, options=[joinedload(models.Card.stored_content)]
+        )
+        if not db_card:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
 
-    for key, value in card.model_dump(exclude_unset=True).items():
-        setattr(db_card, key, value)
+        before, before_at = revisions.snapshot(db_card), db_card.updated_at
+        for key, value in card.model_dump(exclude_unset=True).items():
+            setattr(db_card, key, value)
+        await revisions.record(db, card_id, before, revisions.snapshot(db_card), before_at)
+        return db_card
 
-    db.commit()
-    db.refresh(db_card)
+    db_card = await writer.submit(apply)
+    refcache.forget_full_cards([card_id])
+    broadcaster.publish("cards", "updated", [card_id])
     return db_card
 
 
 @router.delete("/{card_id}", response_model=schemas.CardRead)
-def delete_card(card_id: int, db: Session = Depends(get_db)):
-    db_card = db.get(models.Card, card_id)
-    if not db_card:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+async def delete_card(card_id: int):
+    async def remove(db: AsyncSession):
+        db_card = await db.get(
+            models.Card, card_id, options=[joinedload(models.Card.stored_content)]
+        )
+        if not db_card:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+
+        result = schemas.CardRead.model_validate(db_card)
+        await db.delete(db_card)
+        return result
 
-    result = schemas.CardRead.model_validate(db_card)
-    db.delete(db_card)
-    db.commit()
+    result = await writer.submit(remove)
+    refcache.forget_full_cards([card_id])
+    broadcaster.publish("cards", "deleted", [card_id])
     return result
 
 
-@router.get("/{card_id}/full", response_model=schemas.CardFull, tags=["cards_scenarios"])
-def get_full_card(card_id: int, db: Session = Depends(get_db)):
-    card = db.get(models.Card, card_id)
+@router.get(
+    "/{card_id}/full",
+    response_model=schemas.CardFull,
+    tags=["cards_scenarios"],
+    dependencies=[
+        Depends(
+            versions.conditional(
+                "cards", "card_contents", "domains", "users", "sources", "cardsources", "events"
+            )
+        )
+    ],
+)
+async def get_full_card(card_id: int, db: AsyncSession = Depends(get_db)):
+    """Card with its domain, owner, sources and latest events in a fixed number of queries.
+
+    The rendered JSON is kept in ``refcache.full_cards`` under the card's own state (see
+    ``_full_card_key``), so writes by any worker to this card show up at once while events
+    and links of other cards leave the entry alone.
+    """
+    key = await _full_card_key(db, card_id)
+    body = refcache.full_cards.get(key)
+    if body is None:
+        generation = refcache.full_cards.generation
+        body = (await _load_full_card(db, card_id)).model_dump_json().encode()
+        refcache.full_cards.set(key, body, generation)
+    return Response(content=body, media_type="application/json")
+
+
+_SOURCE_FIELDS = tuple(
+    getattr(models.Source, field) for field in schemas.SourceShort.model_fields
+)
+
+
+async def _full_card_key(db: AsyncSession, card_id: int) -> tuple:
+    """Cache key of a full card: fingerprints of its own rows and versions of shared tables.
+
+    The card row is represented by its ``card_changes`` number, events by their ids and
+    linked sources by the fields shown, so traffic on other cards keeps the entry. Writes
+    through this process's API also drop it; an event edited in place by another worker
+    shows up when the entry expires.
+    """
+    fingerprint = (
+        await db.execute(
+            select(
+                select(cardsync.card_changes.c.seq)
+                .where(cardsync.card_changes.c.card_id == card_id)
+                .scalar_subquery(),
+                select(func.group_concat(func.json_array(*_SOURCE_FIELDS)))
+                .join(models.CardSource, models.CardSource.source_id == models.Source.id)
+                .where(models.CardSource.card_id == card_id)
+                .scalar_subquery(),
+                select(func.count(models.Event.id))
+                .where(models.Event.card_id == card_id)
+                .scalar_subquery(),
+                select(func.max(models.Event.id))
+                .where(models.Event.card_id == card_id)
+                .scalar_subquery(),
+            )
+        )
+    ).one()
+    shared = [
+        await versions.version(db, table)
+        for table in ("card_contents", "domains", "users")
+    ]
+    return (card_id, *fingerprint, *shared)
+
+
+async def _load_full_card(db: AsyncSession, card_id: int) -> schemas.CardFull:
+    card = await db.get(
+        models.Card,
+        card_id,
+        options=[selectinload(models.Card.sources), joinedload(models.Card.stored_content)],
+    )
     if not card:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
 
-    events = (
-        db.query(models.Event)
-        .filter(models.Event.card_id == card_id)
+    result = await db.execute(
+        select(
+            models.Event.id,
+            models.Event.event_type,
+            models.Event.created_at,
+            models.Event.payload,
+            models.Event.user_id,
+        )
+        .where(models.Event.card_id == card_id)
         .order_by(models.Event.created_at.desc())
         .limit(20)
-        .all()
     )
+    events = result.all()
+
+    domains = await refcache.domain_shorts(db, [card.domain_id])
+    users = await refcache.user_shorts(db, [card.owner_id, *(event.user_id for event in events)])
 
     return schemas.CardFull(
         card=schemas.CardRead.model_validate(card),
-        domain=schemas.DomainShort.model_validate(card.domain),
-        owner=schemas.UserShort.model_validate(card.owner),
+        domain=domains.get(card.domain_id),
+        owner=users.get(card.owner_id),
         sources=[schemas.SourceShort.model_validate(source) for source in card.sources],
-        events=[schemas.EventShort.model_validate(event) for event in events],
+        events=[
+            schemas.EventShort(
+                id=event.id,
+                event_type=event.event_type,
+                created_at=event.created_at,
+                payload=event.payload,
+                user=users.get(event.user_id),
+            )
+            for event in events
+        ],
+    )
+
+
+@router.get(
+    "/{card_id}/revisions",
+    response_model=schemas.CardRevisionsResponse,
+    dependencies=[Depends(versions.conditional("cards", "card_revisions"))],
+)
+async def list_card_revisions(
+    card_id: int, page: int = 1, page_size: int = 20, db: AsyncSession = Depends(get_db)
+):
+    """Recorded versions of the card, newest first (history starts at its first update)."""
+    await _ensure_card(db, card_id)
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 100)
+    return await revisions.list_revisions(db, card_id, page, page_size)
+
+
+@router.get(
+    "/{card_id}/revisions/{number}",
+    response_model=schemas.CardRevisionRead,
+    dependencies=[Depends(versions.conditional("cards", "card_revisions"))],
+)
+async def get_card_revision(card_id: int, number: int, db: AsyncSession = Depends(get_db)):
+    await _ensure_card(db, card_id)
+    created_at, state = (await revisions.load(db, card_id, [number]))[number]
+    return schemas.CardRevisionRead(card_id=card_id, number=number, created_at=created_at, **state)
+
+
+@router.get(
+    "/{card_id}/revisions/{from_number}/diff/{to_number}",
+    response_model=schemas.CardRevisionDiff,
+    dependencies=[Depends(versions.conditional("cards", "card_revisions"))],
+)
+async def diff_card_revisions(
+    card_id: int, from_number: int, to_number: int, db: AsyncSession = Depends(get_db)
+):
+    await _ensure_card(db, card_id)
+    states = await revisions.load(db, card_id, [from_number, to_number])
+    return revisions.diff(
+        card_id, from_number, to_number, states[from_number][1], states[to_number][1]
     )
+
+
+async def _ensure_card(db: AsyncSession, card_id: int) -> None:
+    if await db.scalar(select(models.Card.id).where(models.Card.id == card_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
@@ -1,63 +1,114 @@
-from typing import List
+import json
+import weakref
+from typing import AsyncIterator, List
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import answers, models, refcache, schemas, search, vectors
 from ..db import get_db
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-@router.post("/mock", response_model=schemas.ChatMockResponse)
-def mock_chat(payload: schemas.ChatMockRequest, db: Session = Depends(get_db)):
-    keywords = [word.lower() for word in payload.message.split() if len(word.strip()) > 2]
+async def _used_cards(
+    payload: schemas.ChatMockRequest, db: AsyncSession
+) -> List[schemas.ChatUsedCard]:
+    keywords = search.tokenize(payload.message, min_length=3)
 
-    cards: List[models.Card] = []
+    cards = []
+    query = select(
+        models.Card.id, models.Card.title, models.Card.status, models.Card.domain_id
+    ).where(models.Card.domain_id.is_not(None))
 
     if payload.selected_card_ids:
-        cards = (
-            db.query(models.Card)
-            .join(models.Domain)
-            .filter(models.Card.id.in_(payload.selected_card_ids))
-            .all()
-        )
+        result = await db.execute(query.where(models.Card.id.in_(payload.selected_card_ids)))
+        cards = result.all()
     elif keywords:
-        query = db.query(models.Card).join(models.Domain)
-        patterns = [f"%{kw}%" for kw in keywords]
-        conditions = [
-            or_(
-                models.Card.title.ilike(pattern),
-                models.Card.description.ilike(pattern),
-                models.Card.content.ilike(pattern),
-            )
-            for pattern in patterns
-        ]
-        query = query.filter(or_(*conditions))
-        cards = query.limit(5).all()
-
-    used_cards = [
+        await vectors.index.refresh(db, wait=False)
+        [hits] = vectors.index.search(
+            vectors.vectorize([(payload.message, 1.0)]), k=5, domain_id=payload.domain_id
+        )
+        ranks = {card_id: rank for rank, (card_id, _) in enumerate(hits)}
+        result = await db.execute(query.where(models.Card.id.in_(ranks)))
+        cards = sorted(result.all(), key=lambda card: ranks[card.id])
+
+    domains = await refcache.domain_shorts(db, (card.domain_id for card in cards))
+
+    return [
         schemas.ChatUsedCard(
             id=card.id,
             title=card.title,
-            domain_name=card.domain.name if card.domain else None,
+            domain_name=domains[card.domain_id].name,
             status=card.status,
         )
         for card in cards
+        if card.domain_id in domains
     ]
 
-    if not used_cards:
-        answer = (
-            "Пока я не нашёл подходящих карточек по вашему запросу. "
-            "Попробуйте уточнить формулировку или добавить другие ключевые слова."
-        )
-    else:
-        titles = ", ".join(card.title for card in cards)
-        answer = (
-            f"По вашему запросу я отобрал {len(cards)} карточек: {titles}. "
-            "Сейчас сервис работает в режиме имитации и не генерирует полный текст ответа, "
-            "но вы можете открыть эти карточки и посмотреть подробности и источники."
+
+@router.post("/mock", response_model=schemas.ChatMockResponse)
+async def mock_chat(payload: schemas.ChatMockRequest, db: AsyncSession = Depends(get_db)):
+    used_cards = await _used_cards(payload, db)
+    return schemas.ChatMockResponse(answer=answers.stub_answer(used_cards), used_cards=used_cards)
+
+
+@router.post("/stream")
+async def stream_chat(
+    payload: schemas.ChatMockRequest, request: Request, db: AsyncSession = Depends(get_db)
+):
+    """Server-Sent Events: ``used_cards`` first, then ``chunk`` events and a final ``done``.
+
+    The answer comes from the configured :class:`answers.AnswerGenerator`; generation stops
+    when the client disconnects. At most ``CHAT_MAX_GENERATIONS`` run at once, further
+    requests get 429.
+    """
+    slot = answers.limiter.acquire()
+    if slot is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many answers are being generated, retry later",
+            headers={"Retry-After": "1"},
         )
+    try:
+        used_cards = await _used_cards(payload, db)
+    except BaseException:
+        slot.release()
+        raise
+
+    body = _answer_events(request, payload.message, used_cards, slot)
+    # Frees the slot even if the response is abandoned before the stream starts.
+    weakref.finalize(body, slot.release)
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _answer_events(
+    request: Request,
+    message: str,
+    used_cards: List[schemas.ChatUsedCard],
+    slot: answers.Slot,
+) -> AsyncIterator[str]:
+    chunks = answers.get_generator().generate(message, used_cards)
+    try:
+        yield _event("used_cards", [card.model_dump() for card in used_cards])
+        async for chunk in chunks:
+            if await request.is_disconnected():
+                return
+            yield _event("chunk", {"text": chunk})
+        yield _event("done", {})
+    except Exception as exc:
+        yield _event("error", {"detail": str(exc)})
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+        slot.release()
+
 
-    return schemas.ChatMockResponse(answer=answer, used_cards=used_cards)
+def _event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -1,57 +1,111 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, deletes, models, refcache, schemas, versions
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/domains", tags=["domains"])
 
 
-@router.get("/", response_model=List[schemas.DomainRead])
-def list_domains(db: Session = Depends(get_db)):
-    return db.query(models.Domain).all()
-
-
-@router.get("/{domain_id}", response_model=schemas.DomainRead)
-def get_domain(domain_id: int, db: Session = Depends(get_db)):
-    domain = db.get(models.Domain, domain_id)
+@router.get(
+    "/",
+    response_model=List[schemas.DomainRead],
+    dependencies=[Depends(versions.conditional("domains"))],
+)
+async def list_domains(
+    request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_db)
+):
+    return await refcache.cached_list(request, db, models.Domain, schemas.DomainRead, fields)
+
+
+@router.get(
+    "/{domain_id}",
+    response_model=schemas.DomainRead,
+    dependencies=[Depends(versions.conditional("domains"))],
+)
+async def get_domain(domain_id: int, db: AsyncSession = Depends(get_db)):
+    domain = await db.get(models.Domain, domain_id)
     if not domain:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
     return domain
 
 
 @router.post("/", response_model=schemas.DomainRead, status_code=status.HTTP_201_CREATED)
-def create_domain(domain: schemas.DomainCreate, db: Session = Depends(get_db)):
-    db_domain = models.Domain(**domain.model_dump())
-    db.add(db_domain)
-    db.commit()
-    db.refresh(db_domain)
+async def create_domain(domain: schemas.DomainCreate):
+    db_domain = await writer.add(models.Domain(**domain.model_dump()))
+    refcache.forget_domain(db_domain.id)
     return db_domain
 
 
-@router.put("/{domain_id}", response_model=schemas.DomainRead)
-def update_domain(domain_id: int, domain: schemas.DomainUpdate, db: Session = Depends(get_db)):
-    db_domain = db.get(models.Domain, domain_id)
-    if not db_domain:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_domains(request: Request, upsert: bool = False):
+    """Create domains from a JSON array or an NDJSON stream; ``upsert`` matches on ``code``."""
+    result = await bulk.load(
+        request, models.Domain, schemas.DomainCreate, upsert_key="code" if upsert else None
+    )
+    refcache.forget_domain()
+    return result
 
-    for key, value in domain.model_dump(exclude_unset=True).items():
-        setattr(db_domain, key, value)
 
-    db.commit()
-    db.refresh(db_domain)
+@router.put("/{domain_id}", response_model=schemas.DomainRead)
+async def update_domain(domain_id: int, domain: schemas.DomainUpdate):
+    async def apply(db: AsyncSession):
+        db_domain = await db.get(models.Domain, domain_id)
+        if not db_domain:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
+
+        for key, value in domain.model_dump(exclude_unset=True).items():
+            setattr(db_domain, key, value)
+        return db_domain
+
+    db_domain = await writer.submit(apply)
+    refcache.store_domain(db_domain)
     return db_domain
 
 
-@router.delete("/{domain_id}", response_model=schemas.DomainRead)
-def delete_domain(domain_id: int, db: Session = Depends(get_db)):
-    db_domain = db.get(models.Domain, domain_id)
-    if not db_domain:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
-
-    result = schemas.DomainRead.model_validate(db_domain)
-    db.delete(db_domain)
-    db.commit()
+@router.delete(
+    "/{domain_id}",
+    response_model=schemas.DomainRead,
+    responses={status.HTTP_202_ACCEPTED: {"model": schemas.DeleteJobRead}},
+)
+async def delete_domain(
+    domain_id: int, background: bool = False, db: AsyncSession = Depends(get_db)
+):
+    """Delete the domain and everything that belongs to it (ON DELETE CASCADE).
+
+    With ``background=true`` the rows are removed in chunks by a job and the response is
+    ``202`` with the job, whose progress is at ``GET /jobs/{job_id}``.
+    """
+    if background:
+        if not await db.get(models.Domain, domain_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
+        job = deletes.start(
+            "domains",
+            domain_id,
+            models.Domain,
+            deletes.domain_steps(domain_id),
+            finish=lambda: refcache.forget_domain(domain_id),
+        )
+        return Response(
+            content=job.read().model_dump_json(),
+            status_code=status.HTTP_202_ACCEPTED,
+            media_type="application/json",
+        )
+
+    async def remove(db: AsyncSession):
+        db_domain = await db.get(models.Domain, domain_id)
+        if not db_domain:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Domain not found")
+
+        result = schemas.DomainRead.model_validate(db_domain)
+        cascade = await deletes.streamed_ids(db, deletes.domain_steps(domain_id))
+        await db.delete(db_domain)
+        return result, cascade
+
+    result, cascade = await writer.submit(remove)
+    refcache.forget_domain(domain_id)
+    deletes.announce(cascade)
     return result
@@ -1,57 +1,106 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, eventstore, fastjson, listing, models, refcache, schemas, versions
+from ..changes import broadcaster
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 
-@router.get("/", response_model=List[schemas.EventRead])
-def list_events(db: Session = Depends(get_db)):
-    return db.query(models.Event).all()
-
-
-@router.get("/{event_id}", response_model=schemas.EventRead)
-def get_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.get(models.Event, event_id)
+@router.get(
+    "/",
+    response_model=List[schemas.EventRead],
+    dependencies=[Depends(versions.conditional("events"))],
+)
+async def list_events(request: Request, fields: Optional[str] = None):
+    return listing.stream(request, models.Event, schemas.EventRead, fields)
+
+
+@router.get(
+    "/counts/cards",
+    response_model=List[schemas.EventCount],
+    dependencies=[Depends(versions.conditional("events", "cards"))],
+)
+async def count_events_by_card(domain_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """Event totals per card, archived events included."""
+    return fastjson.respond(
+        await eventstore.card_counts(db, domain_id), List[schemas.EventCount]
+    )
+
+
+@router.get(
+    "/counts/domains",
+    response_model=List[schemas.EventCount],
+    dependencies=[Depends(versions.conditional("events", "cards"))],
+)
+async def count_events_by_domain(db: AsyncSession = Depends(get_db)):
+    """Event totals per domain of the card, archived events included."""
+    return fastjson.respond(await eventstore.domain_counts(db), List[schemas.EventCount])
+
+
+@router.get(
+    "/{event_id}",
+    response_model=schemas.EventRead,
+    dependencies=[Depends(versions.conditional("events"))],
+)
+async def get_event(event_id: int, db: AsyncSession = Depends(get_db)):
+    event = await db.get(models.Event, event_id)
     if not event:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
     return event
 
 
 @router.post("/", response_model=schemas.EventRead, status_code=status.HTTP_201_CREATED)
-def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
-    db_event = models.Event(**event.model_dump())
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+async def create_event(event: schemas.EventCreate):
+    db_event = await writer.add(models.Event(**event.model_dump()))
+    refcache.forget_full_cards([db_event.card_id])
+    broadcaster.publish("events", "created", [db_event.id])
     return db_event
 
 
-@router.put("/{event_id}", response_model=schemas.EventRead)
-def update_event(event_id: int, event: schemas.EventUpdate, db: Session = Depends(get_db)):
-    db_event = db.get(models.Event, event_id)
-    if not db_event:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_events(request: Request):
+    """Create events from a JSON array or an NDJSON stream."""
+    result = await bulk.load(request, models.Event, schemas.EventCreate)
+    refcache.forget_full_cards()
+    broadcaster.publish_bulk("events", result)
+    return result
 
-    for key, value in event.model_dump(exclude_unset=True).items():
-        setattr(db_event, key, value)
 
-    db.commit()
-    db.refresh(db_event)
+@router.put("/{event_id}", response_model=schemas.EventRead)
+async def update_event(event_id: int, event: schemas.EventUpdate):
+    async def apply(db: AsyncSession):
+        db_event = await db.get(models.Event, event_id)
+        if not db_event:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+
+        previous_card_id = db_event.card_id
+        for key, value in event.model_dump(exclude_unset=True).items():
+            setattr(db_event, key, value)
+        return db_event, previous_card_id
+
+    db_event, previous_card_id = await writer.submit(apply)
+    refcache.forget_full_cards([previous_card_id, db_event.card_id])
+    broadcaster.publish("events", "updated", [event_id])
     return db_event
 
 
 @router.delete("/{event_id}", response_model=schemas.EventRead)
-def delete_event(event_id: int, db: Session = Depends(get_db)):
-    db_event = db.get(models.Event, event_id)
-    if not db_event:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
-
-    result = schemas.EventRead.model_validate(db_event)
-    db.delete(db_event)
-    db.commit()
+async def delete_event(event_id: int):
+    async def remove(db: AsyncSession):
+        db_event = await db.get(models.Event, event_id)
+        if not db_event:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+
+        result = schemas.EventRead.model_validate(db_event)
+        await db.delete(db_event)
+        return result
+
+    result = await writer.submit(remove)
+    refcache.forget_full_cards([result.card_id])
+    broadcaster.publish("events", "deleted", [event_id])
     return result
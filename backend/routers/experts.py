@@ -1,57 +1,71 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, listing, models, schemas, versions
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/experts", tags=["experts"])
 
 
-@router.get("/", response_model=List[schemas.ExpertRead])
-def list_experts(db: Session = Depends(get_db)):
-    return db.query(models.Expert).all()
+@router.get(
+    "/",
+    response_model=List[schemas.ExpertRead],
+    dependencies=[Depends(versions.conditional("experts"))],
+)
+async def list_experts(request: Request, fields: Optional[str] = None):
+    return listing.stream(request, models.Expert, schemas.ExpertRead, fields)
 
 
-@router.get("/{expert_id}", response_model=schemas.ExpertRead)
-def get_expert(expert_id: int, db: Session = Depends(get_db)):
-    expert = db.get(models.Expert, expert_id)
+@router.get(
+    "/{expert_id}",
+    response_model=schemas.ExpertRead,
+    dependencies=[Depends(versions.conditional("experts"))],
+)
+async def get_expert(expert_id: int, db: AsyncSession = Depends(get_db)):
+    expert = await db.get(models.Expert, expert_id)
     if not expert:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expert not found")
     return expert
 
 
 @router.post("/", response_model=schemas.ExpertRead, status_code=status.HTTP_201_CREATED)
-def create_expert(expert: schemas.ExpertCreate, db: Session = Depends(get_db)):
+async def create_expert(expert: schemas.ExpertCreate):
     db_expert = models.Expert(**expert.model_dump())
-    db.add(db_expert)
-    db.commit()
-    db.refresh(db_expert)
-    return db_expert
+    return await writer.add(db_expert)
+
+
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_experts(request: Request):
+    """Create experts from a JSON array or an NDJSON stream."""
+    return await bulk.load(request, models.Expert, schemas.ExpertCreate)
 
 
 @router.put("/{expert_id}", response_model=schemas.ExpertRead)
-def update_expert(expert_id: int, expert: schemas.ExpertUpdate, db: Session = Depends(get_db)):
-    db_expert = db.get(models.Expert, expert_id)
-    if not db_expert:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expert not found")
+async def update_expert(expert_id: int, expert: schemas.ExpertUpdate):
+    async def apply(db: AsyncSession):
+        db_expert = await db.get(models.Expert, expert_id)
+        if not db_expert:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expert not found")
 
-    for key, value in expert.model_dump(exclude_unset=True).items():
-        setattr(db_expert, key, value)
+        for key, value in expert.model_dump(exclude_unset=True).items():
+            setattr(db_expert, key, value)
+        return db_expert
 
-    db.commit()
-    db.refresh(db_expert)
-    return db_expert
+    return await writer.submit(apply)
 
 
 @router.delete("/{expert_id}", response_model=schemas.ExpertRead)
-def delete_expert(expert_id: int, db: Session = Depends(get_db)):
-    db_expert = db.get(models.Expert, expert_id)
-    if not db_expert:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expert not found")
+async def delete_expert(expert_id: int):
+    async def remove(db: AsyncSession):
+        db_expert = await db.get(models.Expert, expert_id)
+        if not db_expert:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expert not found")
+
+        result = schemas.ExpertRead.model_validate(db_expert)
+        await db.delete(db_expert)
+        return result
 
-    result = schemas.ExpertRead.model_validate(db_expert)
-    db.delete(db_expert)
-    db.commit()
-    return result
+    return await writer.submit(remove)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from .. import backup
+from ..db import engine
+
+router = APIRouter(tags=["export"])
+
+
+@router.get("/export")
+def export_dataset():
+    """Every table as gzip-compressed NDJSON (see :mod:`backend.backup`), streamed in batches.
+
+    The rows come from one read transaction, so the file is consistent while writes go on.
+    """
+    filename = f"myservice-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson.gz"
+    return StreamingResponse(
+        backup.gzipped(backup.iter_export(engine)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
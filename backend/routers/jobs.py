@@ -0,0 +1,20 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, status
+
+from .. import deletes, schemas
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=List[schemas.DeleteJobRead])
+async def list_jobs():
+    return [job.read() for job in reversed(deletes.jobs.values())]
+
+
+@router.get("/{job_id}", response_model=schemas.DeleteJobRead)
+async def get_job(job_id: str):
+    job = deletes.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job.read()
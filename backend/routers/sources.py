@@ -1,57 +1,81 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, listing, models, refcache, schemas, versions
+from ..changes import broadcaster
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/sources", tags=["sources"])
 
 
-@router.get("/", response_model=List[schemas.SourceRead])
-def list_sources(db: Session = Depends(get_db)):
-    return db.query(models.Source).all()
+@router.get(
+    "/",
+    response_model=List[schemas.SourceRead],
+    dependencies=[Depends(versions.conditional("sources"))],
+)
+async def list_sources(request: Request, fields: Optional[str] = None):
+    return listing.stream(request, models.Source, schemas.SourceRead, fields)
 
 
-@router.get("/{source_id}", response_model=schemas.SourceRead)
-def get_source(source_id: int, db: Session = Depends(get_db)):
-    source = db.get(models.Source, source_id)
+@router.get(
+    "/{source_id}",
+    response_model=schemas.SourceRead,
+    dependencies=[Depends(versions.conditional("sources"))],
+)
+async def get_source(source_id: int, db: AsyncSession = Depends(get_db)):
+    source = await db.get(models.Source, source_id)
     if not source:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
     return source
 
 
 @router.post("/", response_model=schemas.SourceRead, status_code=status.HTTP_201_CREATED)
-def create_source(source: schemas.SourceCreate, db: Session = Depends(get_db)):
-    db_source = models.Source(**source.model_dump())
-    db.add(db_source)
-    db.commit()
-    db.refresh(db_source)
+async def create_source(source: schemas.SourceCreate):
+    db_source = await writer.add(models.Source(**source.model_dump()))
+    broadcaster.publish("sources", "created", [db_source.id])
     return db_source
 
 
-@router.put("/{source_id}", response_model=schemas.SourceRead)
-def update_source(source_id: int, source: schemas.SourceUpdate, db: Session = Depends(get_db)):
-    db_source = db.get(models.Source, source_id)
-    if not db_source:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_sources(request: Request):
+    """Create sources from a JSON array or an NDJSON stream."""
+    result = await bulk.load(request, models.Source, schemas.SourceCreate)
+    broadcaster.publish_bulk("sources", result)
+    return result
 
-    for key, value in source.model_dump(exclude_unset=True).items():
-        setattr(db_source, key, value)
 
-    db.commit()
-    db.refresh(db_source)
+@router.put("/{source_id}", response_model=schemas.SourceRead)
+async def update_source(source_id: int, source: schemas.SourceUpdate):
+    async def apply(db: AsyncSession):
+        db_source = await db.get(models.Source, source_id)
+        if not db_source:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+
+        for key, value in source.model_dump(exclude_unset=True).items():
+            setattr(db_source, key, value)
+        return db_source
+
+    db_source = await writer.submit(apply)
+    refcache.forget_full_cards()
+    broadcaster.publish("sources", "updated", [source_id])
     return db_source
 
 
 @router.delete("/{source_id}", response_model=schemas.SourceRead)
-def delete_source(source_id: int, db: Session = Depends(get_db)):
-    db_source = db.get(models.Source, source_id)
-    if not db_source:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
-
-    result = schemas.SourceRead.model_validate(db_source)
-    db.delete(db_source)
-    db.commit()
+async def delete_source(source_id: int):
+    async def remove(db: AsyncSession):
+        db_source = await db.get(models.Source, source_id)
+        if not db_source:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+
+        result = schemas.SourceRead.model_validate(db_source)
+        await db.delete(db_source)
+        return result
+
+    result = await writer.submit(remove)
+    refcache.forget_full_cards()
+    broadcaster.publish("sources", "deleted", [source_id])
     return result
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from ..changes import Change, broadcaster
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+CHANGE_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_HEARTBEAT_SECONDS", "15"))
+
+
+@router.get("/changes")
+async def stream_changes(request: Request, last_event_id: Optional[str] = None):
+    """Server-Sent Events with the card, event and source changes made through the API.
+
+    Each ``change`` event carries ``entity``, ``action`` and ``ids``. A reconnecting client
+    (``Last-Event-ID`` header or ``last_event_id`` query parameter) gets what it missed; a
+    ``reset`` event means that is no longer known (the id is older than the backlog, or was
+    issued before a restart or by another worker) and the client should reload its data.
+    """
+    last_id = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        _events(last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _events(resume_from: Optional[str]) -> AsyncIterator[str]:
+    subscription = broadcaster.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        if resume_from is None:
+            last_id = broadcaster.sequence
+        else:
+            last_id = broadcaster.position(resume_from)
+            for chunk, last_id in _catch_up(last_id):
+                yield chunk
+
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                for chunk, last_id in _catch_up(last_id):
+                    yield chunk
+            try:
+                change = await asyncio.wait_for(
+                    subscription.queue.get(), CHANGE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield ": ping\n\n"
+                continue
+            if change is None or change[0] <= last_id:
+                continue
+            yield _format(change)
+            last_id = change[0]
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def _catch_up(last_id: Optional[int]):
+    changes = broadcaster.since(last_id)
+    if changes is None:
+        sequence = broadcaster.sequence
+        yield f"id: {broadcaster.event_id(sequence)}\nevent: reset\ndata: {{}}\n\n", sequence
+        return
+    for change in changes:
+        yield _format(change), change[0]
+
+
+def _format(change: Change) -> str:
+    sequence, data = change
+    return f"id: {broadcaster.event_id(sequence)}\nevent: change\ndata: {json.dumps(data)}\n\n"
@@ -1,57 +1,111 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, deletes, models, refcache, schemas, versions
 from ..db import get_db
+from ..writer import writer
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.get("/", response_model=List[schemas.UserRead])
-def list_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
-
-
-@router.get("/{user_id}", response_model=schemas.UserRead)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(models.User, user_id)
+@router.get(
+    "/",
+    response_model=List[schemas.UserRead],
+    dependencies=[Depends(versions.conditional("users"))],
+)
+async def list_users(
+    request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_db)
+):
+    return await refcache.cached_list(request, db, models.User, schemas.UserRead, fields)
+
+
+@router.get(
+    "/{user_id}",
+    response_model=schemas.UserRead,
+    dependencies=[Depends(versions.conditional("users"))],
+)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
 
 
 @router.post("/", response_model=schemas.UserRead, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = models.User(**user.model_dump())
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+async def create_user(user: schemas.UserCreate):
+    db_user = await writer.add(models.User(**user.model_dump()))
+    refcache.forget_user(db_user.id)
     return db_user
 
 
-@router.put("/{user_id}", response_model=schemas.UserRead)
-def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.get(models.User, user_id)
-    if not db_user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def bulk_create_users(request: Request, upsert: bool = False):
+    """Create users from a JSON array or an NDJSON stream; ``upsert`` matches on ``email``."""
+    result = await bulk.load(
+        request, models.User, schemas.UserCreate, upsert_key="email" if upsert else None
+    )
+    refcache.forget_user()
+    return result
 
-    for key, value in user.model_dump(exclude_unset=True).items():
-        setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(db_user)
+@router.put("/{user_id}", response_model=schemas.UserRead)
+async def update_user(user_id: int, user: schemas.UserUpdate):
+    async def apply(db: AsyncSession):
+        db_user = await db.get(models.User, user_id)
+        if not db_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        for key, value in user.model_dump(exclude_unset=True).items():
+            setattr(db_user, key, value)
+        return db_user
+
+    db_user = await writer.submit(apply)
+    refcache.store_user(db_user)
     return db_user
 
 
-@router.delete("/{user_id}", response_model=schemas.UserRead)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.get(models.User, user_id)
-    if not db_user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-    result = schemas.UserRead.model_validate(db_user)
-    db.delete(db_user)
-    db.commit()
+@router.delete(
+    "/{user_id}",
+    response_model=schemas.UserRead,
+    responses={status.HTTP_202_ACCEPTED: {"model": schemas.DeleteJobRead}},
+)
+async def delete_user(
+    user_id: int, background: bool = False, db: AsyncSession = Depends(get_db)
+):
+    """Delete the user and everything that belongs to it (ON DELETE CASCADE).
+
+    With ``background=true`` the rows are removed in chunks by a job and the response is
+    ``202`` with the job, whose progress is at ``GET /jobs/{job_id}``.
+    """
+    if background:
+        if not await db.get(models.User, user_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        job = deletes.start(
+            "users",
+            user_id,
+            models.User,
+            deletes.user_steps(user_id),
+            finish=lambda: refcache.forget_user(user_id),
+        )
+        return Response(
+            content=job.read().model_dump_json(),
+            status_code=status.HTTP_202_ACCEPTED,
+            media_type="application/json",
+        )
+
+    async def remove(db: AsyncSession):
+        db_user = await db.get(models.User, user_id)
+        if not db_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        result = schemas.UserRead.model_validate(db_user)
+        cascade = await deletes.streamed_ids(db, deletes.user_steps(user_id))
+        await db.delete(db_user)
+        return result, cascade
+
+    result, cascade = await writer.submit(remove)
+    refcache.forget_user(user_id)
+    deletes.announce(cascade)
     return result
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseModel, ConfigDict
 
@@ -131,6 +131,55 @@ class CardRead(CardBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CardChangesResponse(BaseModel):
+    items: List[CardRead]
+    deleted: List[int]
+    next_since: int
+    has_more: bool
+
+
+class CardRevisionShort(BaseModel):
+    number: int
+    created_at: datetime
+    keyframe: bool
+    changed: List[str]
+    size: int
+
+
+class CardRevisionsResponse(BaseModel):
+    items: List[CardRevisionShort]
+    total: int
+    page: int
+    page_size: int
+
+
+class CardRevisionRead(BaseModel):
+    card_id: int
+    number: int
+    created_at: datetime
+    domain_id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    content: Optional[str] = None
+    status: Optional[str] = None
+    owner_id: Optional[int] = None
+
+
+class CardFieldDiff(BaseModel):
+    field: str
+    old: Any = None
+    new: Any = None
+    # Unified diff lines, for the text fields.
+    diff: Optional[List[str]] = None
+
+
+class CardRevisionDiff(BaseModel):
+    card_id: int
+    from_number: int
+    to_number: int
+    changes: List[CardFieldDiff]
+
+
 class EventShort(BaseModel):
     id: int
     event_type: str
@@ -155,11 +204,24 @@ class CardFeedItem(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class CardFeedFacets(BaseModel):
+    domain_id: List[FacetCount]
+    status: List[FacetCount]
+    owner_id: List[FacetCount]
+
+
 class CardFeedResponse(BaseModel):
     items: List[CardFeedItem]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+    facets: Optional[CardFeedFacets] = None
 
 
 class CardFull(BaseModel):
@@ -217,10 +279,17 @@ class EventRead(EventBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class EventCount(BaseModel):
+    id: int
+    event_count: int
+    last_event_at: Optional[datetime] = None
+
+
 class ChatMockRequest(BaseModel):
     message: str
     card_id: Optional[int] = None
     selected_card_ids: Optional[List[int]] = None
+    domain_id: Optional[int] = None
 
 
 class ChatUsedCard(BaseModel):
@@ -233,3 +302,50 @@ class ChatUsedCard(BaseModel):
 class ChatMockResponse(BaseModel):
     answer: str
     used_cards: List[ChatUsedCard]
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    items: List[BulkItemResult]
+
+
+class BatchSubRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+
+class BatchSubResponse(BaseModel):
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+
+class DeleteJobRead(BaseModel):
+    id: str
+    entity: str
+    entity_id: int
+    status: str
+    deleted: int
+    total: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,161 @@
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import Integer, column, func, literal_column, select, table
+from sqlalchemy.engine import Engine
+
+FTS_TABLE = "cards_fts"
+
+# Column weights for bm25(): title matches outrank description, description outranks content.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 4.0
+CONTENT_WEIGHT = 1.0
+
+cards_fts = table(FTS_TABLE, column("rowid", Integer))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# The index reads its documents from a view, because card bodies are stored compressed in
+# card_contents (see backend/cardcontent.py). Triggers on both tables keep it in step: each
+# 'delete' has to repeat the values that were indexed, so they read the other table's current
+# row. Deleting a card cascades to its body before AFTER triggers on cards run, hence the
+# BEFORE DELETE trigger; the body triggers skip cards that are gone.
+DOCUMENTS_VIEW = "card_documents"
+
+_CONTENT_OF_CARD = (
+    "(SELECT card_inflate(codec, data) FROM card_contents WHERE card_id = {card_id})"
+)
+_CONTENT_OF_ROW = "card_inflate({row}.codec, {row}.data)"
+
+_SCHEMA_STATEMENTS = [
+    f"""
+    CREATE VIEW IF NOT EXISTS {DOCUMENTS_VIEW} AS
+    SELECT cards.id AS id, cards.title AS title, cards.description AS description,
+           card_inflate(card_contents.codec, card_contents.data) AS content
+    FROM cards LEFT JOIN card_contents ON card_contents.card_id = cards.id
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content,
+        content='{DOCUMENTS_VIEW}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON cards BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, {_CONTENT_OF_CARD.format(card_id="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_bd BEFORE DELETE ON cards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description,
+                {_CONTENT_OF_CARD.format(card_id="old.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON cards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description,
+                {_CONTENT_OF_CARD.format(card_id="old.id")});
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, {_CONTENT_OF_CARD.format(card_id="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_content_ai AFTER INSERT ON card_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content)
+        SELECT 'delete', id, title, description, NULL FROM cards WHERE id = new.card_id;
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content)
+        SELECT id, title, description, {_CONTENT_OF_ROW.format(row="new")}
+        FROM cards WHERE id = new.card_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_content_ad AFTER DELETE ON card_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content)
+        SELECT 'delete', id, title, description, {_CONTENT_OF_ROW.format(row="old")}
+        FROM cards WHERE id = old.card_id;
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content)
+        SELECT id, title, description, NULL FROM cards WHERE id = old.card_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_content_au AFTER UPDATE ON card_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content)
+        SELECT 'delete', id, title, description, {_CONTENT_OF_ROW.format(row="old")}
+        FROM cards WHERE id = old.card_id;
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content)
+        SELECT id, title, description, {_CONTENT_OF_ROW.format(row="new")}
+        FROM cards WHERE id = new.card_id;
+    END
+    """,
+]
+
+
+def ensure_index(engine: Engine) -> None:
+    """Create the FTS5 index of cards and its sync triggers if they are missing.
+
+    An index built over ``cards`` itself (before bodies moved to card_contents) is dropped
+    with its triggers and rebuilt from the view.
+    """
+    with engine.begin() as conn:
+        definition = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+        ).scalar()
+        created = definition is None or f"content='{DOCUMENTS_VIEW}'" not in definition
+        if definition is not None and created:
+            triggers = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                (f"{FTS_TABLE}_%",),
+            ).scalars().all()
+            for name in triggers:
+                conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+            conn.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+        for statement in _SCHEMA_STATEMENTS:
+            conn.exec_driver_sql(statement)
+    if created:
+        rebuild_index(engine)
+
+
+def rebuild_index(engine: Engine) -> None:
+    """Re-read every card into the FTS index (for databases filled before the index existed)."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def tokenize(value: str, min_length: int = 1) -> list:
+    return [token for token in _TOKEN_RE.findall(value.lower()) if len(token) >= min_length]
+
+
+def build_match_query(
+    tokens: Iterable[str], *, any_term: bool = False, columns: Optional[Iterable[str]] = None
+) -> Optional[str]:
+    """Turn plain tokens into an FTS5 MATCH expression with prefix matching on every term."""
+    terms = [f'"{token}"*' for token in tokens if token]
+    if not terms:
+        return None
+    expression = (" OR " if any_term else " AND ").join(terms)
+    if columns:
+        expression = "{%s} : (%s)" % (" ".join(columns), expression)
+    return expression
+
+
+def ranked_matches(match_query: str):
+    """CTE of ``(card_id, score)`` for cards matching ``match_query``; lower score is better.
+
+    The CTE is materialized because SQLite refuses ``bm25()`` once the FTS query is flattened
+    into an outer join.
+    """
+    fts = literal_column(FTS_TABLE)
+    return (
+        select(
+            cards_fts.c.rowid.label("card_id"),
+            func.bm25(fts, TITLE_WEIGHT, DESCRIPTION_WEIGHT, CONTENT_WEIGHT).label("score"),
+        )
+        .where(fts.op("MATCH")(match_query))
+        .cte("card_matches")
+        .prefix_with("MATERIALIZED")
+    )
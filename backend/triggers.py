@@ -0,0 +1,25 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy.engine import Connection
+
+# Trigger definitions live in the modules that own them (aggregates, facets). They are
+# compared with what sqlite_master holds, ignoring whitespace, so an edited definition
+# replaces the stored one at the next startup.
+
+
+def install(conn: Connection, triggers: Dict[str, str]) -> List[str]:
+    """Create missing triggers and replace outdated ones; returns the names (re)created."""
+    existing = dict(
+        conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").all()
+    )
+    changed = [
+        name for name, sql in triggers.items() if _normalize(existing.get(name)) != _normalize(sql)
+    ]
+    for name in changed:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(triggers[name])
+    return changed
+
+
+def _normalize(sql: Optional[str]) -> Optional[str]:
+    return " ".join(sql.split()) if sql else None
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import math
+import os
+import shutil
+import uuid
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cardsync, models, search
+from .db import AsyncSessionLocal, engine
+
+# Cards are embedded with signed feature hashing (words plus character trigrams, so Russian
+# word forms still overlap) into VECTOR_DIM float32 columns and L2-normalised; a query's
+# cosine similarity with every card is one matrix-vector product. Hashing needs no fitted
+# vocabulary, so a changed card is re-embedded on its own. IDF is applied to the query only,
+# from per-column document frequencies that upserts keep current.
+
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "1024"))
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.15"))
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH")
+VECTOR_BATCH_SIZE = int(os.getenv("VECTOR_BATCH_SIZE", "500"))
+
+FIELD_WEIGHTS = (("title", 3.0), ("description", 2.0), ("content", 1.0))
+
+_NO_DOMAIN = -1
+
+
+def _features(text: Optional[str]) -> Iterable[str]:
+    for token in search.tokenize(text or ""):
+        yield token
+        padded = f"<{token}>"
+        for start in range(len(padded) - 2):
+            yield padded[start:start + 3]
+
+
+def vectorize(fields: Iterable[Tuple[Optional[str], float]], dim: int = VECTOR_DIM) -> np.ndarray:
+    """Hash weighted ``(text, weight)`` pairs into one unit vector (all zeros for no features)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for text, weight in fields:
+        for feature, count in Counter(_features(text)).items():
+            digest = zlib.crc32(feature.encode())
+            sign = -1.0 if (digest // dim) & 1 else 1.0
+            vector[digest % dim] += sign * weight * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def vectorize_card(title: Optional[str], description: Optional[str], content: Optional[str]) -> np.ndarray:
+    texts = {"title": title, "description": description, "content": content}
+    return vectorize((texts[name], weight) for name, weight in FIELD_WEIGHTS)
+
+
+def _embed(rows) -> List[Optional[np.ndarray]]:
+    """Vectors of changed cards; None for a deleted card."""
+    return [
+        None if row.title is None else vectorize_card(row.title, row.description, row.content)
+        for row in rows
+    ]
+
+
+def default_path() -> Path:
+    if VECTOR_INDEX_PATH:
+        return Path(VECTOR_INDEX_PATH)
+    database = Path(engine.url.database or "myservice.db")
+    return database.with_name(f"{database.stem}-vectors")
+
+
+class VectorIndex:
+    """In-memory matrix of card vectors kept current from the ``card_changes`` log.
+
+    ``refresh`` applies the cards changed since ``watermark`` (all cards on first use), so
+    writes from any process reach the index; the embedding itself runs in a worker thread.
+    ``save``/``load`` persist it as .npy files in a version directory named by the ``CURRENT``
+    file, which is replaced in one rename; the matrix is memory-mapped on load, after which
+    only the changes made in between are re-embedded.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self._lock = asyncio.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.watermark = 0
+        self.size = 0
+        self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.domains = np.zeros(0, dtype=np.int64)
+        self.document_frequency = np.zeros(self.dim, dtype=np.int64)
+        self._rows = {}
+
+    def upsert(self, card_id: int, domain_id: Optional[int], vector: np.ndarray) -> None:
+        row = self._rows.get(card_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self._grow(max(64, 2 * self.size))
+            row = self._rows[card_id] = self.size
+            self.size += 1
+        else:
+            self.document_frequency -= self.matrix[row] != 0
+        self.document_frequency += vector != 0
+        self.matrix[row] = vector
+        self.ids[row] = card_id
+        self.domains[row] = _NO_DOMAIN if domain_id is None else domain_id
+
+    def remove(self, card_id: int) -> None:
+        row = self._rows.pop(card_id, None)
+        if row is None:
+            return
+        self.document_frequency -= self.matrix[row] != 0
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = self.ids[last]
+            self.domains[row] = self.domains[last]
+            self._rows[int(self.ids[row])] = row
+        self.size = last
+
+    def _grow(self, capacity: int) -> None:
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[: self.size] = self.matrix[: self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self.size] = self.ids[: self.size]
+        domains = np.full(capacity, _NO_DOMAIN, dtype=np.int64)
+        domains[: self.size] = self.domains[: self.size]
+        self.matrix, self.ids, self.domains = matrix, ids, domains
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        domain_id: Optional[int] = None,
+        min_score: float = VECTOR_MIN_SCORE,
+    ) -> List[List[Tuple[int, float]]]:
+        """Top ``k`` ``(card_id, score)`` pairs for each row of ``queries``, best first."""
+        queries = np.atleast_2d(queries)
+        if self.size == 0 or k <= 0:
+            return [[] for _ in queries]
+        idf = np.log((self.size + 1) / (self.document_frequency + 1)).astype(np.float32) + 1
+        queries = queries * idf
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+        scores = queries @ self.matrix[: self.size].T
+        if domain_id is not None:
+            scores[:, self.domains[: self.size] != domain_id] = -np.inf
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-query_scores[candidates], kind="stable")]
+            results.append(
+                [
+                    (int(self.ids[row]), float(query_scores[row]))
+                    for row in ordered
+                    if query_scores[row] >= min_score
+                ]
+            )
+        return results
+
+    async def refresh(self, db: AsyncSession, wait: bool = True) -> int:
+        """Re-embed cards changed since the last refresh; returns how many rows were applied.
+
+        With ``wait=False`` a refresh already running (the startup catch-up, or another
+        request's) is not waited for: nothing is applied and searches use the current matrix.
+        """
+        if not wait and self._lock.locked():
+            return 0
+        async with self._lock:
+            changes = cardsync.card_changes
+            latest = await db.scalar(select(func.max(changes.c.seq))) or 0
+            if latest < self.watermark:
+                # The database was replaced under a saved index.
+                self.clear()
+            if latest == self.watermark:
+                return 0
+            return await self._apply_changes(db)
+
+    async def warm_up(self) -> None:
+        """Refresh in a session of its own, so requests do not wait for the whole backlog."""
+        async with AsyncSessionLocal() as db:
+            await self.refresh(db)
+
+    async def _apply_changes(self, db: AsyncSession) -> int:
+        changes = cardsync.card_changes
+        result = await db.stream(
+            select(
+                changes.c.seq,
+                changes.c.card_id,
+                models.Card.domain_id,
+                models.Card.title,
+                models.Card.description,
+                models.Card.content,
+            )
+            .select_from(changes)
+            .outerjoin(models.Card, models.Card.id == changes.c.card_id)
+            .where(changes.c.seq > self.watermark)
+            .order_by(changes.c.seq)
+            .execution_options(yield_per=VECTOR_BATCH_SIZE)
+        )
+        applied = 0
+        async for rows in result.partitions():
+            # Hashing is CPU-bound, so it stays off the event loop; the matrix is only changed
+            # here, on the loop, where searches cannot see it half-updated.
+            embedded = await asyncio.to_thread(_embed, rows)
+            for row, vector in zip(rows, embedded):
+                if vector is None:
+                    self.remove(row.card_id)
+                else:
+                    self.upsert(row.card_id, row.domain_id, vector)
+                self.watermark = row.seq
+            applied += len(rows)
+        return applied
+
+    def save(self, path: Optional[Path] = None) -> None:
+        """Write a new version directory, then point ``CURRENT`` at it in one rename."""
+        path = path or default_path()
+        path.mkdir(parents=True, exist_ok=True)
+        previous = _current_version(path)
+        version = f"{self.watermark}-{uuid.uuid4().hex[:8]}"
+        (path / version).mkdir()
+        arrays = {
+            "matrix": self.matrix[: self.size],
+            "ids": self.ids[: self.size],
+            "domains": self.domains[: self.size],
+            "document_frequency": self.document_frequency,
+        }
+        for name, array in arrays.items():
+            np.save(path / version / f"{name}.npy", array)
+        meta = {"dim": self.dim, "size": self.size, "watermark": self.watermark}
+        (path / version / "meta.json").write_text(json.dumps(meta))
+        pointer = path / f"CURRENT.{version}.tmp"
+        pointer.write_text(version)
+        os.replace(pointer, path / "CURRENT")
+
+        # The previous version stays for a process that read CURRENT just before the switch;
+        # older ones go, as do the files of an index saved before version directories.
+        for entry in path.iterdir():
+            if entry.name in (version, previous):
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry, ignore_errors=True)
+            elif entry.suffix == ".npy" or entry.name == "meta.json":
+                entry.unlink(missing_ok=True)
+
+    def load(self, path: Optional[Path] = None) -> bool:
+        """Map a saved index; returns False (leaving the index empty) if there is none usable."""
+        path = path or default_path()
+        # An index saved before version directories keeps its files in ``path`` itself.
+        path = path / (_current_version(path) or "")
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            # Copy-on-write: pages are read lazily and updates stay in this process.
+            matrix = np.load(path / "matrix.npy", mmap_mode="c")
+            ids = np.load(path / "ids.npy")
+            domains = np.load(path / "domains.npy")
+            document_frequency = np.load(path / "document_frequency.npy")
+        except (OSError, ValueError):
+            return False
+        size = meta.get("size")
+        if (
+            meta.get("dim") != self.dim
+            or len(document_frequency) != self.dim
+            or not size == len(matrix) == len(ids) == len(domains)
+        ):
+            return False
+        self.matrix, self.ids, self.domains, self.size = matrix, ids, domains, size
+        self.document_frequency = document_frequency
+        self.watermark = meta["watermark"]
+        self._rows = {int(card_id): row for row, card_id in enumerate(ids)}
+        return True
+
+
+def _current_version(path: Path) -> Optional[str]:
+    try:
+        return (path / "CURRENT").read_text().strip() or None
+    except OSError:
+        return None
+
+
+index = VectorIndex()
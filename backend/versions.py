@@ -0,0 +1,123 @@
+import hashlib
+from typing import Dict, Iterable
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import Integer, String, column, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import get_db
+
+# Every write to a tracked table bumps its counter in table_versions (via triggers, so bulk
+# inserts and cascades count too). Conditional GETs compare an ETag derived from the counters
+# of the tables a response depends on, which costs one primary-key read instead of the query.
+
+TRACKED_TABLES = (
+    "users",
+    "domains",
+    "sources",
+    "cards",
+    "card_contents",
+    "card_revisions",
+    "cardsources",
+    "experts",
+    "events",
+)
+
+table_versions = table("table_versions", column("name", String), column("version", Integer))
+
+
+def ensure_triggers(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS table_versions ("
+            "name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+        )
+        for name in TRACKED_TABLES:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (name,)
+            )
+            for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+                conn.exec_driver_sql(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {name}_version_{suffix} AFTER {operation} ON {name}
+                    BEGIN
+                        UPDATE table_versions SET version = version + 1 WHERE name = '{name}';
+                    END
+                    """
+                )
+
+
+async def read(db: AsyncSession, tables: Iterable[str]) -> Dict[str, int]:
+    result = await db.execute(
+        select(table_versions.c.name, table_versions.c.version).where(
+            table_versions.c.name.in_(list(tables))
+        )
+    )
+    return dict(result.all())
+
+
+async def version(db: AsyncSession, table: str) -> int:
+    """Version of ``table`` as seen by this session, read at most once per session."""
+    known = db.info.setdefault("table_versions", {})
+    if table not in known:
+        known.update(await read(db, [table]))
+    return known[table]
+
+
+def conditional(*tables: str):
+    """Dependency that answers ``If-None-Match`` with 304 while ``tables`` are unchanged.
+
+    The ETag covers the URL and the negotiated format as well as the table versions; it is
+    stored on ``request.state`` and added to the successful response by :class:`ETagMiddleware`.
+    """
+
+    async def dependency(request: Request, db: AsyncSession = Depends(get_db)):
+        current = await read(db, tables)
+        db.info.setdefault("table_versions", {}).update(current)
+        fingerprint = repr(
+            (
+                request.url.path,
+                sorted(request.query_params.multi_items()),
+                request.headers.get("accept", ""),
+                sorted(current.items()),
+            )
+        )
+        etag = '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+        request.state.etag = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or etag in (value.strip() for value in if_none_match.split(","))
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": "no-cache"},
+            )
+
+    return dependency
+
+
+class ETagMiddleware:
+    """Adds the ETag computed by :func:`conditional` to 200 responses, streaming ones included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"etag", etag.encode()))
+                    headers.append((b"cache-control", b"no-cache"))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import AsyncWriteSessionLocal
+
+T = TypeVar("T")
+
+WriteJob = Callable[[AsyncSession], Awaitable[T]]
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "2"))
+
+
+class Writer:
+    """Single writer that runs queued jobs on one connection and commits them in groups.
+
+    Concurrent requests do not contend for the SQLite write lock: whatever jobs are queued
+    when the writer wakes up (up to ``batch_size``, waiting at most ``batch_delay`` seconds
+    for stragglers) share one transaction. Each job runs inside its own SAVEPOINT, so a
+    failing job is rolled back and re-raised to its caller without affecting the others.
+    """
+
+    def __init__(
+        self, batch_size: int = WRITE_BATCH_SIZE, batch_delay: float = WRITE_BATCH_DELAY_MS / 1000
+    ):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def submit(self, job: WriteJob) -> T:
+        """Run ``job(session)`` in the next group commit and return its result once committed."""
+        self._ensure_running()
+        future = self._loop.create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def add(self, obj: Any) -> Any:
+        async def insert(session: AsyncSession):
+            session.add(obj)
+            return obj
+
+        return await self.submit(insert)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._queue = self._task = self._loop = None
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # Started from an empty context so that the writer is not tied to the request
+            # that happened to start it (see metrics.MetricsMiddleware).
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                try:
+                    if timeout <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[WriteJob, asyncio.Future]]) -> None:
+        outcomes = []
+        try:
+            async with AsyncWriteSessionLocal() as session:
+                async with session.begin():
+                    for job, future in batch:
+                        if future.cancelled():
+                            continue
+                        try:
+                            # The savepoint flushes on exit, so constraint errors surface
+                            # only after the job itself has returned.
+                            async with session.begin_nested():
+                                result = await job(session)
+                        except Exception as exc:
+                            outcomes.append((future, None, exc))
+                        else:
+                            outcomes.append((future, result, None))
+                session.expunge_all()
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for future, result, exc in outcomes:
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+writer = Writer()
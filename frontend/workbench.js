@@ -14,6 +14,7 @@ const state = {
   domains: [],
   users: [],
   cardsCache: [],
+  cardsWatermark: 0,
   assistant: {
     query: "",
     searchBlocks: [],
@@ -183,10 +184,94 @@ async function fetchUsers() {
   return res.json();
 }
 
+// Подтягивает только изменения карточек с прошлой синхронизации и применяет их к state.cardsCache.
 async function fetchCards() {
-  const res = await fetch(`${API_BASE}/cards/`);
-  if (!res.ok) throw new Error("Не удалось загрузить карточки");
-  return res.json();
+  let hasMore = true;
+  while (hasMore) {
+    const res = await fetch(`${API_BASE}/cards/changes?since=${state.cardsWatermark}`);
+    if (res.status === 410) {
+      state.cardsWatermark = 0;
+      state.cardsCache = [];
+      continue;
+    }
+    if (!res.ok) throw new Error("Не удалось загрузить карточки");
+    hasMore = applyCardChanges(await res.json());
+  }
+  return state.cardsCache;
+}
+
+function applyCardChanges(delta) {
+  const byId = new Map(state.cardsCache.map((card) => [card.id, card]));
+  delta.deleted.forEach((id) => byId.delete(id));
+  delta.items.forEach((card) => byId.set(card.id, card));
+  state.cardsCache = Array.from(byId.values()).sort((a, b) => a.id - b.id);
+  state.cardsWatermark = delta.next_since;
+  return delta.has_more;
+}
+
+// Живые изменения из /stream/changes. EventSource сам переподключается и передаёт Last-Event-ID,
+// так что пропущенное за разрыв приходит следом; reset значит, что журнал разрыв уже не покрывает.
+// Сами карточки подтягиваются через /cards/changes, поэтому пачка событий стоит одного запроса.
+const liveChanges = { cards: false, detail: false, timer: null };
+
+function subscribeToChanges() {
+  if (!window.EventSource) return;
+  const source = new EventSource(`${API_BASE}/stream/changes`);
+  source.addEventListener("change", (event) => {
+    const change = JSON.parse(event.data);
+    if (change.entity === "cards") {
+      queueLiveRefresh(true, change.ids.includes(state.detail.currentId));
+    } else {
+      // События и источники приходят со своими id, поэтому открытая карточка перечитывается.
+      queueLiveRefresh(false, true);
+    }
+  });
+  source.addEventListener("reset", () => queueLiveRefresh(true, true));
+}
+
+function queueLiveRefresh(cards, detail) {
+  liveChanges.cards = liveChanges.cards || cards;
+  liveChanges.detail = liveChanges.detail || detail;
+  if (!liveChanges.timer) {
+    liveChanges.timer = setTimeout(applyLiveRefresh, 300);
+  }
+}
+
+async function applyLiveRefresh() {
+  const { cards, detail } = liveChanges;
+  Object.assign(liveChanges, { cards: false, detail: false, timer: null });
+  try {
+    if (cards) {
+      await fetchCards();
+      renderSelectedChips();
+      if (!el.registryView.classList.contains("hidden")) {
+        await loadRegistry();
+      }
+    }
+    if (detail && state.detail.currentId) {
+      await refreshCardDetail(state.detail.currentId);
+    }
+  } catch (err) {
+    console.error(err);
+  }
+}
+
+// Домены, пользователи и первая порция карточек одним запросом к /batch.
+async function fetchStartupData() {
+  const res = await fetch(`${API_BASE}/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      requests: [
+        { path: "/domains/" },
+        { path: "/users/" },
+        { path: `/cards/changes?since=${state.cardsWatermark}` },
+      ],
+    }),
+  });
+  if (!res.ok) throw new Error("Не удалось загрузить данные");
+  const { responses } = await res.json();
+  return responses.map((item) => (item.status === 200 ? item.body : null));
 }
 
 function fillSelect(select, items, formatLabel, formatValue = (item) => item.id) {
@@ -675,6 +760,22 @@ async function loadCardDetail(cardId) {
   }
 }
 
+// Перечитывает открытую карточку без индикатора загрузки; удалённая карточка показывает ошибку.
+async function refreshCardDetail(cardId) {
+  const res = await fetch(`${API_BASE}/cards/${cardId}/full`);
+  if (cardId !== state.detail.currentId) return;
+  if (res.ok) {
+    state.detail.data = await res.json();
+    state.detail.error = null;
+  } else if (res.status === 404) {
+    state.detail.data = null;
+    state.detail.error = "Карточка удалена";
+  } else {
+    return;
+  }
+  renderCardDetail();
+}
+
 function syncCardDetail() {
   const ids = Array.from(state.assistant.selections);
   const nextId = ids[0] || null;
@@ -752,6 +853,7 @@ function syncChatAvailability() {
 }
 
 function addChatMessage(text, from = "system", meta = {}) {
+  const entry = { from, text, meta };
   const msg = document.createElement("div");
   msg.className = `message ${from}`;
   const textEl = document.createElement("div");
@@ -773,7 +875,7 @@ function addChatMessage(text, from = "system", meta = {}) {
     copyBtn.className = "link-button";
     copyBtn.textContent = "Скопировать ответ";
     copyBtn.addEventListener("click", async () => {
-      const textToCopy = state.chat.hideSources ? text : `${text}\n\nИсточники: ${meta.usedCards
+      const textToCopy = state.chat.hideSources ? entry.text : `${entry.text}\n\nИсточники: ${meta.usedCards
         .map((c) => `${c.title} (${statusLabel(c.status)})`)
         .join(", ")}`;
       try {
@@ -796,7 +898,14 @@ function addChatMessage(text, from = "system", meta = {}) {
 
   el.chatHistory.appendChild(msg);
   el.chatHistory.scrollTop = el.chatHistory.scrollHeight;
-  state.chat.messages.push({ from, text, meta });
+  state.chat.messages.push(entry);
+
+  // Позволяет дописывать текст сообщения по мере поступления ответа.
+  return (nextText) => {
+    entry.text = nextText;
+    textEl.textContent = nextText;
+    el.chatHistory.scrollTop = el.chatHistory.scrollHeight;
+  };
 }
 
 function snapshotSelection() {
@@ -819,14 +928,14 @@ async function sendChat(message) {
   try {
     el.chatSend.disabled = true;
     el.prechatSend.disabled = true;
-    const res = await fetch(`${API_BASE}/chat/mock`, {
+    const res = await fetch(`${API_BASE}/chat/stream`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(payload),
     });
+    if (res.status === 429) throw new Error("Модель занята, попробуйте чуть позже");
     if (!res.ok) throw new Error("Ошибка обращения к модели");
-    const data = await res.json();
-    addChatMessage(data.answer, "bot", { usedCards: data.used_cards });
+    await readChatStream(res);
   } catch (err) {
     showNotification(err.message || "Не удалось получить ответ");
   } finally {
@@ -835,6 +944,36 @@ async function sendChat(message) {
   }
 }
 
+// Разбирает SSE-ответ /chat/stream: сначала used_cards, затем фрагменты текста ответа.
+async function readChatStream(res) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let answer = "";
+  let updateAnswer = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+      const name = (block.match(/^event: (.*)$/m) || [])[1];
+      const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || "null");
+      if (name === "used_cards") {
+        updateAnswer = addChatMessage("", "bot", { usedCards: data });
+      } else if (name === "chunk" && updateAnswer) {
+        answer += data.text;
+        updateAnswer(answer);
+      } else if (name === "error") {
+        throw new Error(data.detail || "Ошибка генерации ответа");
+      }
+    }
+  }
+}
+
 function handlePrechatStart() {
   const text = el.prechatInput.value.trim();
   if (!text) return;
@@ -1324,22 +1463,32 @@ function initEventHandlers() {
 
 async function init() {
   attachModalExtras();
+  // Если /batch недоступен или часть ответов с ошибкой, недостающее грузится отдельными запросами.
+  let [domains, users, cardChanges] = [null, null, null];
   try {
-    state.domains = await fetchDomains();
+    [domains, users, cardChanges] = await fetchStartupData();
+  } catch (err) {
+    console.error(err);
+  }
+
+  try {
+    state.domains = domains || (await fetchDomains());
     ensureAssistantOptions();
   } catch (err) {
     showNotification("Не удалось загрузить домены", "error", 3000);
   }
 
   try {
-    state.users = await fetchUsers();
+    state.users = users || (await fetchUsers());
     ensureUserOptions();
   } catch (err) {
     showNotification("Не удалось загрузить пользователей", "error", 3000);
   }
 
   try {
-    state.cardsCache = await fetchCards();
+    if (!cardChanges || applyCardChanges(cardChanges)) {
+      await fetchCards();
+    }
   } catch (err) {
     showNotification("Не удалось загрузить карточки", "error", 3000);
   }
@@ -1349,6 +1498,7 @@ async function init() {
   renderSelectedChips();
   renderCardDetail();
   syncChatAvailability();
+  subscribeToChanges();
 }
 
 init();
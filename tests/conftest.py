@@ -0,0 +1,53 @@
+import os
+import tempfile
+import uuid
+
+# The application reads its settings at import time, so every test runs against files in a
+# fresh directory (database, event archive and vector index sit next to the database).
+_DATA_DIR = tempfile.mkdtemp(prefix="myservice-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATA_DIR}/myservice.db"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from backend.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def domain(client):
+    code = uuid.uuid4().hex[:8]
+    response = client.post("/domains/", json={"code": code, "name": f"Domain {code}"})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.fixture
+def user(client):
+    name = uuid.uuid4().hex[:8]
+    response = client.post(
+        "/users/", json={"email": f"{name}@example.com", "name": f"User {name}", "role": "editor"}
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.fixture
+def card(client, domain, user):
+    response = client.post(
+        "/cards/",
+        json={
+            "title": "Card",
+            "description": "Description",
+            "content": "Content",
+            "domain_id": domain["id"],
+            "owner_id": user["id"],
+        },
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
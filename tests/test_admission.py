@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from backend import admission, answers
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    limiters = {
+        "chat": admission.Limiter("chat", 1, 1),
+        "scenarios": admission.Limiter("scenarios", 1, 1),
+    }
+    monkeypatch.setattr(admission, "LIMITERS", limiters)
+    monkeypatch.setattr(admission, "ADMISSION_CONTROL", True)
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_TIMEOUT", 0.2)
+    return limiters
+
+
+class _App:
+    """Answers 200, holding /chat/ requests until ``release`` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        if scope["path"].startswith("/chat/"):
+            await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def _request(middleware, method, path):
+    """Status and headers of one request through the middleware."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    await middleware(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_a_full_group_queues_then_sheds_while_other_routes_pass(limiters):
+    async def scenario():
+        app = _App()
+        middleware = admission.AdmissionMiddleware(app)
+        chat = limiters["chat"]
+
+        holding = asyncio.create_task(_request(middleware, "POST", "/chat/stream"))
+        await asyncio.sleep(0.01)
+        assert chat.active == 1
+
+        queued = asyncio.create_task(_request(middleware, "POST", "/chat/mock"))
+        await asyncio.sleep(0.01)
+        assert len(chat.waiters) == 1 and not queued.done()
+
+        # The queue is full too: refused at once.
+        status, headers = await _request(middleware, "POST", "/chat/mock")
+        assert status == 429 and headers[b"retry-after"] == b"1"
+
+        # Other groups and routes outside any group are not held back.
+        assert (await _request(middleware, "GET", "/cards/feed"))[0] == 200
+        assert (await _request(middleware, "GET", "/health"))[0] == 200
+
+        # The queued request times out waiting for the slot.
+        status, headers = await queued
+        assert status == 503 and headers[b"retry-after"] == b"1"
+        assert len(chat.waiters) == 0 and chat.active == 1
+
+        # A request queued when the slot frees up gets it.
+        waiting = asyncio.create_task(_request(middleware, "POST", "/chat/mock"))
+        await asyncio.sleep(0.01)
+        app.release.set()
+        assert (await holding)[0] == 200
+        assert (await waiting)[0] == 200
+        assert chat.active == 0 and len(chat.waiters) == 0
+
+    asyncio.run(scenario())
+
+
+def test_shed_requests_are_counted_by_reason(limiters):
+    def shed(reason):
+        return admission.shed_total._values.get(("chat", reason), 0)
+
+    async def scenario():
+        app = _App()
+        middleware = admission.AdmissionMiddleware(app)
+        holding = asyncio.create_task(_request(middleware, "POST", "/chat/stream"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(_request(middleware, "POST", "/chat/mock"))
+        await asyncio.sleep(0.01)
+        await _request(middleware, "POST", "/chat/mock")
+        await queued
+        app.release.set()
+        await holding
+
+    full, timeout = shed("queue_full"), shed("timeout")
+    asyncio.run(scenario())
+    assert (shed("queue_full"), shed("timeout")) == (full + 1, timeout + 1)
+    assert limiters["chat"].active == 0
+
+
+def test_generation_cap_refuses_chat_streams_beyond_it(client, monkeypatch):
+    limiter = answers.GenerationLimiter(1)
+    monkeypatch.setattr(answers, "limiter", limiter)
+    slot = limiter.acquire()
+
+    response = client.post("/chat/stream", json={"message": "Card"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert client.post("/chat/mock", json={"message": "Card"}).status_code == 200
+
+    slot.release()
+    response = client.post("/chat/stream", json={"message": "Card"})
+    assert response.status_code == 200
+    assert "event: done" in response.text
+    assert limiter.active == 0
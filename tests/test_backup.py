@@ -0,0 +1,77 @@
+import gzip
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend import backup, eventstore
+from backend.db import Base, engine
+
+
+@pytest.fixture
+def archived_events(card, user):
+    """Events of two old months, moved to the archive; returns how many."""
+    with engine.begin() as conn:
+        for index in range(30):
+            conn.execute(
+                text(
+                    "INSERT INTO events (card_id, user_id, event_type, payload, created_at) "
+                    "VALUES (:card_id, :user_id, 'viewed', :payload, :created_at)"
+                ),
+                {
+                    "card_id": card["id"],
+                    "user_id": user["id"],
+                    "payload": f"old {index}",
+                    "created_at": f"2020-0{index % 2 + 1}-1{index % 10} 10:00:00.000000",
+                },
+            )
+    eventstore.archive(engine, before=datetime(2021, 1, 1))
+    with eventstore.attached(engine, write=False) as conn:
+        return backup._archived_events(conn)
+
+
+def test_export_and_import_keep_archived_events(tmp_path, archived_events):
+    assert archived_events >= 30
+    export = tmp_path / "export.ndjson.gz"
+    backup.export_to_file(engine, export)
+
+    with gzip.open(export, "rb") as file:
+        header = json.loads(file.readline())
+    assert "events_archive.events_2020_01" in header["tables"]
+    assert "events_archive.events_2020_02" in header["tables"]
+
+    target = create_engine(f"sqlite:///{tmp_path / 'restored.db'}")
+    Base.metadata.create_all(target)
+    counts = backup.import_file(target, export)
+    assert counts["events_archive"] == archived_events
+
+    restored = sqlite3.connect(eventstore.archive_path(target))
+    payloads = {
+        row[0]
+        for partition in ("events_2020_01", "events_2020_02")
+        for row in restored.execute(f"SELECT payload FROM {partition}")
+    }
+    assert {f"old {index}" for index in range(30)} <= payloads
+
+    with pytest.raises(ValueError, match="not empty"):
+        backup.import_file(target, export)
+    counts = backup.import_file(target, export, replace=True)
+    assert counts["events_archive"] == archived_events
+
+
+def test_snapshot_copies_the_archive(tmp_path, archived_events):
+    path = tmp_path / "snapshot.db"
+    archive = backup.snapshot(engine, path)
+    assert archive == tmp_path / "snapshot-events.db"
+
+    copy = sqlite3.connect(archive)
+    copied = sum(
+        copy.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+        for name, in copy.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'events_%'"
+        )
+    )
+    assert copied == archived_events
+    assert sqlite3.connect(path).execute("SELECT count(*) FROM cards").fetchone()[0] > 0
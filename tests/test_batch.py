@@ -0,0 +1,23 @@
+def test_batch_runs_sub_requests_in_order(client, card):
+    url = f"/cards/{card['id']}"
+    etag = client.get(url).headers["etag"]
+    response = client.post(
+        "/batch",
+        json={
+            "requests": [
+                {"path": f"{url}?fields=ignored"},
+                {"path": url, "headers": {"If-None-Match": etag}},
+                {"method": "put", "path": url, "body": {"title": "Batched"}},
+                {"path": url},
+                {"path": "/cards/0"},
+                {"path": "/batch"},
+            ]
+        },
+    )
+    assert response.status_code == 200, response.text
+    responses = response.json()["responses"]
+    assert [sub["status"] for sub in responses] == [200, 304, 200, 200, 404, 400]
+    assert responses[0]["body"]["title"] == "Card"
+    assert "content-length" not in responses[0]["headers"]
+    assert responses[3]["body"]["title"] == "Batched"
+    assert responses[4]["body"] == {"detail": "Card not found"}
@@ -0,0 +1,62 @@
+import json
+import uuid
+
+
+def _ndjson(rows) -> str:
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+def test_bad_rows_fail_alone(client, domain, user):
+    title = uuid.uuid4().hex
+    rows = [
+        {"title": f"{title} 0", "domain_id": domain["id"], "owner_id": user["id"]},
+        {"title": f"{title} 1", "domain_id": 999999, "owner_id": user["id"]},
+        {"title": f"{title} 2", "domain_id": domain["id"], "content": "Body"},
+        {"title": f"{title} 3", "owner_id": 999999},
+        {"title": f"{title} 4"},
+    ]
+    response = client.post(
+        "/cards/bulk", content=_ndjson(rows), headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["failed"]) == (3, 2)
+    statuses = [item["status"] for item in result["items"]]
+    assert statuses == ["created", "error", "created", "error", "created"]
+    assert "FOREIGN KEY" in result["items"][1]["error"]
+
+    created = [item["id"] for item in result["items"] if item["status"] == "created"]
+    titles = [client.get(f"/cards/{card_id}").json()["title"] for card_id in created]
+    assert titles == [f"{title} 0", f"{title} 2", f"{title} 4"]
+    assert client.get(f"/cards/{created[1]}").json()["content"] == "Body"
+    assert client.get("/cards/feed", params={"search": title}).json()["total"] == 1
+
+
+def test_duplicate_key_fails_alone(client, user):
+    name = uuid.uuid4().hex[:8]
+    rows = [
+        {"email": f"{name}-a@example.com", "name": "A", "role": "editor"},
+        {"email": user["email"], "name": "Duplicate", "role": "editor"},
+        {"email": f"{name}-b@example.com", "name": "B", "role": "editor"},
+    ]
+    result = client.post("/users/bulk", json=rows).json()
+    assert [item["status"] for item in result["items"]] == ["created", "error", "created"]
+    assert "UNIQUE" in result["items"][1]["error"]
+    assert client.get(f"/users/{user['id']}").json()["name"] == user["name"]
+
+
+def test_repeated_upsert_key_updates_the_row_it_created(client):
+    code = uuid.uuid4().hex[:8]
+    rows = [
+        {"code": code, "name": "First"},
+        {"code": f"{code}-other", "name": "Other"},
+        {"code": code, "name": "Last"},
+    ]
+    result = client.post("/domains/bulk", params={"upsert": True}, json=rows).json()
+    assert (result["created"], result["updated"]) == (2, 1)
+    assert [item["status"] for item in result["items"]] == ["created", "created", "updated"]
+    assert result["items"][0]["id"] == result["items"][2]["id"]
+    assert client.get(f"/domains/{result['items'][0]['id']}").json()["name"] == "Last"
+
+    result = client.post("/domains/bulk", params={"upsert": True}, json=rows[:1] * 2).json()
+    assert [item["status"] for item in result["items"]] == ["updated", "updated"]
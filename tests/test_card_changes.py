@@ -0,0 +1,74 @@
+from sqlalchemy import text
+
+from backend.db import engine
+
+
+def _latest(client):
+    """The watermark after every change made so far, following ``next_since`` to the end."""
+    since = 0
+    while True:
+        page = client.get("/cards/changes", params={"since": since, "limit": 5000}).json()
+        since = page["next_since"]
+        if not page["has_more"]:
+            return since
+
+
+def _new_card(client, domain, title):
+    response = client.post("/cards/", json={"title": title, "domain_id": domain["id"]})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def test_changes_page_through_updates_and_tombstones(client, domain):
+    since = _latest(client)
+    first, second, third = (_new_card(client, domain, title) for title in ("A", "B", "C"))
+    assert client.put(f"/cards/{first}", json={"title": "A2"}).status_code == 200
+    assert client.delete(f"/cards/{second}").status_code == 200
+
+    pages = []
+    while True:
+        page = client.get("/cards/changes", params={"since": since, "limit": 1}).json()
+        pages.append(page)
+        assert page["next_since"] > since
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+
+    # One entry per card, in the order of each card's latest change.
+    assert [(page["items"], page["deleted"], page["has_more"]) for page in pages] == [
+        ([client.get(f"/cards/{third}").json()], [], True),
+        ([client.get(f"/cards/{first}").json()], [], True),
+        ([], [second], False),
+    ]
+    assert pages[1]["items"][0]["title"] == "A2"
+
+    # Caught up: nothing new, and the watermark stays put.
+    page = client.get("/cards/changes", params={"since": since}).json()
+    assert page == {"items": [], "deleted": [], "next_since": since, "has_more": False}
+
+    # A full resync has nothing to delete.
+    page = client.get("/cards/changes", params={"since": 0, "limit": 5000}).json()
+    assert second not in page["deleted"]
+    assert second not in {item["id"] for item in page["items"]}
+
+
+def test_changes_cover_writes_made_outside_the_api(client, domain):
+    updated, removed = _new_card(client, domain, "Raw"), _new_card(client, domain, "Gone")
+    since = _latest(client)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE cards SET title = 'Raw 2' WHERE id = :id"), {"id": updated})
+        conn.execute(text("DELETE FROM cards WHERE id = :id"), {"id": removed})
+
+    page = client.get("/cards/changes", params={"since": since}).json()
+    assert [item["title"] for item in page["items"]] == ["Raw 2"]
+    assert page["deleted"] == [removed]
+    assert not page["has_more"]
+
+
+def test_unknown_watermark_is_gone(client, card):
+    latest = _latest(client)
+    assert client.get("/cards/changes", params={"since": latest}).status_code == 200
+    response = client.get("/cards/changes", params={"since": latest + 1})
+    assert response.status_code == 410
+    assert "since=0" in response.json()["detail"]
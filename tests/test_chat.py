@@ -0,0 +1,97 @@
+import asyncio
+import gc
+import json
+
+import pytest
+from starlette.requests import Request
+
+from backend import answers, schemas
+from backend.db import AsyncSessionLocal
+from backend.routers import chat
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = answers.GenerationLimiter(limit=1)
+    monkeypatch.setattr(answers, "limiter", limiter)
+    return limiter
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_stream_sends_cards_then_chunks_then_done(client, card, limiter):
+    response = client.post(
+        "/chat/stream", json={"message": "Что в карточке?", "selected_card_ids": [card["id"]]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "used_cards" and names[-1] == "done"
+    assert set(names[1:-1]) == {"chunk"}
+    used_cards = [schemas.ChatUsedCard(**item) for item in events[0][1]]
+    assert [item.id for item in used_cards] == [card["id"]]
+    answer = "".join(data["text"] for name, data in events if name == "chunk")
+    assert answer == answers.stub_answer(used_cards)
+    assert limiter.active == 0
+
+
+def test_stream_refuses_beyond_the_generation_limit(client, limiter):
+    slot = limiter.acquire()
+    response = client.post("/chat/stream", json={"message": "привет"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+    slot.release()
+    assert client.post("/chat/stream", json={"message": "привет"}).status_code == 200
+    assert limiter.active == 0
+
+
+def _request(disconnected: asyncio.Event) -> Request:
+    async def receive():
+        if disconnected.is_set():
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(3600)
+
+    return Request({"type": "http", "method": "POST", "path": "/chat/stream"}, receive)
+
+
+def test_abandoned_stream_releases_its_slot(client, limiter):
+    async def start():
+        async with AsyncSessionLocal() as db:
+            return await chat.stream_chat(
+                schemas.ChatMockRequest(message="привет"), _request(asyncio.Event()), db
+            )
+
+    response = asyncio.run(start())
+    assert limiter.active == 1
+    # The body never started, so only the finalizer on it can give the slot back.
+    del response
+    gc.collect()
+    assert limiter.active == 0
+
+
+def test_client_disconnect_stops_generation_and_releases_its_slot(client, limiter):
+    async def stream():
+        disconnected = asyncio.Event()
+        async with AsyncSessionLocal() as db:
+            response = await chat.stream_chat(
+                schemas.ChatMockRequest(message="привет"), _request(disconnected), db
+            )
+        body = response.body_iterator
+        received = [await body.__anext__()]
+        assert limiter.active == 1
+        disconnected.set()
+        received += [chunk async for chunk in body]
+        return received
+
+    received = asyncio.run(stream())
+    assert [name for name, _ in _events("".join(received))] == ["used_cards"]
+    assert limiter.active == 0
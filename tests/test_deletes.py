@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from backend import aggregates, cardcontent, deletes
+from backend.db import engine
+
+# Tables as the first release created them: foreign keys without ON DELETE CASCADE and the
+# card body inline in cards.content.
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL,
+    role VARCHAR NOT NULL, created_at DATETIME NOT NULL
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE domains (
+    id INTEGER NOT NULL PRIMARY KEY, code VARCHAR NOT NULL, name VARCHAR NOT NULL,
+    description TEXT
+);
+CREATE UNIQUE INDEX ix_domains_code ON domains (code);
+CREATE TABLE sources (
+    id INTEGER NOT NULL PRIMARY KEY, domain_id INTEGER NOT NULL REFERENCES domains (id),
+    title VARCHAR NOT NULL, type VARCHAR NOT NULL, uri VARCHAR NOT NULL,
+    is_active BOOLEAN NOT NULL, created_at DATETIME NOT NULL
+);
+CREATE TABLE cards (
+    id INTEGER NOT NULL PRIMARY KEY, domain_id INTEGER REFERENCES domains (id),
+    title VARCHAR NOT NULL, description TEXT, content TEXT, status VARCHAR,
+    owner_id INTEGER REFERENCES users (id), created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+CREATE TABLE experts (
+    id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+    domain_id INTEGER NOT NULL REFERENCES domains (id), level VARCHAR NOT NULL
+);
+CREATE TABLE events (
+    id INTEGER NOT NULL PRIMARY KEY, card_id INTEGER NOT NULL REFERENCES cards (id),
+    user_id INTEGER NOT NULL REFERENCES users (id), event_type VARCHAR NOT NULL,
+    payload TEXT, created_at DATETIME NOT NULL
+);
+CREATE TABLE cardsources (
+    id INTEGER NOT NULL PRIMARY KEY, card_id INTEGER NOT NULL REFERENCES cards (id),
+    source_id INTEGER NOT NULL REFERENCES sources (id), note VARCHAR
+);
+"""
+
+NOW = "2024-05-01 10:00:00.000000"
+
+
+def _baseline_database(path: Path) -> dict:
+    """A baseline-schema database with two domains of data; returns the row counts."""
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    for user_id in (1, 2):
+        conn.execute(
+            "INSERT INTO users VALUES (?, ?, ?, 'editor', ?)",
+            (user_id, f"user{user_id}@example.com", f"User {user_id}", NOW),
+        )
+    for domain_id in (1, 2):
+        conn.execute(
+            "INSERT INTO domains VALUES (?, ?, ?, NULL)",
+            (domain_id, f"d{domain_id}", f"Domain {domain_id}"),
+        )
+        conn.execute(
+            "INSERT INTO sources VALUES (?, ?, 'Source', 'web', 'https://example.com', 1, ?)",
+            (domain_id, domain_id, NOW),
+        )
+        conn.execute(
+            "INSERT INTO experts VALUES (?, ?, ?, 'senior')", (domain_id, domain_id, domain_id)
+        )
+    for card_id in range(1, 13):
+        domain_id, owner_id = card_id % 2 + 1, card_id % 3 % 2 + 1
+        conn.execute(
+            "INSERT INTO cards VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?)",
+            (
+                card_id, domain_id, f"Card {card_id}", f"Body of card {card_id}\n" * 10,
+                ("draft", "published")[card_id % 2], owner_id, NOW, NOW,
+            ),
+        )
+        conn.execute(
+            "INSERT INTO cardsources (card_id, source_id) VALUES (?, ?)", (card_id, domain_id)
+        )
+        for day in range(1, card_id % 4 + 2):
+            conn.execute(
+                "INSERT INTO events (card_id, user_id, event_type, created_at) "
+                "VALUES (?, ?, 'viewed', ?)",
+                (card_id, owner_id, f"2024-04-{day:02d} 09:00:00.000000"),
+            )
+    conn.commit()
+    counts = _row_counts(conn)
+    conn.close()
+    return counts
+
+
+TABLES = ("users", "domains", "sources", "cards", "experts", "events", "cardsources")
+
+
+def _row_counts(conn) -> dict:
+    return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def _assert_aggregates_consistent(conn) -> None:
+    """Trigger-maintained summaries equal a recount from the underlying rows."""
+    drifted = conn.execute(
+        "SELECT count(*) FROM cards WHERE "
+        + " OR ".join(
+            f"{name} IS NOT {expression.format(card_id='cards.id')}"
+            for name, expression in (
+                ("source_count", aggregates._SOURCE_COUNT),
+                ("last_event_at", aggregates._LAST_EVENT_AT),
+                ("event_count", aggregates._EVENT_COUNT),
+            )
+        )
+    ).fetchone()[0]
+    assert drifted == 0
+
+    domains = conn.execute(
+        "SELECT domain_id, event_count, last_event_at FROM domain_event_counts "
+        "WHERE event_count > 0 ORDER BY domain_id"
+    ).fetchall()
+    assert domains == conn.execute(
+        "SELECT domain_id, sum(event_count), max(last_event_at) FROM cards "
+        "WHERE domain_id IS NOT NULL GROUP BY domain_id HAVING sum(event_count) > 0 "
+        "ORDER BY domain_id"
+    ).fetchall()
+
+    facets = conn.execute(
+        "SELECT facet, value, count FROM card_facet_counts WHERE count > 0 ORDER BY facet, value"
+    ).fetchall()
+    recount = []
+    for facet in ("domain_id", "owner_id", "status"):
+        recount += conn.execute(
+            f"SELECT '{facet}', {facet}, count(*) FROM cards "
+            "WHERE domain_id IS NOT NULL AND owner_id IS NOT NULL "
+            f"AND {facet} IS NOT NULL GROUP BY {facet} ORDER BY {facet}"
+        ).fetchall()
+    assert facets == recount
+
+
+def test_startup_migrates_a_baseline_database(tmp_path):
+    database = tmp_path / "baseline.db"
+    before = _baseline_database(database)
+
+    environment = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    subprocess.run(
+        [sys.executable, "-c", "import backend.main"],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=environment,
+        check=True,
+    )
+
+    conn = sqlite3.connect(database)
+    cardcontent.register(conn)
+    conn.execute("PRAGMA foreign_keys=ON")
+    assert _row_counts(conn) == before
+    for table in ("sources", "cards", "experts", "events", "cardsources"):
+        actions = {row[6] for row in conn.execute(f"PRAGMA foreign_key_list({table})")}
+        assert actions == {"CASCADE"}, table
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    bodies = conn.execute(
+        "SELECT card_inflate(codec, data) FROM card_contents ORDER BY card_id"
+    ).fetchall()
+    assert bodies == [(f"Body of card {card_id}\n" * 10,) for card_id in range(1, 13)]
+    _assert_aggregates_consistent(conn)
+
+    # The rebuilt foreign keys cascade, and the triggers came back with the tables.
+    with conn:
+        conn.execute("DELETE FROM domains WHERE id = 1")
+    after = _row_counts(conn)
+    assert after["cards"] == 6 and after["sources"] == 1 and after["experts"] == 1
+    assert conn.execute("SELECT count(*) FROM events WHERE card_id % 2 = 0").fetchone() == (0,)
+    assert after["cardsources"] == 6
+    _assert_aggregates_consistent(conn)
+    conn.close()
+
+
+def _wait(client, job_id):
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] != "running":
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still running")
+
+
+def test_background_delete_sweeps_a_domain_in_chunks(client, user, monkeypatch):
+    monkeypatch.setattr(deletes, "DELETE_CHUNK_SIZE", 3)
+    doomed = client.post("/domains/", json={"code": "sweep", "name": "Sweep"}).json()
+    kept = client.post("/domains/", json={"code": "kept", "name": "Kept"}).json()
+    cards = {}
+    for domain in (doomed, kept):
+        source = client.post(
+            "/sources/",
+            json={"domain_id": domain["id"], "title": "S", "type": "web", "uri": "https://x"},
+        ).json()
+        client.post(
+            "/experts/", json={"user_id": user["id"], "domain_id": domain["id"], "level": "senior"}
+        )
+        cards[domain["id"]] = []
+        for index in range(8):
+            card = client.post(
+                "/cards/",
+                json={"title": f"Card {index}", "domain_id": domain["id"], "owner_id": user["id"]},
+            ).json()
+            cards[domain["id"]].append(card["id"])
+            for _ in range(index % 3 + 1):
+                client.post(
+                    "/events/",
+                    json={"card_id": card["id"], "user_id": user["id"], "event_type": "viewed"},
+                )
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO cardsources (card_id, source_id) VALUES (:card, :source)"),
+                    {"card": card["id"], "source": source["id"]},
+                )
+
+    response = client.delete(f"/domains/{doomed['id']}", params={"background": "true"})
+    assert response.status_code == 202
+    job = _wait(client, response.json()["id"])
+
+    assert job["status"] == "done", job
+    # 8 cards, 15 events, 8 links, 1 source, 1 expert and the domain itself.
+    assert job["deleted"] == job["total"] == 34
+    assert client.get(f"/domains/{doomed['id']}").status_code == 404
+    with engine.connect() as conn:
+        remaining = conn.execute(
+            text("SELECT count(*) FROM cards WHERE domain_id = :id"), {"id": doomed["id"]}
+        ).scalar()
+        orphans = conn.execute(
+            text(
+                "SELECT (SELECT count(*) FROM events WHERE card_id NOT IN (SELECT id FROM cards))"
+                " + (SELECT count(*) FROM cardsources"
+                "    WHERE card_id NOT IN (SELECT id FROM cards)"
+                "    OR source_id NOT IN (SELECT id FROM sources))"
+            )
+        ).scalar()
+        kept_cards = conn.execute(
+            text("SELECT count(*), sum(event_count) FROM cards WHERE domain_id = :id"),
+            {"id": kept["id"]},
+        ).one()
+    assert remaining == 0 and orphans == 0
+    assert tuple(kept_cards) == (8, 15)
+
+    counts = {item["id"]: item for item in client.get("/events/counts/domains").json()}
+    assert doomed["id"] not in counts and counts[kept["id"]]["event_count"] == 15
+    raw = engine.raw_connection()
+    try:
+        _assert_aggregates_consistent(raw.driver_connection)
+    finally:
+        raw.close()
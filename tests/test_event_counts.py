@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from backend import eventstore
+from backend.db import engine
+
+# The same totals recomputed from scratch, hot events plus archived rollups.
+_RECOUNT = """
+    SELECT cards.id, cards.domain_id, sum(totals.n), max(totals.at) FROM (
+        SELECT card_id, 1 AS n, created_at AS at FROM events
+        UNION ALL
+        SELECT card_id, event_count, last_event_at FROM event_rollups
+    ) AS totals
+    JOIN cards ON cards.id = totals.card_id
+    GROUP BY cards.id
+"""
+
+
+def _recount():
+    cards, domains = {}, {}
+    with engine.connect() as conn:
+        rows = conn.execute(text(_RECOUNT)).all()
+    for card_id, domain_id, count, last in rows:
+        cards[card_id] = (count, last)
+        if domain_id is not None:
+            total, latest = domains.get(domain_id, (0, None))
+            domains[domain_id] = (total + count, max(filter(None, (latest, last)), default=None))
+    return cards, domains
+
+
+def _served(client):
+    def parse(items):
+        return {
+            item["id"]: (item["event_count"], item["last_event_at"].replace("T", " "))
+            for item in items
+        }
+
+    return (
+        parse(client.get("/events/counts/cards").json()),
+        parse(client.get("/events/counts/domains").json()),
+    )
+
+
+def _assert_counts_match(client):
+    expected_cards, expected_domains = _recount()
+    cards, domains = _served(client)
+    assert {key: count for key, (count, _) in cards.items()} == {
+        key: count for key, (count, _) in expected_cards.items() if count
+    }
+    assert {key: count for key, (count, _) in domains.items()} == {
+        key: count for key, (count, _) in expected_domains.items() if count
+    }
+    for key, (_, last) in domains.items():
+        assert last.startswith(expected_domains[key][1][:19])
+
+
+def _add_event(conn, card_id, user_id, created_at):
+    conn.execute(
+        text(
+            "INSERT INTO events (card_id, user_id, event_type, created_at) "
+            "VALUES (:card_id, :user_id, 'viewed', :created_at)"
+        ),
+        {"card_id": card_id, "user_id": user_id, "created_at": created_at},
+    )
+
+
+def test_counts_follow_every_write_path(client, card, domain, user):
+    other_domain = client.post("/domains/", json={"code": "counts", "name": "Counts"}).json()
+    other = client.post(
+        "/cards/", json={"title": "Other", "domain_id": domain["id"], "owner_id": user["id"]}
+    ).json()
+
+    for card_id in (card["id"], card["id"], other["id"]):
+        response = client.post(
+            "/events/", json={"card_id": card_id, "user_id": user["id"], "event_type": "liked"}
+        )
+        assert response.status_code == 201
+    with engine.begin() as conn:
+        for day in range(1, 6):
+            _add_event(conn, other["id"], user["id"], f"2019-03-0{day} 12:00:00.000000")
+    _assert_counts_match(client)
+    cards, domains = _served(client)
+    assert cards[card["id"]][0] == 2 and cards[other["id"]][0] == 6
+    assert domains[domain["id"]][0] == 8
+
+    # Archiving moves events into rollups without changing any total.
+    eventstore.archive(engine, before=datetime(2020, 1, 1))
+    assert _served(client) == (cards, domains)
+
+    # Moving a card carries its events, archived ones included, to the other domain.
+    client.put(f"/cards/{other['id']}", json={"domain_id": other_domain["id"]})
+    cards, domains = _served(client)
+    assert domains[domain["id"]][0] == 2 and domains[other_domain["id"]][0] == 6
+    _assert_counts_match(client)
+
+    events = client.get("/events/", params={"card_id": card["id"]}).json()
+    event_id = next(item["id"] for item in events if item["card_id"] == card["id"])
+    assert client.delete(f"/events/{event_id}").status_code == 200
+    assert client.delete(f"/cards/{other['id']}").status_code == 200
+    cards, domains = _served(client)
+    assert cards[card["id"]][0] == 1 and other["id"] not in cards
+    assert other_domain["id"] not in domains
+    _assert_counts_match(client)
@@ -0,0 +1,71 @@
+from sqlalchemy import text
+
+from backend import facets
+from backend.db import engine
+
+
+def _stored():
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT facet, value, count FROM card_facet_counts WHERE count > 0")
+        ).all()
+    return {(facet, value): count for facet, value, count in rows}
+
+
+def _recounted():
+    counts = {}
+    with engine.connect() as conn:
+        for facet in facets.FACETS:
+            rows = conn.execute(
+                text(
+                    f"SELECT {facet}, count(*) FROM cards "
+                    "WHERE domain_id IS NOT NULL AND owner_id IS NOT NULL "
+                    f"AND {facet} IS NOT NULL GROUP BY {facet}"
+                )
+            ).all()
+            counts.update({(facet, value): count for value, count in rows})
+    return counts
+
+
+def _card(client, domain, user, status="draft"):
+    payload = {"title": "Facet", "status": status}
+    response = client.post(
+        "/cards/", json={**payload, "domain_id": domain["id"], "owner_id": user["id"]}
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_facet_counts_follow_inserts_updates_and_deletes(client, domain, user):
+    other_domain = client.post("/domains/", json={"code": "facet2", "name": "F2"}).json()
+    other_user = client.post(
+        "/users/", json={"email": "facets@example.com", "name": "F", "role": "editor"}
+    ).json()
+    first = _card(client, domain, user)
+    second = _card(client, domain, user, status="published")
+    _card(client, domain, other_user)
+    stored = _stored()
+    assert stored == _recounted()
+    assert stored[("domain_id", domain["id"])] == 3
+    assert stored[("owner_id", user["id"])] == 2
+
+    # Each facet column moves the card from one value to another.
+    client.put(f"/cards/{first['id']}", json={"domain_id": other_domain["id"]})
+    client.put(f"/cards/{first['id']}", json={"status": "archived"})
+    client.put(f"/cards/{second['id']}", json={"owner_id": other_user["id"]})
+    stored = _stored()
+    assert stored == _recounted()
+    assert stored[("domain_id", domain["id"])] == 2
+    assert stored[("domain_id", other_domain["id"])] == 1
+    assert stored[("status", "archived")] >= 1
+    assert stored[("owner_id", other_user["id"])] == 2
+
+    # A card without an owner is not listed in the feed, so it leaves every facet.
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE cards SET owner_id = NULL WHERE id = :id"), {"id": second["id"]})
+    assert _stored()[("owner_id", other_user["id"])] == 1
+
+    assert client.delete(f"/cards/{first['id']}").status_code == 200
+    stored = _stored()
+    assert stored == _recounted()
+    assert ("domain_id", other_domain["id"]) not in stored
@@ -0,0 +1,69 @@
+import uuid
+
+
+def _walk(client, params, page_size):
+    """Ids of every page reached by following ``next_cursor``."""
+    ids, params = [], {**params, "page_size": page_size}
+    while True:
+        page = client.get("/cards/feed", params=params).json()
+        ids.extend(item["id"] for item in page["items"])
+        if page["next_cursor"] is None:
+            return ids
+        params["after"] = page["next_cursor"]
+
+
+def _cards(client, domain, user, word):
+    # Different relevance for the word, with ties among the identical cards.
+    texts = [(word, "Other"), ("Other", word), (f"{word} {word}", word)] + [(word, "Same")] * 4
+    for title, description in texts:
+        response = client.post(
+            "/cards/",
+            json={
+                "title": title,
+                "description": description,
+                "domain_id": domain["id"],
+                "owner_id": user["id"],
+            },
+        )
+        assert response.status_code == 201, response.text
+    return len(texts)
+
+
+def test_ranked_search_pages_by_cursor_in_relevance_order(client, domain, user):
+    word = uuid.uuid4().hex[:10]
+    count = _cards(client, domain, user, word)
+    params = {"search": word}
+
+    ranked = [item["id"] for item in client.get(
+        "/cards/feed", params={**params, "page_size": 100}
+    ).json()["items"]]
+    assert len(ranked) == count
+
+    for page_size in (1, 2, 3):
+        assert _walk(client, params, page_size) == ranked
+
+
+def test_listing_pages_by_cursor(client, domain, user):
+    count = _cards(client, domain, user, uuid.uuid4().hex[:10])
+    params = {"domain_id": domain["id"]}
+
+    listed = [item["id"] for item in client.get(
+        "/cards/feed", params={**params, "page_size": 100}
+    ).json()["items"]]
+    assert len(listed) == count
+    assert _walk(client, params, 2) == listed
+
+
+def test_cursor_only_continues_its_own_kind_of_listing(client, domain, user):
+    word = uuid.uuid4().hex[:10]
+    _cards(client, domain, user, word)
+    ranked = client.get("/cards/feed", params={"search": word, "page_size": 1}).json()
+    listed = client.get("/cards/feed", params={"domain_id": domain["id"], "page_size": 1}).json()
+
+    response = client.get(
+        "/cards/feed", params={"domain_id": domain["id"], "after": ranked["next_cursor"]}
+    )
+    assert response.status_code == 400
+    response = client.get("/cards/feed", params={"search": word, "after": listed["next_cursor"]})
+    assert response.status_code == 400
+    assert client.get("/cards/feed", params={"after": "garbage"}).status_code == 400
@@ -0,0 +1,96 @@
+from sqlalchemy import text
+
+from backend import cardcontent, refcache
+from backend.db import engine
+
+
+def _write_elsewhere(statement: str, **params) -> None:
+    """Write as another worker would: straight to the database, past this process's caches."""
+    with engine.begin() as conn:
+        conn.execute(text(statement), params)
+
+
+def test_full_card_follows_writes_from_other_workers(client, card):
+    url = f"/cards/{card['id']}/full"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.json()["card"]["title"] == "Card"
+    assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    _write_elsewhere("UPDATE cards SET title = 'Renamed' WHERE id = :id", id=card["id"])
+
+    second = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.json()["card"]["title"] == "Renamed"
+    assert second.headers["etag"] != first.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": second.headers["etag"]}).status_code == 304
+
+
+def test_full_card_follows_content_written_elsewhere(client, card):
+    url = f"/cards/{card['id']}/full"
+    assert client.get(url).json()["card"]["content"] == "Content"
+
+    row = cardcontent.content_row(card["id"], "Rewritten")
+    _write_elsewhere(
+        "UPDATE card_contents SET codec = :codec, data = :data WHERE card_id = :card_id", **row
+    )
+
+    assert client.get(url).json()["card"]["content"] == "Rewritten"
+    assert client.get(f"/cards/{card['id']}").json()["content"] == "Rewritten"
+
+
+def _add_event_elsewhere(card_id, user_id):
+    _write_elsewhere(
+        "INSERT INTO events (card_id, user_id, event_type, created_at) "
+        "VALUES (:card_id, :user_id, 'viewed', CURRENT_TIMESTAMP)",
+        card_id=card_id,
+        user_id=user_id,
+    )
+
+
+def test_full_card_stays_cached_across_other_cards_traffic(client, card, user, domain):
+    other = client.post(
+        "/cards/", json={"title": "Other", "domain_id": domain["id"], "owner_id": user["id"]}
+    ).json()
+    url = f"/cards/{card['id']}/full"
+    client.get(url)
+
+    hits = refcache.full_cards.hits
+    _add_event_elsewhere(other["id"], user["id"])
+    response = client.post(
+        "/events/", json={"card_id": other["id"], "user_id": user["id"], "event_type": "liked"}
+    )
+    assert response.status_code == 201
+    source = client.post(
+        "/sources/",
+        json={"title": "S", "type": "web", "uri": "https://example.com", "domain_id": domain["id"]},
+    ).json()
+    _write_elsewhere(
+        "INSERT INTO cardsources (card_id, source_id) VALUES (:card_id, :source_id)",
+        card_id=other["id"],
+        source_id=source["id"],
+    )
+
+    assert client.get(url).status_code == 200
+    assert refcache.full_cards.hits == hits + 1
+
+
+def test_full_card_follows_its_own_events_and_links_written_elsewhere(client, card, user, domain):
+    url = f"/cards/{card['id']}/full"
+    assert client.get(url).json()["events"] == []
+
+    _add_event_elsewhere(card["id"], user["id"])
+    assert [event["event_type"] for event in client.get(url).json()["events"]] == ["viewed"]
+
+    source = client.post(
+        "/sources/",
+        json={"title": "S", "type": "web", "uri": "https://example.com", "domain_id": domain["id"]},
+    ).json()
+    _write_elsewhere(
+        "INSERT INTO cardsources (card_id, source_id) VALUES (:card_id, :source_id)",
+        card_id=card["id"],
+        source_id=source["id"],
+    )
+    assert [item["id"] for item in client.get(url).json()["sources"]] == [source["id"]]
+    _write_elsewhere("UPDATE sources SET title = 'Renamed' WHERE id = :id", id=source["id"])
+    assert [item["title"] for item in client.get(url).json()["sources"]] == ["Renamed"]
@@ -0,0 +1,63 @@
+from sqlalchemy import text
+
+from backend import listing, refcache
+from backend.db import engine
+
+
+def _write_elsewhere(statement: str, **params) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(statement), params)
+
+
+def _name_in(items, item_id):
+    return next(item["name"] for item in items if item["id"] == item_id)
+
+
+def test_lists_follow_writes_from_other_workers(client, domain, user):
+    first = client.get("/domains/")
+    assert _name_in(first.json(), domain["id"]) == domain["name"]
+    assert _name_in(client.get("/users/").json(), user["id"]) == user["name"]
+
+    _write_elsewhere("UPDATE domains SET name = 'Elsewhere' WHERE id = :id", id=domain["id"])
+    _write_elsewhere("UPDATE users SET name = 'Someone' WHERE id = :id", id=user["id"])
+
+    second = client.get("/domains/", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert _name_in(second.json(), domain["id"]) == "Elsewhere"
+    assert _name_in(client.get("/users/").json(), user["id"]) == "Someone"
+
+
+def test_feed_names_follow_writes_from_other_workers(client, card, domain, user):
+    def feed_item():
+        items = client.get("/cards/feed", params={"domain_id": domain["id"]}).json()["items"]
+        return next(item for item in items if item["id"] == card["id"])
+
+    assert feed_item()["domain"]["name"] == domain["name"]
+
+    _write_elsewhere("UPDATE domains SET name = 'Renamed' WHERE id = :id", id=domain["id"])
+    _write_elsewhere("UPDATE users SET name = 'Renamed owner' WHERE id = :id", id=user["id"])
+
+    item = feed_item()
+    assert item["domain"]["name"] == "Renamed"
+    assert item["owner"]["name"] == "Renamed owner"
+    full = client.get(f"/cards/{card['id']}/full").json()
+    assert full["domain"]["name"] == "Renamed"
+    assert full["owner"]["name"] == "Renamed owner"
+
+
+def test_list_rendered_during_invalidation_is_not_cached(client, domain, monkeypatch):
+    render = listing.render
+
+    async def render_racing_a_write(*args, **kwargs):
+        body = await render(*args, **kwargs)
+        refcache.forget_domain()
+        return body
+
+    refcache.lists.clear()
+    monkeypatch.setattr(listing, "render", render_racing_a_write)
+    assert client.get("/domains/").status_code == 200
+    assert not [key for key in refcache.lists._data if key[0] == "domains"]
+
+    monkeypatch.setattr(listing, "render", render)
+    client.get("/domains/")
+    assert [key for key in refcache.lists._data if key[0] == "domains"]
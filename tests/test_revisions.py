@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from sqlalchemy import text
+
+from backend import revisions
+from backend.db import AsyncSessionLocal, engine
+
+INTERVAL = 4
+
+LINES = [f"Строка {number}\n" for number in range(12)]
+
+# Each update goes through PUT /cards/{id}; together they span several keyframe chains and
+# cover line edits, inserts and removals, CRLF and other line breaks, a missing final newline,
+# null text, a rewrite larger than its delta would be, and non-text fields.
+UPDATES = [
+    {"content": "".join(LINES)},
+    {"content": "".join(LINES[:3] + ["Вставка\r\n"] + LINES[3:])},
+    {"title": "Переименована"},
+    {"content": "".join(LINES[:3] + ["Вставка\r\n"] + LINES[5:]) + "без перевода строки"},
+    {"description": "Одна строка\vи\x0cещё\n"},
+    {"status": "published", "content": "".join(LINES[::-1])},
+    {"description": None},
+    {"description": "Снова\n\n\nс пустыми строками\n"},
+    {"content": "".join(f"Новый текст {number}\n" for number in range(40))},
+    {"content": "".join(f"Новый текст {number}\n" for number in range(40) if number % 7)},
+    {"title": "Ещё раз", "status": "draft"},
+    {"content": ""},
+    {"content": "\n"},
+    {"content": "".join(LINES)},
+]
+
+
+@pytest.fixture
+def history(client, card, monkeypatch):
+    monkeypatch.setattr(revisions, "REVISION_KEYFRAME_INTERVAL", INTERVAL)
+    state = {field: card[field] for field in revisions.FIELDS}
+    states = {1: dict(state)}
+    for number, update in enumerate(UPDATES, start=2):
+        response = client.put(f"/cards/{card['id']}", json=update)
+        assert response.status_code == 200, response.text
+        state.update(update)
+        states[number] = dict(state)
+    return card["id"], states
+
+
+def _load(card_id, numbers):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await revisions.load(db, card_id, numbers)
+
+    return {number: state for number, (_, state) in asyncio.run(load()).items()}
+
+
+def test_every_revision_rebuilds_exactly(client, history):
+    card_id, states = history
+    listed = client.get(f"/cards/{card_id}/revisions", params={"page_size": 100}).json()
+    keyframes = sorted(item["number"] for item in listed["items"] if item["keyframe"])
+    assert listed["total"] == len(states)
+    assert len(keyframes) > 2 and keyframes[0] == 1
+
+    # One at a time: each replays its own chain, including the first delta after a keyframe.
+    for number, expected in states.items():
+        assert _load(card_id, [number]) == {number: expected}, number
+    # All together: the chains are merged into ranges and replayed once each.
+    assert _load(card_id, states) == states
+    # Scattered numbers across chains.
+    after_keyframes = [number + 1 for number in keyframes if number + 1 in states]
+    picked = [1, *after_keyframes, len(states)]
+    assert _load(card_id, picked) == {number: states[number] for number in picked}
+
+
+def test_revision_endpoints_serve_rebuilt_states(client, history):
+    card_id, states = history
+    for number in (2, INTERVAL + 1, INTERVAL + 2, len(states)):
+        response = client.get(f"/cards/{card_id}/revisions/{number}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert {field: body[field] for field in revisions.FIELDS} == states[number]
+
+    last = len(states)
+    diff = client.get(f"/cards/{card_id}/revisions/{last - 1}/diff/{last}").json()
+    assert [change["field"] for change in diff["changes"]] == ["content"]
+    assert client.get(f"/cards/{card_id}/revisions/{last + 1}").status_code == 404
+
+
+def test_writes_outside_the_api_are_folded_into_the_next_revision(client, card):
+    card_id = card["id"]
+    assert client.put(f"/cards/{card_id}", json={"content": "Первый\nвторой\n"}).status_code == 200
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE cards SET title = 'Снаружи', description = 'Другое\n' WHERE id = :id"),
+            {"id": card_id},
+        )
+
+    response = client.put(f"/cards/{card_id}", json={"content": "Первый\nтретий\n"})
+    assert response.status_code == 200, response.text
+    live = {field: response.json()[field] for field in revisions.FIELDS}
+    assert _load(card_id, [3]) == {3: live}
+
+    listed = client.get(f"/cards/{card_id}/revisions").json()["items"]
+    assert listed[0]["changed"] == ["title", "description", "content"]
+
+    # Putting back what the history already holds adds nothing; a real change still does.
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE cards SET title = 'Card' WHERE id = :id"), {"id": card_id})
+    assert client.put(f"/cards/{card_id}", json={"title": "Снаружи"}).status_code == 200
+    assert client.get(f"/cards/{card_id}/revisions").json()["total"] == 3
+    assert client.put(f"/cards/{card_id}", json={"status": "published"}).status_code == 200
+    assert _load(card_id, [4])[4]["status"] == "published"
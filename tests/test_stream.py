@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from backend import changes
+from backend.routers import stream
+
+
+def _first_events(resume_from, count):
+    async def read():
+        events = stream._events(resume_from)
+        try:
+            return [await events.__anext__() for _ in range(count)]
+        finally:
+            await events.aclose()
+
+    return asyncio.run(read())
+
+
+def test_resume_needs_an_id_from_this_broadcaster(monkeypatch):
+    broadcaster = changes.Broadcaster()
+    monkeypatch.setattr(stream, "broadcaster", broadcaster)
+    broadcaster.publish("cards", "created", [1])
+    broadcaster.publish("cards", "updated", [2])
+    first = broadcaster.event_id(1)
+
+    _, change = _first_events(first, 2)
+    assert change.startswith(f"id: {broadcaster.event_id(2)}\nevent: change\n")
+    assert '"ids": [2]' in change
+
+    # The same sequence number from before a restart, or from another worker, is unrelated.
+    restarted = changes.Broadcaster()
+    for stale in ("1", restarted.event_id(1), "garbage"):
+        _, reset = _first_events(stale, 2)
+        assert reset == f"id: {broadcaster.event_id(2)}\nevent: reset\ndata: {{}}\n\n"
+
+
+def _deleted(since):
+    found = {}
+    for sequence, change in changes.broadcaster.backlog:
+        if sequence > since and change["action"] == "deleted":
+            found.setdefault(change["entity"], set()).update(change["ids"])
+    return found
+
+
+def _add_event(client, card, user):
+    response = client.post(
+        "/events/",
+        json={"card_id": card["id"], "user_id": user["id"], "event_type": "viewed"},
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_domain_delete_announces_cascaded_rows(client, card, domain, user):
+    event = _add_event(client, card, user)
+    since = changes.broadcaster.sequence
+
+    assert client.delete(f"/domains/{domain['id']}").status_code == 200
+
+    deleted = _deleted(since)
+    assert card["id"] in deleted["cards"]
+    assert event["id"] in deleted["events"]
+
+
+def test_background_user_delete_announces_cascaded_rows(client, card, user):
+    event = _add_event(client, card, user)
+    since = changes.broadcaster.sequence
+
+    response = client.delete(f"/users/{user['id']}", params={"background": "true"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    for _ in range(100):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done", job
+
+    deleted = _deleted(since)
+    assert card["id"] in deleted["cards"]
+    assert event["id"] in deleted["events"]
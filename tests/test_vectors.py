@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from backend import vectors
+from backend.db import AsyncSessionLocal
+
+
+def _index(*card_ids):
+    index = vectors.VectorIndex(dim=16)
+    for card_id in card_ids:
+        index.upsert(card_id, 1, vectors.vectorize([(f"card {card_id}", 1.0)], dim=16))
+    index.watermark = max(card_ids, default=0)
+    return index
+
+
+def _legacy_save(index, path):
+    path.mkdir()
+    np.save(path / "matrix.npy", index.matrix[: index.size])
+    np.save(path / "ids.npy", index.ids[: index.size])
+    np.save(path / "domains.npy", index.domains[: index.size])
+    np.save(path / "document_frequency.npy", index.document_frequency)
+    (path / "meta.json").write_text(
+        f'{{"dim": 16, "size": {index.size}, "watermark": {index.watermark}}}'
+    )
+
+
+def test_save_switches_versions_in_one_rename(tmp_path):
+    path = tmp_path / "vectors"
+    _legacy_save(_index(1), path)
+    loaded = vectors.VectorIndex(dim=16)
+    assert loaded.load(path) and loaded.ids.tolist() == [1]
+
+    _index(1, 2).save(path)
+    first = (path / "CURRENT").read_text()
+    _index(1, 2, 3).save(path)
+    second = (path / "CURRENT").read_text()
+
+    # The legacy files are gone; the new version and the one before it remain.
+    assert sorted(entry.name for entry in path.iterdir()) == sorted(["CURRENT", first, second])
+    loaded = vectors.VectorIndex(dim=16)
+    assert loaded.load(path)
+    assert sorted(loaded.ids.tolist()) == [1, 2, 3] and loaded.watermark == 3
+
+    _index(4).save(path)
+    assert not (path / first).exists()
+
+
+def test_refresh_embeds_outside_the_event_loop(client, card, monkeypatch):
+    threads = []
+    embed = vectors._embed
+
+    def recording_embed(rows):
+        threads.append(threading.get_ident())
+        return embed(rows)
+
+    monkeypatch.setattr(vectors, "_embed", recording_embed)
+
+    async def refresh():
+        index = vectors.VectorIndex()
+        async with AsyncSessionLocal() as db:
+            applied = await index.refresh(db)
+        return index, applied, threading.get_ident()
+
+    index, applied, loop_thread = asyncio.run(refresh())
+    assert applied >= 1 and card["id"] in index.ids[: index.size].tolist()
+    assert threads and loop_thread not in threads
+
+
+class _HeldLock:
+    def locked(self):
+        return True
+
+    async def __aenter__(self):
+        raise AssertionError("the request waited for a running refresh")
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_chat_does_not_wait_for_a_running_refresh(client, card, monkeypatch):
+    index = vectors.VectorIndex()
+    index._lock = _HeldLock()
+    monkeypatch.setattr(vectors, "index", index)
+
+    response = client.post("/chat/mock", json={"message": "Card description content"})
+    assert response.status_code == 200, response.text
+    assert response.json()["used_cards"] == []